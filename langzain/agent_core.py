@@ -1,53 +1,312 @@
 # agent_core.py
-import os
-from dotenv import load_dotenv
+"""
+Agent setup + helpers to run it.
 
-from langchain_openai import ChatOpenAI
-from langchain.agents import create_agent
+Nothing heavy happens at import time: langchain / langchain_openai are only
+imported (and the agent only built) the first time get_agent() is called,
+so the CLI prompt and the GUI window can show up right away. Call
+warm_up() to build the agent on a background thread in the meantime.
+"""
+import asyncio
+import os
+import threading
+import time
 
 try:
-    from .tools import get_current_temperature, search_wikipedia
+    from .messages import message_text
 except ImportError:
-    from langzain.tools import get_current_temperature, search_wikipedia
-# Load .env so OPENAI_API_KEY is available
-load_dotenv()
-
-# 1. LLM
-llm = ChatOpenAI(
-    api_key= os.getenv("OPENAI_API_KEY"),
-    base_url=os.getenv("OPENAI_BASE_URL"),  # e.g. "https://openrouter.ai/api/v1"
-    model=os.getenv("OPENAI_MODULE","openai/gpt-4o-mini"),   # you can change to "gpt-4o-mini" if you have it
-    temperature=0,
-)
+    from langzain.messages import message_text
 
-# 2. Tools – just pass the Python functions
-tools = [get_current_temperature, search_wikipedia]
+_IMPORT_START = time.perf_counter()
 
 SYSTEM_PROMPT = (
     "You are a helpful but slightly sassy assistant. "
     "You can call tools when needed to answer questions. "
     "Use the Wikipedia tool for general knowledge questions. "
-    "Use the weather tool when the user asks about the weather at some location."
+    "For the weather in a named place use get_current_temperature_in; use "
+    "get_current_temperatures (one call) when the user asks about several places, "
+    "with coordinates from resolve_location rather than guessed ones."
 )
 
-# 3. Create the agent
-agent = create_agent(
-    model=llm,
-    tools=tools,
-    system_prompt=SYSTEM_PROMPT,
+# Prompts of the cheaper paths the router (router.py) sends simple turns down
+ROUTE_PROMPTS = {
+    "chat": "You are a helpful but slightly sassy assistant.",
+    "weather": (
+        "You are a helpful but slightly sassy assistant. "
+        "Use get_current_temperature_in for the weather in a place. If it doesn't know "
+        "the place, call get_current_temperature with the place's coordinates."
+    ),
+    "wiki": (
+        "You are a helpful but slightly sassy assistant. "
+        "Use the Wikipedia tool for general knowledge questions."
+    ),
+}
+
+DEFAULT_MODEL = "openai/gpt-4o-mini"  # you can change to "gpt-4o-mini" if you have it
+
+# How long the expensive startup steps took (seconds), filled in as they happen.
+# `python -m langzain.startup_time` prints these so regressions show up.
+startup_timings = {}
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for your own later reference. "
+    "Keep names, places, numbers, facts found with tools and anything the "
+    "user asked you to remember. Be brief."
 )
 
+# Built LLMs, keyed by (model, base_url, temperature, use_cache); agents also by route
+_llms = {}
+_agents = {}
+_agents_lock = threading.RLock()
+_env_loaded = False
+
+# Which part of the conversation is sent each turn (see history.py)
+_history_policy = None
+
+# Event loop of run_agents_batch (see _batch_loop)
+_loop = None
+
+
+def _load_env():
+    """Load .env once so OPENAI_API_KEY is available."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    _env_loaded = True
+
+
+def _agent_config(model=None, base_url=None, temperature=0, use_cache=True):
+    """Fill in defaults from the environment and return the cache key."""
+    from .llm_cache import enabled as response_cache_enabled
+
+    _load_env()
+    model = model or os.getenv("OPENAI_MODULE", DEFAULT_MODEL)
+    base_url = base_url or os.getenv("OPENAI_BASE_URL")  # e.g. "https://openrouter.ai/api/v1"
+    # the response cache is opt-in (LANGZAIN_LLM_CACHE=1), see llm_cache.py
+    use_cache = bool(use_cache) and response_cache_enabled()
+    return model, base_url, temperature, use_cache
+
+
+def _load_tools():
+    """Import the tools lazily (they pull in requests & friends)."""
+    try:
+        from . import tools
+    except ImportError:
+        from langzain import tools
+
+    # Tools – just pass the Python functions
+    return [
+        tools.get_current_temperature_in,
+        tools.get_current_temperature,
+        tools.get_current_temperatures,
+        tools.resolve_location,
+        tools.search_wikipedia,
+    ]
+
+
+def _build_openai(model, base_url, temperature, cache=False, api_key=None):
+    from langchain_openai import ChatOpenAI
+
+    from .ratelimit import http_clients
+
+    # every request to this endpoint shares one rate limiter (see ratelimit.py)
+    http_client, http_async_client = http_clients(base_url)
+    return ChatOpenAI(
+        api_key=api_key or os.getenv("OPENAI_API_KEY"),
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        cache=cache,
+        stream_usage=True,   # token counts for streamed turns too (see instrumentation.py)
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def _build_llm(model, base_url, temperature, use_cache):
+    cache = False
+    if use_cache:
+        from .llm_cache import ResponseCache
+
+        cache = ResponseCache(model, base_url)
+
+    fallbacks = os.getenv("LANGZAIN_LLM_FALLBACKS", "").strip()
+    if not fallbacks:
+        return _build_openai(model, base_url, temperature, cache)
+
+    # several endpoints: hedge slow calls, fail over broken ones (see hedging.py)
+    from .hedging import hedged_model, parse_fallbacks
+
+    models = [(base_url or "default", _build_openai(model, base_url, temperature))]
+    for url, fallback_model, key_env in parse_fallbacks(fallbacks, model):
+        models.append((url, _build_openai(fallback_model, url, temperature, api_key=os.getenv(key_env))))
+    return hedged_model(models, cache=cache)
+
+
+def get_llm(model=None, base_url=None, temperature=0, use_cache=True):
+    """Return the (cached) chat model for this config, without any tools bound."""
+    key = _agent_config(model, base_url, temperature, use_cache)
+    llm = _llms.get(key)
+    if llm is None:
+        with _agents_lock:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = _build_llm(*key)
+                _llms[key] = llm
+    return llm
+
+
+def _build_agent(model, base_url, temperature, use_cache, route="agent"):
+    start = time.perf_counter()
+    from langchain.agents import create_agent
+
+    from .parallel_tools import ToolCallGuard, make_tool
+    from .router import ROUTE_TOOLS
+
+    tools = _load_tools()
+    if route in ROUTE_TOOLS:
+        # a routed turn only sees the tools it needs (none for chat: a plain model call)
+        tools = [t for t in tools if t.__name__ in ROUTE_TOOLS[route]]
+    tools = [make_tool(t) for t in tools]
+    llm = get_llm(model, base_url, temperature, use_cache)
+    imported = time.perf_counter()
+
+    agent = create_agent(
+        model=llm,
+        tools=tools,
+        system_prompt=ROUTE_PROMPTS.get(route, SYSTEM_PROMPT),
+        # tool calls of one step run concurrently; a failing one doesn't stop the rest
+        middleware=[ToolCallGuard()],
+    )
 
-def run_agent(messages):
+    startup_timings.setdefault("imports_and_llm", imported - start)
+    startup_timings.setdefault("agent_build", time.perf_counter() - imported)
+    return agent
+
+
+def get_agent(model=None, base_url=None, temperature=0, use_cache=True, route="agent"):
     """
-    Run the agent on the current conversation.
+    Return the agent for this model config, building it on first use.
 
-    messages: list of dicts like
-        {'role': 'user'/'assistant'/'system', 'content': '...'}
-    Returns: updated list of messages including the agent's latest reply.
+    Agents are cached by (model, base_url, temperature, use_cache), so every
+    caller with the same config shares one instance. Missing values come
+    from OPENAI_MODULE / OPENAI_BASE_URL. use_cache=False skips the LLM
+    response cache (when it is enabled at all).
+
+    route="chat" / "weather" / "wiki" gives the cut-down agent the router
+    uses for that kind of turn (see router.py); "agent" is the full one.
+    """
+    key = (*_agent_config(model, base_url, temperature, use_cache), route)
+    agent = _agents.get(key)
+    if agent is None:
+        # Only one thread builds; others (e.g. a turn racing the warm-up) wait for it
+        with _agents_lock:
+            agent = _agents.get(key)
+            if agent is None:
+                agent = _build_agent(*key)
+                _agents[key] = agent
+    return agent
+
+
+def get_agents(model=None, base_url=None, temperature=0, use_cache=True):
+    """{route: agent} – the full agent plus the router's cut-down ones (see router.py)."""
+    return {
+        route: get_agent(model, base_url, temperature, use_cache, route=route)
+        for route in ("agent", *ROUTE_PROMPTS)
+    }
+
+
+def warm_up(model=None, base_url=None, temperature=0):
+    """
+    Build the agent on a daemon thread so the UI doesn't wait for it.
+    Returns the thread; later get_agent() calls just pick up the result.
+    """
+
+    def _warm():
+        try:
+            get_agent(model, base_url, temperature)
+            if _router_mode() == "on":
+                for route in ROUTE_PROMPTS:
+                    get_agent(model, base_url, temperature, route=route)
+        except Exception as exc:
+            # get_agent() will raise again on the first real turn
+            print(f"[langzain] agent warm-up failed: {exc}")
+
+    thread = threading.Thread(target=_warm, name="langzain-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # Backwards compatibility: `from langzain.agent_core import agent` (or llm / tools) still works
+    if name == "agent":
+        return get_agent()
+    if name == "llm":
+        return get_llm()
+    if name == "tools":
+        return _load_tools()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _summarize_history(previous_summary, messages):
+    """Summarizer used by the history policy – one plain LLM call, no tools."""
+    from .history import format_for_summary
+
+    reply = get_llm().invoke([
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": format_for_summary(previous_summary, messages)},
+    ])
+    return message_text(reply.content)
+
+
+def get_history_policy():
+    """
+    The history policy applied by run_agent & co.
+
+    Default budget is LANGZAIN_HISTORY_TOKENS tokens (8000; 0 = send everything).
+    """
+    global _history_policy
+    if _history_policy is None:
+        from .history import HistoryPolicy
+
+        _load_env()
+        _history_policy = HistoryPolicy(
+            max_tokens=int(os.getenv("LANGZAIN_HISTORY_TOKENS", "8000")),
+            summarizer=_summarize_history,
+        )
+    return _history_policy
+
+
+def set_history_policy(policy):
+    """Replace the history policy (e.g. HistoryPolicy(max_tokens=None) to disable it)."""
+    global _history_policy
+    _history_policy = policy
+
+
+def _window(messages):
+    """The part of the conversation to send this turn."""
+    return get_history_policy().apply(messages)
+
+
+def _with_history(messages, window, result_messages, return_delta=False):
     """
-    result = agent.invoke({"messages": messages})
+    Re-attach the full history when only a window was sent, so callers
+    still get their whole conversation + this turn's new messages back.
+    With return_delta=True just this turn's new messages are returned.
+    """
+    new_messages = list(result_messages[len(window):])
+    if return_delta:
+        return new_messages
+    if window is messages:
+        return result_messages
+    return list(messages) + new_messages
+
 
+def _result_messages(result, messages):
+    """Normalize whatever the agent returned into a list of messages."""
     # New LangChain agents usually return {'messages': [...]}.
     if isinstance(result, dict) and "messages" in result:
         return result["messages"]
@@ -59,3 +318,246 @@ def run_agent(messages):
     # Fallback: append whatever came back as a single assistant message
     messages.append({"role": "assistant", "content": str(result)})
     return messages
+
+
+def _router_mode():
+    from .router import router_mode
+
+    _load_env()
+    return router_mode()
+
+
+def _pick_agent(agent, window, recorder, use_cache):
+    """
+    The agent for this turn: the caller's, or whatever the router picks –
+    from get_agent(), or from the caller's {route: agent} (see get_agents()).
+    """
+    if agent is not None and not isinstance(agent, dict):
+        return agent
+    from .router import route
+
+    agents = agent or {}
+    decision = route(window, _router_mode())
+    name = decision.applied if decision else "agent"
+    if decision is not None:
+        recorder.route = decision.as_dict()
+    return agents.get(name) or get_agent(use_cache=use_cache, route=name)
+
+
+def _recorder():
+    from .instrumentation import TurnRecorder
+
+    return TurnRecorder()
+
+
+def _run_config(recorder, is_async=False):
+    """Config for one turn: timing callbacks + the cap on concurrent tool calls."""
+    from .parallel_tools import turn_config
+
+    return {"callbacks": [recorder], "configurable": turn_config(is_async)}
+
+
+def run_agent(messages, agent=None, return_delta=False, use_cache=True):
+    """
+    Run the agent on the current conversation.
+
+    messages: list of dicts like
+        {'role': 'user'/'assistant'/'system', 'content': '...'}
+    Returns: updated list of messages including the agent's latest reply.
+
+    Only a window of the conversation that fits the history policy's token
+    budget is sent to the model; the returned list still has everything.
+    `agent` defaults to get_agent(), or a cut-down one for turns that
+    don't need every tool (see router.py); a {route: agent} dict like
+    get_agents() returns is routed too.
+
+    return_delta=True returns only the messages added this turn (tool calls,
+    tool results, the reply) – cheaper for callers that keep their own
+    Conversation. use_cache=False bypasses the LLM response cache.
+
+    Every turn is timed (see instrumentation.py); the trace of the last
+    one is in instrumentation.last_trace().
+    """
+    recorder = _recorder()
+    try:
+        window = recorder.timed_window(_window, messages)
+        result = _pick_agent(agent, window, recorder, use_cache).invoke(
+            {"messages": window}, config=_run_config(recorder)
+        )
+    except BaseException as exc:
+        recorder.finish(error=exc)
+        raise
+    recorder.finish()
+    return _with_history(messages, window, _result_messages(result, list(window)), return_delta)
+
+
+async def arun_agent(messages, agent=None, return_delta=False, use_cache=True):
+    """Async version of run_agent (uses agent.ainvoke)."""
+    recorder = _recorder()
+    try:
+        # (may call the LLM for a summary – keep that off the event loop)
+        window = await asyncio.to_thread(recorder.timed_window, _window, messages)
+        result = await _pick_agent(agent, window, recorder, use_cache).ainvoke(
+            {"messages": window}, config=_run_config(recorder, is_async=True)
+        )
+    except BaseException as exc:
+        recorder.finish(error=exc)
+        raise
+    recorder.finish()
+    return _with_history(messages, window, _result_messages(result, list(window)), return_delta)
+
+
+async def arun_agents_batch(conversations, max_concurrency=8):
+    """
+    Run many independent conversations concurrently on the current event loop.
+
+    conversations: list of message lists (one per conversation)
+    Returns: list of updated message lists, in the same order as the input.
+    A conversation that failed (429, tool error, timeout, ...) gets its
+    exception in its slot instead; the others still finish.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run_one(messages):
+        async with semaphore:
+            try:
+                return await arun_agent(list(messages))
+            except Exception as exc:
+                return exc
+
+    return await asyncio.gather(*(_run_one(m) for m in conversations))
+
+
+def _batch_loop():
+    """
+    The event loop run_agents_batch() runs on: one per process, on a daemon
+    thread. The async HTTP clients are cached process-wide and keep their
+    connections bound to the loop they were first used on, so a fresh
+    asyncio.run() per batch would break every batch after the first.
+    """
+    global _loop
+    with _agents_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="langzain-batch-loop", daemon=True).start()
+    return _loop
+
+
+def run_agents_batch(conversations, max_concurrency=8):
+    """
+    Blocking wrapper around arun_agents_batch for scripts.
+
+    Drives all conversations on one event loop, at most `max_concurrency`
+    at a time, and returns the results in input order (an exception for
+    each conversation that failed). Can be called any number of times
+    (from any thread).
+    """
+    future = asyncio.run_coroutine_threadsafe(arun_agents_batch(conversations, max_concurrency), _batch_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # e.g. Ctrl-C: don't leave the batch running on the loop thread
+        future.cancel()
+        raise
+
+
+def _stream_events(mode, data):
+    """
+    Turn one (mode, data) item from agent.stream(...) into our own events.
+
+    Events are small dicts:
+        {"type": "token", "text": "..."}                  – a piece of the reply
+        {"type": "tool_call", "id", "name", "args"}       – model asked for a tool
+        {"type": "tool_result", "id", "name", "content"}  – tool came back
+    """
+    if mode == "messages":
+        chunk, _metadata = data
+        # Only the model's own chunks are tokens (tool messages come through here too)
+        if getattr(chunk, "type", None) == "AIMessageChunk":
+            text = message_text(chunk.content)
+            if text:
+                yield {"type": "token", "text": text}
+
+    elif mode == "updates" and isinstance(data, dict):
+        for update in data.values():
+            if not isinstance(update, dict):
+                continue
+            for m in update.get("messages", []):
+                for call in getattr(m, "tool_calls", None) or []:
+                    yield {
+                        "type": "tool_call",
+                        "id": call.get("id"),
+                        "name": call.get("name"),
+                        "args": call.get("args", {}),
+                    }
+                if getattr(m, "type", None) == "tool":
+                    yield {
+                        "type": "tool_result",
+                        "id": getattr(m, "tool_call_id", None),
+                        "name": getattr(m, "name", None),
+                        "content": message_text(m.content),
+                    }
+
+
+STREAM_MODES = ["messages", "updates", "values"]
+
+
+def _done_event(messages, window, final_messages, recorder):
+    return {
+        "type": "done",
+        "messages": _with_history(messages, window, final_messages),
+        "new_messages": _with_history(messages, window, final_messages, return_delta=True),
+        "trace": recorder.finish(),
+    }
+
+
+def stream_agent(messages, agent=None, use_cache=True):
+    """
+    Run the agent on the current conversation and yield events as they arrive.
+
+    Yields "token", "tool_call" and "tool_result" events (see _stream_events)
+    and finally {"type": "done", "messages": [...], "new_messages": [...],
+    "trace": {...}} with the list run_agent would have returned, just this
+    turn's part, and the turn's timings.
+    """
+    recorder = _recorder()
+    try:
+        window = recorder.timed_window(_window, messages)
+        final_messages = window
+        for mode, data in _pick_agent(agent, window, recorder, use_cache).stream(
+            {"messages": window}, config=_run_config(recorder), stream_mode=STREAM_MODES
+        ):
+            if mode == "values" and isinstance(data, dict) and "messages" in data:
+                final_messages = data["messages"]
+                continue
+            yield from _stream_events(mode, data)
+    except BaseException as exc:
+        # includes GeneratorExit when the consumer stops early
+        recorder.finish(error=exc)
+        raise
+
+    yield _done_event(messages, window, final_messages, recorder)
+
+
+async def astream_agent(messages, agent=None, use_cache=True):
+    """Async version of stream_agent (same events, uses agent.astream)."""
+    recorder = _recorder()
+    try:
+        window = await asyncio.to_thread(recorder.timed_window, _window, messages)
+        final_messages = window
+        async for mode, data in _pick_agent(agent, window, recorder, use_cache).astream(
+            {"messages": window}, config=_run_config(recorder, is_async=True), stream_mode=STREAM_MODES
+        ):
+            if mode == "values" and isinstance(data, dict) and "messages" in data:
+                final_messages = data["messages"]
+                continue
+            for event in _stream_events(mode, data):
+                yield event
+    except BaseException as exc:
+        recorder.finish(error=exc)
+        raise
+
+    yield _done_event(messages, window, final_messages, recorder)
+
+
+startup_timings["import_agent_core"] = time.perf_counter() - _IMPORT_START
@@ -1,46 +1,112 @@
 # app.py
-from .agent_core import run_agent
+import argparse
+import sys
+
+from .agent_core import stream_agent, warm_up
+from .messages import NO_REPLY, Conversation, last_assistant_text
+from .store import ConversationStore
+
+
 def extract_last_assistant_message(messages):
     """
     Given a list of messages (could be dicts or LangChain message objects),
     return the text of the last assistant message.
+
+    (Kept for scripts that hold a plain list – front ends use Conversation.last_reply.)
     """
-    for m in reversed(messages):
-        role = None
-        content = None
-
-        # Case 1: LangChain message objects (AIMessage, HumanMessage, SystemMessage)
-        if hasattr(m, "content"):
-            # New LangChain messages usually have .type = "ai" / "human" / "system"
-            role = getattr(m, "type", None) or getattr(m, "role", None)
-            content = getattr(m, "content", "")
-
-        # Case 2: plain dicts: {"role": "...", "content": "..."}
-        elif isinstance(m, dict):
-            role = m.get("role")
-            content = m.get("content", "")
-
-        # If this is an assistant/AI message, extract the text
-        if role in ("assistant", "ai"):
-            # Sometimes content is a list of chunks instead of a plain string
-            if isinstance(content, list):
-                parts = []
-                for part in content:
-                    if isinstance(part, dict) and part.get("type") == "text":
-                        parts.append(part.get("text", ""))
-                if parts:
-                    return "".join(parts)
-                return str(content)
-            return str(content)
-
-    return "[No assistant reply found]"
-
-
-def main():
-    print("AI Agent is ready. Type 'exit' to quit.\n")
+    return last_assistant_text(messages)
+
+
+def stream_reply(conversation, profile=False):
+    """
+    Run the agent on the conversation, printing the reply token by token.
+    This turn's new messages are added to `conversation` and also returned.
+    With profile=True a per-turn timing breakdown is printed after the reply.
+    """
+    streamed = False
+    at_line_start = True
+    new_messages = []
+    trace = None
+    for event in stream_agent(conversation.raw):
+        if event["type"] == "token":
+            if at_line_start:
+                print("Bot: ", end="")
+                at_line_start = False
+            print(event["text"], end="", flush=True)
+            streamed = True
+        elif event["type"] == "tool_call":
+            if not at_line_start:
+                print()
+            print(f"  [calling {event['name']}...]", flush=True)
+            at_line_start = True
+        elif event["type"] == "done":
+            new_messages = event["new_messages"]
+            trace = event.get("trace")
+
+    conversation.extend(new_messages)
+
+    # Nothing was streamed (e.g. provider without streaming) – print the reply
+    if not streamed:
+        print("Bot:", conversation.last_reply or NO_REPLY, end="")
+    print()
+    if profile and trace:
+        from .instrumentation import format_profile
+
+        print(format_profile(trace))
+    return new_messages
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="langzain-cli",
+        description="Chat with Langzain in the terminal.",
+        epilog="Batch mode: langzain-cli batch in.jsonl out.jsonl (see langzain-cli batch --help)",
+    )
+    parser.add_argument("--session", help="resume a saved conversation by its session id")
+    parser.add_argument("--no-save", action="store_true", help="don't save this conversation")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="print where the time went (LLM calls, tools, tokens) after each reply",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # `langzain-cli batch in.jsonl out.jsonl` – see batch.py
+    if argv and argv[0] == "batch":
+        from .batch import main as batch_main
+
+        return batch_main(argv[1:])
+
+    args = parse_args(argv)
+
+    # Build the agent in the background while the user types the first message
+    warm_up()
 
     # This will hold the whole conversation for memory
-    messages = []
+    conversation = Conversation()
+
+    # Conversations are saved as we go, so they can be resumed later
+    store = None if args.no_save else ConversationStore()
+    session_id = None
+    saved = 0
+    if store is not None:
+        if args.session and store.has_session(args.session):
+            session_id = args.session
+            conversation = Conversation(store.load_recent(session_id))
+            saved = len(conversation)
+            print(f"Resumed session {session_id} ({store.count(session_id)} messages).")
+            if conversation.last_reply:
+                print("Bot (last reply):", conversation.last_reply)
+        else:
+            if args.session:
+                print(f"No saved session {args.session!r} – starting a new one.")
+            session_id = store.new_session()
+        print(f"Session id: {session_id} (resume with: langzain-cli --session {session_id})")
+
+    print("AI Agent is ready. Type 'exit' to quit.\n")
 
     while True:
         user_input = input("You: ")
@@ -49,16 +115,16 @@ def main():
             break
 
         # Add user message to history
-        messages.append({"role": "user", "content": user_input})
-
-        # Call the agent
-        messages = run_agent(messages)
+        conversation.add_user(user_input)
 
-        # Extract last assistant reply
-        bot_reply = extract_last_assistant_message(messages)
-        print("Bot:", bot_reply)
+        # Call the agent (reply is printed as it streams in)
+        stream_reply(conversation, profile=args.profile)
         print()
 
+        # only this turn's new messages are written
+        if store is not None:
+            saved = store.save_new(session_id, conversation.raw, saved)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,259 @@
+# batch.py
+"""
+Run lots of prompts through the agent: `langzain-cli batch in.jsonl out.jsonl`.
+
+Every input line is one conversation:
+    {"id": "q1", "prompt": "What's the weather in Oslo?"}         one turn
+    {"id": "q2", "turns": ["Who founded Rome?", "And when?"]}     scripted turns
+    {"id": "q3", "messages": [...], "prompt": "..."}              earlier history + a turn
+("id" defaults to the line number.)
+
+Conversations run concurrently (--concurrency at a time) on one event
+loop. Each result is appended to the output file as soon as it finishes:
+    {"id", "status": "ok" | "error", "reply", "replies", "error",
+     "latency_seconds", "turns", "llm_calls", "prompt_tokens", "completion_tokens"}
+
+The output file doubles as the checkpoint: run the same command again
+after a crash / Ctrl+C and ids that already have an "ok" line are skipped
+(failed ones are tried again). A throughput / latency summary is printed
+at the end.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+try:
+    from .agent_core import arun_agent
+    from .messages import last_assistant_text
+except ImportError:
+    from langzain.agent_core import arun_agent
+    from langzain.messages import last_assistant_text
+
+PROGRESS_EVERY = 10   # seconds between progress lines
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def read_records(path):
+    """Yield (id, record or None, error) for every non-empty input line."""
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as exc:
+                yield f"line-{n}", None, f"invalid JSON: {exc}"
+                continue
+            record_id = str(record.get("id", f"line-{n}"))
+            turns = record.get("turns")
+            if turns is None and record.get("prompt") is not None:
+                turns = [record["prompt"]]
+            if not turns or not all(isinstance(t, str) for t in turns):
+                yield record_id, None, "needs a 'prompt' string or a 'turns' list of strings"
+                continue
+            yield record_id, {"history": list(record.get("messages") or []), "turns": turns}, None
+
+
+def finished_ids(path):
+    """Ids that already have an "ok" result in the output file (the checkpoint)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue   # a line cut short by a crash
+            if isinstance(result, dict) and result.get("status") == "ok":
+                done.add(str(result.get("id")))
+    return done
+
+
+def _open_for_append(path):
+    # if the last run died mid-line, start on a fresh line
+    needs_newline = False
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    out = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        out.write("\n")
+    return out
+
+
+async def run_conversation(record_id, conversation, use_cache=True):
+    """Run the scripted turns of one conversation; returns the result line."""
+    from .instrumentation import last_trace
+
+    messages = list(conversation["history"])
+    replies = []
+    llm_calls = prompt_tokens = completion_tokens = 0
+    start = time.perf_counter()
+    error = None
+    try:
+        for text in conversation["turns"]:
+            messages.append({"role": "user", "content": text})
+            new_messages = await arun_agent(messages, return_delta=True, use_cache=use_cache)
+            messages.extend(new_messages)
+            replies.append(last_assistant_text(new_messages))
+            trace = last_trace() or {}
+            llm_calls += trace.get("llm_calls", 0)
+            prompt_tokens += trace.get("prompt_tokens", 0)
+            completion_tokens += trace.get("completion_tokens", 0)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+
+    return {
+        "id": record_id,
+        "status": "error" if error else "ok",
+        "reply": replies[-1] if replies else None,
+        "replies": replies,
+        "error": error,
+        "latency_seconds": round(time.perf_counter() - start, 4),
+        "turns": len(replies),
+        "llm_calls": llm_calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    }
+
+
+class _Summary:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.skipped = 0
+        self.ok = 0
+        self.errors = 0
+        self.turns = 0
+        self.tokens = 0
+        self.latencies = []
+
+    def add(self, result):
+        if result["status"] == "ok":
+            self.ok += 1
+            self.latencies.append(result["latency_seconds"])
+        else:
+            self.errors += 1
+        self.turns += result.get("turns", 0)
+        self.tokens += result.get("prompt_tokens", 0) + result.get("completion_tokens", 0)
+
+    def as_dict(self):
+        wall = time.perf_counter() - self.start
+        done = self.ok + self.errors
+        return {
+            "completed": done,
+            "ok": self.ok,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "wall_seconds": round(wall, 2),
+            "conversations_per_second": round(done / wall, 3) if wall else 0.0,
+            "turns_per_second": round(self.turns / wall, 3) if wall else 0.0,
+            "latency_p50": _percentile(self.latencies, 50),
+            "latency_p95": _percentile(self.latencies, 95),
+            "latency_p99": _percentile(self.latencies, 99),
+            "tokens": self.tokens,
+        }
+
+
+def format_summary(s):
+    def sec(v):
+        return "n/a" if v is None else f"{v:.2f}s"
+
+    return (
+        f"{s['completed']} conversations in {s['wall_seconds']:.1f}s"
+        f" ({s['ok']} ok, {s['errors']} failed, {s['skipped']} already done)\n"
+        f"{s['conversations_per_second']:.2f} conversations/s, {s['turns_per_second']:.2f} turns/s,"
+        f" {s['tokens']} tokens\n"
+        f"latency p50 {sec(s['latency_p50'])}  p95 {sec(s['latency_p95'])}  p99 {sec(s['latency_p99'])}"
+    )
+
+
+async def run_batch(in_path, out_path, concurrency=8, use_cache=True, log=None):
+    """Run every conversation of in_path not yet in out_path; returns the summary dict."""
+    log = log or (lambda msg: print(msg, file=sys.stderr))
+    done = finished_ids(out_path)
+    if done:
+        log(f"Resuming: {len(done)} conversations already in {out_path}")
+
+    concurrency = max(1, concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)   # don't read thousands of lines ahead
+    summary = _Summary()
+    last_progress = time.monotonic()
+
+    with _open_for_append(out_path) as out:
+
+        def write(result):
+            nonlocal last_progress
+            out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            summary.add(result)
+            if time.monotonic() - last_progress >= PROGRESS_EVERY:
+                last_progress = time.monotonic()
+                log(f"  {summary.ok + summary.errors} done ({summary.errors} failed)")
+
+        async def produce():
+            for record_id, conversation, error in read_records(in_path):
+                if record_id in done:
+                    summary.skipped += 1
+                    continue
+                await queue.put((record_id, conversation, error))
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def work():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                record_id, conversation, error = item
+                if error:
+                    write({"id": record_id, "status": "error", "error": error, "turns": 0})
+                    continue
+                write(await run_conversation(record_id, conversation, use_cache))
+
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+
+    return summary.as_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="langzain-cli batch",
+        description="Run the conversations of a JSONL file through the agent.",
+    )
+    parser.add_argument("input", help="JSONL file, one conversation per line")
+    parser.add_argument("output", help="JSONL results (appended; also the resume checkpoint)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="conversations at a time (default 8)")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the LLM response cache")
+    parser.add_argument("--summary-json", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = asyncio.run(run_batch(args.input, args.output, args.concurrency, not args.no_cache))
+    except KeyboardInterrupt:
+        print(f"\nStopped. Run the same command again to resume from {args.output}.", file=sys.stderr)
+        return 130
+
+    print(format_summary(summary))
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+# benchmarks/__init__.py
+"""
+Offline benchmarks for the agent.
+
+Everything runs against local stand-ins (fake_servers.py) for the LLM,
+Open-Meteo and Wikipedia, so numbers are repeatable and cost nothing.
+See run.py, or:
+
+    python -m langzain.benchmarks --help
+"""
@@ -0,0 +1,288 @@
+# fake_servers.py
+"""
+Local stand-ins for the services the agent talks to, so benchmarks run
+offline and give the same numbers every time.
+
+  FakeLLMServer   – OpenAI-compatible /v1/chat/completions (streaming and
+                    not). Replies follow a small script: a user message that
+                    matches a rule gets a tool call, a tool result gets a short
+                    answer, anything else gets a canned reply. Latency and
+                    token rate are configurable.
+  FakeToolServer  – Open-Meteo /v1/forecast and the MediaWiki API
+                    (list=search and prop=extracts) with fixed data.
+
+Both are ThreadingHTTPServers on 127.0.0.1 with a random free port, running
+on daemon threads. fake_services() starts both and points OPENAI_BASE_URL /
+LANGZAIN_OPEN_METEO_URL / LANGZAIN_WIKIPEDIA_API_URL at them.
+"""
+import contextlib
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# (pattern on the last user message, tool name, tool arguments)
+DEFAULT_SCRIPT = [
+    (r"\bweather\b|\btemperature\b", "get_current_temperature", {"latitude": 59.91, "longitude": 10.75}),
+    # (for agents that only have the by-name tool)
+    (r"\bweather\b|\btemperature\b", "get_current_temperature_in", {"place": "Oslo"}),
+    (r"\bwho\b|\bwhat is\b|\bwiki", "search_wikipedia", {"query": "Oslo"}),
+]
+
+FILLER_WORDS = (
+    "well honestly that is a fine question and here is a perfectly "
+    "reasonable answer with just enough words to look like a real reply"
+).split()
+
+
+def _estimate_tokens(messages):
+    return sum(4 + len(str(m.get("content") or "")) // 4 for m in messages)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.requests_served = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real services
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ----------------------------------------------------------------------
+#  LLM
+# ----------------------------------------------------------------------
+
+class _LLMHandler(_Handler):
+    def do_POST(self):
+        server = self.server
+        server.requests_served += 1
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        messages = body.get("messages", [])
+        tool_names = {t["function"]["name"] for t in body.get("tools") or []}
+        tool_calls, words = server.reply_for(messages, tool_names)
+        usage = {
+            "prompt_tokens": _estimate_tokens(messages),
+            "completion_tokens": len(words) or 10,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        time.sleep(server.latency)
+        if body.get("stream"):
+            self._stream(body, tool_calls, words, usage)
+        else:
+            time.sleep(len(words) / server.token_rate)
+            message = {"role": "assistant", "content": " ".join(words) if words else None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            self._send_json({
+                "id": "chatcmpl-" + uuid.uuid4().hex,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }],
+                "usage": usage,
+            })
+
+    def _stream(self, body, tool_calls, words, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        base = {
+            "id": "chatcmpl-" + uuid.uuid4().hex,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model"),
+        }
+
+        def send(data):
+            payload = ("data: " + (data if isinstance(data, str) else json.dumps(data)) + "\n\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+            self.wfile.flush()
+
+        if tool_calls:
+            delta = {"role": "assistant", "tool_calls": [dict(c, index=i) for i, c in enumerate(tool_calls)]}
+            send({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        else:
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(1 / self.server.token_rate)
+                send({**base, "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]})
+        send({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls" if tool_calls else "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send({**base, "choices": [], "usage": usage})
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeLLMServer(_Server):
+    """
+    latency      – seconds before the first byte of every response
+    token_rate   – tokens (words) per second after that
+    reply_tokens – length of a plain reply
+    script       – [(regex, tool_name, args), ...], see DEFAULT_SCRIPT
+    """
+
+    def __init__(self, latency=0.05, token_rate=200.0, reply_tokens=30, script=None):
+        super().__init__(_LLMHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.script = [(re.compile(p, re.I), name, args) for p, name, args in (script or DEFAULT_SCRIPT)]
+
+    def reply_for(self, messages, tool_names):
+        """-> (tool_calls or None, words of the text reply)"""
+        last = messages[-1] if messages else {}
+        if last.get("role") == "user" and tool_names:
+            text = str(last.get("content") or "")
+            for pattern, name, args in self.script:
+                if name in tool_names and pattern.search(text):
+                    call = {
+                        "id": "call_" + uuid.uuid4().hex[:12],
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(args)},
+                    }
+                    return [call], []
+        words = [FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(self.reply_tokens)]
+        if last.get("role") == "tool":
+            words = ["According", "to", "the", "tool:"] + words[: self.reply_tokens // 2]
+        return None, words
+
+
+# ----------------------------------------------------------------------
+#  Tools
+# ----------------------------------------------------------------------
+
+WIKI_PAGES = {
+    "Oslo": "Oslo is the capital and most populous city of Norway. " * 8,
+    "Oslo Fjord": "The Oslofjord is an inlet in the south-east of Norway. " * 8,
+    "Oslo Airport": "Oslo Airport, Gardermoen is the main airport serving Oslo. " * 8,
+}
+
+
+class _ToolHandler(_Handler):
+    def do_GET(self):
+        self.server.requests_served += 1
+        time.sleep(self.server.latency)
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        if url.path.endswith("/forecast"):
+            self._send_json(self._forecast(query))
+        elif url.path.endswith("/api.php"):
+            self._send_json(self._wiki(query))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    @staticmethod
+    def _forecast(query):
+        """Hourly temperatures for today (UTC); one result per comma-separated location."""
+        midnight = datetime.datetime.now(datetime.timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        times = [(midnight + datetime.timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(24)]
+        latitudes = str(query.get("latitude", "0")).split(",")
+        results = [
+            {
+                "latitude": float(lat),
+                "hourly": {"time": times, "temperature_2m": [round(5 + h * 0.5, 1) for h in range(24)]},
+            }
+            for lat in latitudes
+        ]
+        return results[0] if len(results) == 1 else results
+
+    @staticmethod
+    def _wiki(query):
+        if query.get("list") == "search":
+            return {"query": {"search": [{"title": t} for t in WIKI_PAGES]}}
+        pages = {}
+        for i, title in enumerate(query.get("titles", "").split("|")):
+            if title in WIKI_PAGES:
+                pages[str(i + 1)] = {"pageid": i + 1, "title": title, "extract": WIKI_PAGES[title]}
+            else:
+                pages[str(-i - 1)] = {"ns": 0, "title": title, "missing": ""}
+        return {"query": {"pages": pages}}
+
+
+class FakeToolServer(_Server):
+    """Open-Meteo + MediaWiki stand-in; `latency` seconds per request."""
+
+    def __init__(self, latency=0.02):
+        super().__init__(_ToolHandler)
+        self.latency = latency
+
+    @property
+    def open_meteo_url(self):
+        return self.url + "/v1/forecast"
+
+    @property
+    def wikipedia_url(self):
+        return self.url + "/w/api.php"
+
+
+@contextlib.contextmanager
+def fake_services(llm_latency=0.05, token_rate=200.0, reply_tokens=30, tool_latency=0.02):
+    """
+    Start both fake servers and point the environment at them (the tools
+    read their URLs per request). Yields (llm_server, tool_server).
+    """
+    llm = FakeLLMServer(latency=llm_latency, token_rate=token_rate, reply_tokens=reply_tokens).start()
+    tools = FakeToolServer(latency=tool_latency).start()
+    env = {
+        "OPENAI_BASE_URL": llm.url + "/v1",
+        "OPENAI_API_KEY": "benchmark",
+        "LANGZAIN_OPEN_METEO_URL": tools.open_meteo_url,
+        "LANGZAIN_WIKIPEDIA_API_URL": tools.wikipedia_url,
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield llm, tools
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        llm.stop()
+        tools.stop()
@@ -0,0 +1,277 @@
+# run.py
+"""
+Run the agent benchmark against the fake servers.
+
+    python -m langzain.benchmarks                       # default matrix
+    python -m langzain.benchmarks --history 0,50 --concurrency 1,8 --turns 40
+    python -m langzain.benchmarks --out new.json --compare baseline.json
+
+For every (history length, concurrency) pair, `turns` turns are run –
+`concurrency` at a time – each on a synthetic conversation of that many
+messages plus a new user message (weather / Wikipedia / chit-chat in
+turn). Turns go through stream_agent, the same path as run_agent plus
+streaming, so time to first token can be measured too.
+
+Per scenario we report throughput (turns/s), p50/p95/p99 turn latency,
+time to first token, LLM calls / tokens per turn and peak memory. Results
+are written as JSON; --compare prints the change against an earlier run
+and exits with status 1 if any scenario got slower than --threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+from .fake_servers import fake_services
+
+PROMPTS = [
+    "What's the weather like in Oslo right now?",
+    "Who founded Oslo? Check wiki.",
+    "Tell me something nice.",
+]
+
+# metric -> True if bigger is better
+COMPARED = {
+    "throughput_tps": True,
+    "latency_p50": False,
+    "latency_p95": False,
+    "latency_p99": False,
+    "ttft_p50": False,
+}
+
+
+def percentile(values, p):
+    """Nearest-rank percentile (p in 0..100); None for no values."""
+    if not values:
+        return None
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+def make_history(length):
+    """A synthetic conversation of `length` messages (user / assistant pairs)."""
+    history = []
+    for i in range(length):
+        if i % 2 == 0:
+            history.append({"role": "user", "content": f"Question {i // 2}: " + "tell me more about this. " * 6})
+        else:
+            history.append({"role": "assistant", "content": f"Answer {i // 2}: " + "here is some detail. " * 12})
+    return history
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _one_turn(history, prompt):
+    from ..agent_core import stream_agent
+
+    messages = history + [{"role": "user", "content": prompt}]
+    start = time.perf_counter()
+    ttft = None
+    trace = None
+    for event in stream_agent(messages):
+        if event["type"] == "token" and ttft is None:
+            ttft = time.perf_counter() - start
+        elif event["type"] == "done":
+            trace = event["trace"]
+    return time.perf_counter() - start, ttft, trace
+
+
+def run_scenario(history_length, concurrency, turns, trace_memory=False):
+    history = make_history(history_length)
+    latencies, ttfts, errors = [], [], 0
+    llm_calls = prompt_tokens = completion_tokens = 0
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_one_turn, history, PROMPTS[i % len(PROMPTS)]) for i in range(turns)]
+        for future in futures:
+            try:
+                latency, ttft, trace = future.result()
+            except Exception as exc:
+                errors += 1
+                print(f"  turn failed: {exc!r}", file=sys.stderr)
+                continue
+            latencies.append(latency)
+            if ttft is not None:
+                ttfts.append(ttft)
+            if trace:
+                llm_calls += trace["llm_calls"]
+                prompt_tokens += trace["prompt_tokens"]
+                completion_tokens += trace["completion_tokens"]
+    wall = time.perf_counter() - start
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    done = len(latencies) or 1
+    return {
+        "name": f"history={history_length},concurrency={concurrency}",
+        "history": history_length,
+        "concurrency": concurrency,
+        "turns": turns,
+        "errors": errors,
+        "wall_seconds": wall,
+        "throughput_tps": len(latencies) / wall if wall else 0.0,
+        "latency_mean": sum(latencies) / done,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+        "llm_calls_per_turn": llm_calls / done,
+        "prompt_tokens_per_turn": prompt_tokens / done,
+        "completion_tokens_per_turn": completion_tokens / done,
+        "peak_rss_mb": _peak_rss_mb(),
+        "tracemalloc_peak_mb": traced_peak,
+    }
+
+
+def run(histories, concurrencies, turns, llm_latency, token_rate, tool_latency,
+        warmup=3, trace_memory=False, log=print):
+    """Run the whole matrix; returns the result document (see --out)."""
+    with fake_services(llm_latency=llm_latency, token_rate=token_rate, tool_latency=tool_latency) as (llm, tool):
+        from .. import agent_core
+
+        agent_core.get_agent()
+        for i in range(warmup):
+            _one_turn([], PROMPTS[i % len(PROMPTS)])
+
+        scenarios = []
+        for history_length in histories:
+            for concurrency in concurrencies:
+                result = run_scenario(history_length, concurrency, turns, trace_memory)
+                log(format_result(result))
+                scenarios.append(result)
+
+        return {
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "settings": {
+                    "turns": turns,
+                    "llm_latency": llm_latency,
+                    "token_rate": token_rate,
+                    "tool_latency": tool_latency,
+                    "llm_requests": llm.requests_served,
+                    "tool_requests": tool.requests_served,
+                },
+            },
+            "scenarios": scenarios,
+        }
+
+
+def _ms(seconds):
+    return "   n/a" if seconds is None else f"{seconds * 1000:6.0f}"
+
+
+def format_result(r):
+    return (
+        f"{r['name']:<28} {r['throughput_tps']:7.1f} turns/s"
+        f" | p50 {_ms(r['latency_p50'])} p95 {_ms(r['latency_p95'])} p99 {_ms(r['latency_p99'])} ms"
+        f" | ttft {_ms(r['ttft_p50'])} ms"
+        f" | {r['llm_calls_per_turn']:.1f} llm calls, {r['prompt_tokens_per_turn']:.0f} prompt tok/turn"
+        + (f" | {r['errors']} errors" if r["errors"] else "")
+    )
+
+
+def compare(old, new, threshold=0.10):
+    """
+    Compare two result documents scenario by scenario.
+    Returns (report lines, regressed?) – a regression is any metric that got
+    worse by more than `threshold` (relative).
+    """
+    old_by_name = {s["name"]: s for s in old["scenarios"]}
+    lines, regressed = [], False
+    for s in new["scenarios"]:
+        before = old_by_name.get(s["name"])
+        if before is None:
+            lines.append(f"{s['name']}: new scenario")
+            continue
+        parts = []
+        for metric, higher_is_better in COMPARED.items():
+            a, b = before.get(metric), s.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = " !"
+                regressed = True
+            parts.append(f"{metric} {change:+.0%}{flag}")
+        lines.append(f"{s['name']}: " + ", ".join(parts))
+    return lines, regressed
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m langzain.benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--history", type=_int_list, default=[0, 20, 100], help="history lengths, e.g. 0,20,100")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="concurrency levels, e.g. 1,4,16")
+    parser.add_argument("--turns", type=int, default=30, help="turns per scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM time to first byte (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="fake LLM tokens per second")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="fake tool API latency (s)")
+    parser.add_argument("--trace-memory", action="store_true", help="also measure Python allocations (slower)")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="compare against an earlier --out file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown for --compare (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    # fresh caches every run, and no response cache unless asked for
+    os.environ["LANGZAIN_CACHE_DIR"] = tempfile.mkdtemp(prefix="langzain-bench-")
+    if not args.llm_cache:
+        os.environ["LANGZAIN_LLM_CACHE"] = "0"
+
+    results = run(
+        args.history, args.concurrency, args.turns,
+        args.llm_latency, args.token_rate, args.tool_latency,
+        trace_memory=args.trace_memory,
+    )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressed = compare(baseline, results, args.threshold)
+        print(f"\nCompared with {args.compare}:")
+        for line in lines:
+            print("  " + line)
+        if regressed:
+            print(f"Regression: some metrics are more than {args.threshold:.0%} worse.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
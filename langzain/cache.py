@@ -0,0 +1,229 @@
+# cache.py
+"""
+Small caches shared by the tools.
+
+    LRUCache    – in-memory, thread-safe, least-recently-used eviction
+    DiskCache   – SQLite file, so entries survive a restart
+    TieredCache – an LRUCache in front of a DiskCache
+
+Every entry has an absolute expiry time (unix seconds), so callers can
+pass a plain TTL or expire entries at a fixed time like "the next full hour".
+Values put in a DiskCache must be JSON-serializable.
+All caches count hits / misses – see .stats().
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """Where on-disk caches live (override with LANGZAIN_CACHE_DIR)."""
+    path = os.getenv("LANGZAIN_CACHE_DIR") or Path.home() / ".cache" / "langzain"
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _expiry(ttl=None, expires_at=None):
+    if expires_at is not None:
+        return expires_at
+    if ttl is not None:
+        return time.time() + ttl
+    return None  # never expires
+
+
+class LRUCache:
+    """In-memory LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        expires_at = _expiry(ttl if ttl is not None else self.ttl, expires_at)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+        }
+
+
+class DiskCache:
+    """
+    Key/value cache in a SQLite file.
+
+    The database is opened lazily. If it can't be used (read-only disk,
+    corrupt file, ...) lookups just count as misses – a broken cache must
+    never break the tool that uses it.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache(created_at)")
+            self._conn = conn
+        return self._conn
+
+    def get_entry(self, key):
+        """Return (value, expires_at) or None."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0]), row[1]
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        expires_at = _expiry(ttl if ttl is not None else self.ttl, expires_at)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache (key, value, expires_at, created_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(value), expires_at, now),
+                    )
+                    self._evict(conn, now)
+            except sqlite3.Error:
+                pass
+
+    def _evict(self, conn, now):
+        # drop expired entries, then the oldest ones if we're over the size cap
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM cache")
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class TieredCache:
+    """Memory LRU in front of a disk cache; disk hits are promoted to memory."""
+
+    def __init__(self, memory: LRUCache, disk: DiskCache = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value, expires_at = entry
+                self.memory.set(key, value, expires_at=expires_at)
+                return value
+        return default
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        expires_at = _expiry(ttl, expires_at)
+        self.memory.set(key, value, expires_at=expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at=expires_at)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        memory = self.memory.stats()
+        disk = self.disk.stats() if self.disk is not None else {"hits": 0, "misses": 0}
+        hits = memory["hits"] + disk["hits"]
+        # a memory miss that hit on disk is still an overall hit
+        misses = memory["misses"] - disk["hits"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "memory": memory,
+            "disk": disk,
+        }
+
+
+_MISSING = object()
@@ -0,0 +1,254 @@
+# gazetteer.py
+"""
+Offline place name -> coordinates lookup for the weather tools.
+
+Without it the model guesses coordinates (sometimes wrongly) or spends a
+whole extra tool round trip on search_wikipedia to find them. The bundled
+data/places.tsv has the capitals and major cities of the world; point
+LANGZAIN_GAZETTEER at a bigger file – same TSV columns, or a GeoNames
+cities*.txt dump (e.g. cities15000.txt) – for more.
+
+Names (and alternate names) go into a trie, normalized: lower case, no
+accents, no punctuation. A query is answered by, in order of preference,
+  - an exact name match
+  - names starting with the query ("san fr" -> San Francisco); every trie
+    node keeps its most populous places, so this is O(length of the query)
+  - names within a small edit distance ("Pariss", "Munchen"), found by
+    walking the trie with a Levenshtein row and pruning branches that are
+    already too far off
+Ties go to the bigger place. "Paris, Texas" / "Paris TX" / "London UK"
+narrow the matches down by country or region.
+"""
+import importlib.resources
+import os
+import re
+import threading
+import unicodedata
+
+PREFIX_TOP = 10        # most populous places remembered per trie node
+MIN_PREFIX = 3         # shorter queries only match exactly
+MAX_RESULTS = 5
+
+COUNTRY_ALIASES = {
+    "uk": "gb", "britain": "gb", "great britain": "gb", "england": "gb", "scotland": "gb", "wales": "gb",
+    "usa": "us", "america": "us", "united states of america": "us",
+    "uae": "ae", "holland": "nl", "czech republic": "cz", "russian federation": "ru",
+}
+
+US_STATES = {
+    "al": "alabama", "ak": "alaska", "az": "arizona", "ar": "arkansas", "ca": "california",
+    "co": "colorado", "ct": "connecticut", "de": "delaware", "fl": "florida", "ga": "georgia",
+    "hi": "hawaii", "id": "idaho", "il": "illinois", "in": "indiana", "ia": "iowa",
+    "ks": "kansas", "ky": "kentucky", "la": "louisiana", "me": "maine", "md": "maryland",
+    "ma": "massachusetts", "mi": "michigan", "mn": "minnesota", "ms": "mississippi", "mo": "missouri",
+    "mt": "montana", "ne": "nebraska", "nv": "nevada", "nh": "new hampshire", "nj": "new jersey",
+    "nm": "new mexico", "ny": "new york", "nc": "north carolina", "nd": "north dakota", "oh": "ohio",
+    "ok": "oklahoma", "or": "oregon", "pa": "pennsylvania", "ri": "rhode island", "sc": "south carolina",
+    "sd": "south dakota", "tn": "tennessee", "tx": "texas", "ut": "utah", "vt": "vermont",
+    "va": "virginia", "wa": "washington", "wv": "west virginia", "wi": "wisconsin", "wy": "wyoming",
+    "dc": "district of columbia",
+}
+
+_PUNCT = re.compile(r"[.'’`]")
+_SPACES = re.compile(r"[\s\-_/]+")
+
+
+def normalize(text):
+    """'São Paulo' -> 'sao paulo', 'St. John's' -> 'st johns'."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCT.sub("", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+class Place:
+    __slots__ = ("name", "country_code", "country", "admin1", "latitude", "longitude", "population")
+
+    def __init__(self, name, country_code, country, admin1, latitude, longitude, population):
+        self.name = name
+        self.country_code = country_code
+        self.country = country
+        self.admin1 = admin1
+        self.latitude = latitude
+        self.longitude = longitude
+        self.population = population
+
+    @property
+    def label(self):
+        """'Paris, Texas, United States'"""
+        parts = [self.name]
+        if self.admin1 and normalize(self.admin1) != normalize(self.name):
+            parts.append(self.admin1)
+        parts.append(self.country or self.country_code)
+        return ", ".join(p for p in parts if p)
+
+    def matches(self, qualifier):
+        """Does 'texas' / 'tx' / 'france' / 'fr' / 'uk' describe this place?"""
+        q = COUNTRY_ALIASES.get(qualifier, qualifier)
+        admin1 = normalize(self.admin1)
+        if self.country_code == "US":
+            # state names and codes both work (GeoNames uses the codes)
+            q = US_STATES.get(q, q)
+            admin1 = US_STATES.get(admin1, admin1)
+        return q in (self.country_code.lower(), normalize(self.country), admin1)
+
+    def __repr__(self):
+        return f"Place({self.label!r}, {self.latitude}, {self.longitude})"
+
+
+class _Node:
+    __slots__ = ("children", "ids", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []   # places with exactly this name
+        self.top = []   # most populous places with a name below this node
+
+
+class Gazetteer:
+    def __init__(self, entries):
+        """entries: [(Place, {normalized names}), ...]"""
+        # most populous first, so every node's `top` is just its first PREFIX_TOP arrivals
+        entries = sorted(entries, key=lambda e: -e[0].population)
+        self.places = [place for place, _ in entries]
+        self.root = _Node()
+        for i, (_, names) in enumerate(entries):
+            for name in names:
+                self._insert(name, i)
+
+    def _insert(self, name, i):
+        node = self.root
+        for ch in name:
+            node = node.children.setdefault(ch, _Node())
+            if len(node.top) < PREFIX_TOP and i not in node.top:
+                node.top.append(i)
+        if i not in node.ids:
+            node.ids.append(i)
+
+    def _node(self, key):
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _fuzzy(self, key, max_distance):
+        """{place id: edit distance} for names within max_distance of key."""
+        found = {}
+        first = list(range(len(key) + 1))
+
+        def walk(node, ch, previous):
+            row = [previous[0] + 1]
+            for col in range(1, len(key) + 1):
+                row.append(min(
+                    row[col - 1] + 1,                               # insert
+                    previous[col] + 1,                              # delete
+                    previous[col - 1] + (key[col - 1] != ch),       # replace
+                ))
+            if row[-1] <= max_distance:
+                for i in node.ids:
+                    found[i] = min(found.get(i, max_distance), row[-1])
+            if min(row) <= max_distance:
+                for next_ch, child in node.children.items():
+                    walk(child, next_ch, row)
+
+        for ch, child in self.root.children.items():
+            walk(child, ch, first)
+        return found
+
+    def _lookup(self, key, fuzzy=False):
+        """[(rank, place id)] for one normalized name: 0 = exact, 1 = prefix, 1 + edit distance."""
+        node = self._node(key)
+        if not fuzzy:
+            if node is None:
+                return []
+            if node.ids:
+                return [(0, i) for i in node.ids]
+            return [(1, i) for i in node.top] if len(key) >= MIN_PREFIX else []
+        if len(key) < 4:
+            return []
+        # two typos only in long names ("Atlantis" must not become Atlanta)
+        max_distance = 1 if len(key) < 9 else 2
+        return [(1 + d, i) for i, d in self._fuzzy(key, max_distance).items()]
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Best matches for a place name like 'Paris', 'Paris, Texas' or 'London UK'."""
+        return [place for _, place in self.search_ranked(query, limit)]
+
+    def search_ranked(self, query, limit=MAX_RESULTS):
+        """Like search(), as [(rank, place)]: 0 = exact name, 1 = prefix, 2+ = fuzzy."""
+        parts = [normalize(p) for p in query.split(",")]
+        parts = [p for p in parts if p]
+        if not parts:
+            return []
+        attempts = [(parts[0], parts[1:])]
+        # "Paris Texas" / "London UK": peel trailing words off as qualifiers
+        words = parts[0].split()
+        for cut in range(len(words) - 1, 0, -1):
+            attempts.append((" ".join(words[:cut]), [" ".join(words[cut:])] + parts[1:]))
+
+        # the (slower) fuzzy walk only once nothing matched exactly or by prefix
+        for fuzzy in (False, True):
+            for name, qualifiers in attempts:
+                hits = self._lookup(name, fuzzy)
+                if qualifiers:
+                    hits = [(r, i) for r, i in hits if all(self.places[i].matches(q) for q in qualifiers)]
+                if hits:
+                    # rank first, then population (ids are in population order)
+                    return [(r, self.places[i]) for r, i in sorted(hits)[:limit]]
+        return []
+
+
+def _bundled_rows():
+    text = importlib.resources.files("langzain").joinpath("data/places.tsv").read_text(encoding="utf-8")
+    return text.splitlines()
+
+
+def _read_places(lines, countries=None):
+    """Places from our TSV (with header) or a GeoNames cities*.txt dump."""
+    places = []
+    for line in lines:
+        if not line.strip() or line.startswith("#") or line.startswith("name\t"):
+            continue
+        f = line.rstrip("\n").split("\t")
+        if len(f) >= 19:
+            # GeoNames: id, name, asciiname, alternatenames, lat, lon, class, code, country, cc2, admin1, ..., population
+            place = Place(f[1], f[8], (countries or {}).get(f[8], f[8]), f[10], float(f[4]), float(f[5]), int(f[14] or 0))
+            names = {f[1], f[2]}
+        else:
+            name, alternates, code, country, admin1, lat, lon, population = f[:8]
+            place = Place(name, code, country, admin1, float(lat), float(lon), int(population or 0))
+            names = {name, *(a for a in alternates.split(",") if a)}
+        places.append((place, {normalize(n) for n in names if n}))
+    return places
+
+
+def load_gazetteer(path=None):
+    """The bundled gazetteer, or the file at `path` / LANGZAIN_GAZETTEER."""
+    entries = _read_places(_bundled_rows())
+    path = path or os.getenv("LANGZAIN_GAZETTEER")
+    if path:
+        # GeoNames only has country codes – take the names from the bundled data
+        countries = {place.country_code: place.country for place, _ in entries}
+        with open(path, encoding="utf-8") as f:
+            entries = _read_places(f, countries)
+    return Gazetteer(entries)
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The shared gazetteer, loaded on first use (a few ms for the bundled data)."""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = load_gazetteer()
+    return _gazetteer
+
+
+def resolve(name, limit=MAX_RESULTS):
+    """[(rank, Place)] best first – see Gazetteer.search_ranked."""
+    return get_gazetteer().search_ranked(name, limit)
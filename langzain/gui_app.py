@@ -1,9 +1,26 @@
 # LangzainGUI.py – ChatGPT-style desktop GUI with “3D” input bar,
 # thinking indicator + emojis and bubble-style messages.
 
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk
-from .agent_core import run_agent
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import simpledialog, ttk
+from .agent_core import stream_agent, warm_up
+from .messages import NO_REPLY, Conversation, last_assistant_text
+from .store import ConversationStore
+
+# One "frame" of the Tk loop (~30 fps): finished turns and streamed tokens
+# are picked up and queued inserts are applied together, once per frame.
+POLL_INTERVAL_MS = 33
+# at most this many characters are inserted per frame – a huge reply is
+# spread over several frames instead of freezing the window
+RENDER_BUDGET_CHARS = 4000
+# messages kept in the Text widget; older ones are trimmed off the top and
+# come back with the "Show earlier messages" line
+MAX_SCREEN_MESSAGES = 200
+EARLIER_PAGE = 50
 
 
 class LangzainGUI(tk.Tk):
@@ -15,7 +32,35 @@ class LangzainGUI(tk.Tk):
         self.minsize(900, 550)
 
         # state
-        self.messages = []
+        self.conversation = Conversation()
+
+        # conversations are saved as we go (append-only) and can be resumed
+        self.store = ConversationStore()
+        self.session_id = self.store.new_session()
+        self._saved_count = 0
+
+        # agent turns run on worker threads; results come back through a queue
+        # that the Tk loop polls with after() – the main thread never blocks.
+        # (more than one worker so a stopped turn that is still winding down
+        # doesn't hold up the next one)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="langzain-turn")
+        self._results = queue.Queue()
+        self._pending = deque()      # user messages typed while a turn was running
+        self._turn_counter = 0
+        self._turn_id = None         # id of the turn in flight (None = idle)
+        self._cancel_event = None    # set by the Stop button
+        self._thinking_mark = None
+        self._reply_cursor = None    # where streamed tokens of the turn in flight go
+
+        # rendering: inserts are queued and applied once per frame (_render_frame)
+        self._render_queue = deque()
+        self._blocks = deque()       # marks at the start of each message on screen, oldest first
+        self._block_counter = 0
+        self._trimmed = []           # (text, tag) of messages trimmed off the top, oldest first
+        self._active_marks = set()   # blocks that must not be trimmed (turn in flight, restores)
+        self._scroll_to_end = False
+
+        self.stop_btn = None
         self.theme_var = tk.StringVar(value="light")
         self.font_size_var = tk.StringVar(value="medium")
         self.chat_font_family = "Segoe UI"
@@ -48,6 +93,9 @@ class LangzainGUI(tk.Tk):
             "LangZain: AI Agent is ready. Type your message below (or 'exit' to quit)."
         )
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self._poll_job = self.after(POLL_INTERVAL_MS, self._poll_results)
+
     # ------------------------------------------------------------------
     #  UI construction
     # ------------------------------------------------------------------
@@ -82,6 +130,9 @@ class LangzainGUI(tk.Tk):
 
         # Chat menu
         chat_menu = tk.Menu(menubar, tearoff=0)
+        chat_menu.add_command(label="New chat", command=self.new_chat)
+        chat_menu.add_command(label="Resume session…", command=self.ask_resume_session)
+        chat_menu.add_separator()
         chat_menu.add_command(label="Clear chat", command=self.clear_chat)
         menubar.add_cascade(label="Chat", menu=chat_menu)
 
@@ -190,6 +241,11 @@ class LangzainGUI(tk.Tk):
             spacing3=8,
             font=(self.emoji_font_family, 12, "italic"),
         )
+        # "Show earlier messages" line at the top, once messages were trimmed
+        self.chat_text.tag_configure("earlier", underline=True)
+        self.chat_text.tag_bind("earlier", "<Button-1>", lambda e: self.show_earlier())
+        self.chat_text.tag_bind("earlier", "<Enter>", lambda e: self.chat_text.configure(cursor="hand2"))
+        self.chat_text.tag_bind("earlier", "<Leave>", lambda e: self.chat_text.configure(cursor=""))
 
     def _create_input_bar(self):
         """
@@ -233,6 +289,12 @@ class LangzainGUI(tk.Tk):
         send_btn.grid(row=0, column=1, sticky="e", padx=(0, 10), pady=8)
         send_btn.configure(command=lambda: self.on_send(None))
 
+        # Stop cancels the turn in flight (only enabled while one is running)
+        stop_btn = ttk.Button(card, text="Stop", style="ChatSend.TButton", state="disabled")
+        stop_btn.grid(row=0, column=2, sticky="e", padx=(0, 10), pady=8)
+        stop_btn.configure(command=self.on_stop)
+        self.stop_btn = stop_btn
+
     # ------------------------------------------------------------------
     #  Theme + font handling
     # ------------------------------------------------------------------
@@ -346,61 +408,288 @@ class LangzainGUI(tk.Tk):
     #  Chat logic
     # ------------------------------------------------------------------
 
+    def new_chat(self):
+        """Start a fresh conversation (the current one stays saved)."""
+        self._pending.clear()
+        self.on_stop()
+        self.conversation = Conversation()
+        self.session_id = self.store.new_session()
+        self._saved_count = 0
+        self.clear_chat()
+        self._append_system_line(f"New chat started (session {self.session_id}).")
+
+    def ask_resume_session(self):
+        recent = ", ".join(s["id"] for s in self.store.list_sessions(limit=5))
+        session_id = simpledialog.askstring(
+            "Resume session",
+            f"Session id to resume:\n(recent: {recent})",
+            parent=self,
+        )
+        if session_id:
+            self.resume_session(session_id.strip())
+
+    def resume_session(self, session_id):
+        """Load the recent part of a saved conversation and show it."""
+        if not self.store.has_session(session_id):
+            self._append_system_line(f"No saved session {session_id!r}.")
+            return
+        self._pending.clear()
+        self.on_stop()
+        self.session_id = session_id
+        self.conversation = Conversation(self.store.load_recent(session_id))
+        self._saved_count = len(self.conversation)
+
+        self.clear_chat()
+        self._append_system_line(f"Resumed session {session_id}.")
+        # only the tail goes into the widget; the rest waits behind "Show earlier"
+        visible = self.conversation.visible
+        cut = max(0, len(visible) - MAX_SCREEN_MESSAGES + 1)
+        self._trimmed = [(self._message_line(m.role, m.text), self._message_tag(m.role)) for m in visible[:cut]]
+        for m in visible[cut:]:
+            self._append_line(self._message_line(m.role, m.text), self._message_tag(m.role))
+        if self._trimmed:
+            self._queue_call(self._update_earlier_line)
+
+    def _save_messages(self):
+        """Append this turn's new messages to the store."""
+        self._saved_count = self.store.save_new(
+            self.session_id, self.conversation.raw, self._saved_count
+        )
+
     def clear_chat(self):
+        self._render_queue.clear()
         self.chat_text.configure(state="normal")
         self.chat_text.delete("1.0", "end")
         self.chat_text.configure(state="disabled")
+        # a turn in flight keeps its (now empty) place at the top
+        keep = self._thinking_mark if self._turn_id is not None else None
+        for mark in self._blocks:
+            if mark != keep:
+                self.chat_text.mark_unset(mark)
+        self._blocks = deque([keep] if keep else [])
+        self._active_marks = {keep} if keep else set()
+        self._trimmed = []
 
-    def _append_line(self, text: str, tag: str = None):
-        """
-        Insert a line into the chat and return the index where it starts.
-        Returning the index lets us later delete the 'thinking...' line.
+    # ------------------------------------------------------------------
+    #  Rendering
+    #
+    #  Nothing touches the Text widget directly: inserts are queued and
+    #  _render_frame() applies them once per frame, within a character
+    #  budget, with one state toggle and (at most) one see("end"). Each
+    #  message starts at a mark (left gravity) so the thinking bubble can be
+    #  replaced in place and old messages can be trimmed; streamed tokens go
+    #  to a right-gravity "cursor" mark inside the reply bubble.
+    # ------------------------------------------------------------------
 
-        Bubbles are implemented using tag backgrounds + margins, so each
-        message is one “paragraph” with spacing around it.
-        """
-        self.chat_text.configure(state="normal")
+    def _message_line(self, role, text):
+        emoji = self.user_emoji if role == "user" else self.bot_emoji
+        return f"{emoji}  {text}"
+
+    @staticmethod
+    def _message_tag(role):
+        return "user" if role == "user" else "bot"
 
-        # start index of the new line (for thinking-removal logic)
-        line_index = self.chat_text.index("end-1c linestart")
+    def _new_mark(self, prefix):
+        self._block_counter += 1
+        return f"{prefix}{self._block_counter}"
 
-        if tag:
-            self.chat_text.insert("end", text + "\n", tag)
+    def _queue_text(self, target, text, tags=()):
+        """Queue `text` for insertion at `target` ("end-1c" or a right-gravity mark)."""
+        if not text:
+            return
+        last = self._render_queue[-1] if self._render_queue else None
+        # streamed tokens for the same place are merged into one insert
+        if (
+            last is not None and last[0] == "text" and last[1] == target
+            and last[3] == tags and len(last[2]) < RENDER_BUDGET_CHARS
+        ):
+            last[2] += text
         else:
-            self.chat_text.insert("end", text + "\n")
+            self._render_queue.append(["text", target, text, tags])
 
-        # extra newline for a bit more separation at the end
-        self.chat_text.insert("end", "\n")
+    def _queue_call(self, fn, *args):
+        """Queue a widget operation, run in order with the inserts."""
+        self._render_queue.append(["call", fn, args])
 
-        self.chat_text.see("end")
-        self.chat_text.configure(state="disabled")
-        return line_index
+    def _render_frame(self):
+        """Apply queued inserts – at most RENDER_BUDGET_CHARS characters per frame."""
+        if not self._render_queue:
+            return
+        text = self.chat_text
+        # only follow the conversation if the user isn't reading further up
+        follow = self._scroll_to_end or text.yview()[1] >= 0.999
+        budget = RENDER_BUDGET_CHARS
+
+        text.configure(state="normal")
+        while self._render_queue and budget > 0:
+            op = self._render_queue.popleft()
+            try:
+                if op[0] == "call":
+                    op[1](*op[2])
+                    budget -= 100
+                    continue
+                _, target, chunk, tags = op
+                if len(chunk) > budget:
+                    # the rest goes in the next frame (targets keep their order)
+                    self._render_queue.appendleft(["text", target, chunk[budget:], tags])
+                    chunk = chunk[:budget]
+                text.insert(target, chunk, tags)
+                budget -= len(chunk)
+            except tk.TclError:
+                pass   # its mark is gone (chat cleared meanwhile) – drop it
+        if follow:
+            self._trim_scrollback()
+        text.configure(state="disabled")
+
+        if follow:
+            text.see("end")
+            self._scroll_to_end = False
+
+    def _append_line(self, text: str, tag: str = None):
+        """
+        Queue a message at the end of the chat; returns the mark at its start
+        (lets us later replace the 'thinking...' bubble in place).
+
+        Bubbles are implemented using tag backgrounds + margins, so each
+        message is one “paragraph” with spacing around it.
+        """
+        mark = self._new_mark("msg")
+        self._queue_call(self._open_block, mark)
+        # the line itself (tagged) + an untagged extra newline for a bit more separation
+        self._queue_text("end-1c", text + "\n", (tag,) if tag else ())
+        self._queue_text("end-1c", "\n")
+        return mark
+
+    def _open_block(self, mark):
+        self.chat_text.mark_set(mark, "end-1c")
+        self.chat_text.mark_gravity(mark, "left")
+        self._blocks.append(mark)
 
     def _append_system_line(self, text: str):
         self._append_line(text, tag="system")
 
     def _append_user_line(self, text: str):
         # user emoji + bubble
-        self._append_line(f"{self.user_emoji}  {text}", tag="user")
+        self._append_line(self._message_line("user", text), tag="user")
 
     def _append_bot_line(self, text: str):
         # assistant emoji + bubble
-        self._append_line(f"{self.bot_emoji}  {text}", tag="bot")
+        self._append_line(self._message_line("assistant", text), tag="bot")
 
     def _append_thinking_line(self):
-        """Show a temporary 'thinking...' bubble and return its index."""
-        idx = self._append_line(f"{self.bot_emoji}  thinking…", tag="thinking")
-        # force UI refresh so it appears before the model finishes
-        self.chat_text.update_idletasks()
-        self.update_idletasks()
-        return idx
-
-    def _remove_thinking_line(self, index):
-        """Delete the temporary thinking line at the given index."""
-        self.chat_text.configure(state="normal")
-        # delete that whole line including the extra newline we added
-        self.chat_text.delete(index, f"{index} lineend+2c")
-        self.chat_text.configure(state="disabled")
+        """Show a temporary 'thinking...' bubble and return the mark at its start."""
+        mark = self._append_line(f"{self.bot_emoji}  thinking…", tag="thinking")
+        self._active_marks.add(mark)
+        return mark
+
+    def _swap_thinking(self, mark, *chunks):
+        """Insert `chunks` (text, tags, ...) at `mark` in place of the thinking bubble."""
+        text = self.chat_text
+        # (the bubble may already be gone if the chat was cleared meanwhile)
+        old = len(text.get(mark, f"{mark} lineend+2c")) if "thinking" in text.tag_names(mark) else 0
+        # insert first, then delete: the next message's mark sits right after
+        # the bubble and must stay after the new text
+        text.mark_set("swap", mark)
+        text.mark_gravity("swap", "right")
+        text.insert(mark, *chunks)
+        if old:
+            text.delete("swap", f"swap+{old}c")
+        text.mark_unset("swap")
+
+    def _replace_thinking_line(self, mark, text: str, tag: str):
+        """Swap the thinking bubble for a short final line, at the same position."""
+        self._swap_thinking(mark, text + "\n", (tag,), "\n", ())
+
+    def _open_reply(self, mark, cursor):
+        """Turn the thinking bubble into an empty bot bubble; its text goes to `cursor`."""
+        self._swap_thinking(mark, f"{self.bot_emoji}  ", ("bot",), "\n", ("bot",), "\n", ())
+        self.chat_text.mark_set(cursor, f"{mark} lineend")
+        self.chat_text.mark_gravity(cursor, "right")
+
+    def _start_reply(self):
+        """Queue the switch from 'thinking' to the reply bubble (once per turn)."""
+        if self._reply_cursor is None:
+            self._reply_cursor = self._new_mark("cursor")
+            self._queue_call(self._open_reply, self._thinking_mark, self._reply_cursor)
+        return self._reply_cursor
+
+    def _trim_scrollback(self):
+        """Move messages beyond MAX_SCREEN_MESSAGES off the top of the widget."""
+        excess = len(self._blocks) - MAX_SCREEN_MESSAGES
+        if excess <= 0:
+            return
+        text = self.chat_text
+        first = self._blocks[0]
+        removed, gone = [], []
+        while excess > 0 and len(self._blocks) > 1 and self._blocks[0] not in self._active_marks:
+            mark = self._blocks.popleft()
+            body = text.get(mark, self._blocks[0])
+            tags = [t for t in text.tag_names(mark) if t in ("user", "bot", "system")]
+            removed.append((body[:-2] if body.endswith("\n\n") else body, tags[0] if tags else "system"))
+            gone.append(mark)
+            excess -= 1
+        if not removed:
+            return
+        text.delete(first, self._blocks[0])
+        text.mark_unset(*gone)
+        self._trimmed.extend(removed)
+        self._update_earlier_line()
+
+    def _insert_at_top(self, index, chars, tags):
+        """Insert above the first message (its mark must not be pushed down with it)."""
+        first = self._blocks[0] if self._blocks else None
+        if first is not None:
+            self.chat_text.mark_gravity(first, "right")
+        self.chat_text.insert(index, chars, tags)
+        if first is not None:
+            self.chat_text.mark_gravity(first, "left")
+
+    def _update_earlier_line(self):
+        ranges = self.chat_text.tag_ranges("earlier")
+        if ranges:
+            self.chat_text.delete(ranges[0], ranges[-1])
+        if self._trimmed:
+            self._insert_at_top(
+                "1.0", f"⬆  Show earlier messages ({len(self._trimmed)})\n", ("system", "earlier")
+            )
+
+    def show_earlier(self):
+        """Bring back the last EARLIER_PAGE trimmed messages above the first one shown."""
+        if not self._trimmed or not self._blocks:
+            return
+        page = self._trimmed[-EARLIER_PAGE:]
+        del self._trimmed[-EARLIER_PAGE:]
+        # newest first, each one going on top of the previous
+        for body, tag in reversed(page):
+            mark, cursor = self._new_mark("msg"), self._new_mark("cursor")
+            self._queue_call(self._begin_restore, mark, cursor)
+            self._queue_text(cursor, body + "\n", (tag,))
+            self._queue_text(cursor, "\n")
+            self._queue_call(self._end_restore, mark, cursor)
+        self._queue_call(self._update_earlier_line)
+        self._render_frame()
+
+    def _begin_restore(self, mark, cursor):
+        first = self._blocks[0]
+        index = self.chat_text.index(first)
+        # keep the current first message below everything inserted at `cursor`
+        self.chat_text.mark_gravity(first, "right")
+        self.chat_text.mark_set(mark, index)
+        self.chat_text.mark_gravity(mark, "left")
+        self.chat_text.mark_set(cursor, index)
+        self.chat_text.mark_gravity(cursor, "right")
+        self._blocks.appendleft(mark)
+        self._active_marks.add(mark)
+
+    def _end_restore(self, mark, cursor):
+        if len(self._blocks) > 1:
+            self.chat_text.mark_gravity(self._blocks[1], "left")
+        self.chat_text.mark_unset(cursor)
+        self._active_marks.discard(mark)
+
+    # ------------------------------------------------------------------
+    #  Input
+    # ------------------------------------------------------------------
 
     def on_send(self, event):
         user_text = self.entry_var.get().strip()
@@ -408,55 +697,135 @@ class LangzainGUI(tk.Tk):
             return
 
         if user_text.lower() in {"exit", "quit"}:
-            self.destroy()
+            self.on_close()
             return
 
         self._append_user_line(user_text)
         self.entry_var.set("")
+        self._scroll_to_end = True
 
-        self.messages.append({"role": "user", "content": user_text})
+        # a turn is still running – queue this one, it starts when that finishes
+        if self._turn_id is not None:
+            self._pending.append(user_text)
+            return
 
-        # show temporary thinking indicator
-        thinking_index = self._append_thinking_line()
+        self._start_turn(user_text)
 
-        # run the agent (blocking, but UI already shows 'thinking…')
-        self.messages = run_agent(self.messages)
+    def on_stop(self):
+        """Cancel the turn in flight; its result (if any) is thrown away."""
+        if self._turn_id is None:
+            return
+        self._cancel_event.set()
+        if self._reply_cursor is not None:
+            self._queue_text(self._reply_cursor, "  ⏹", ("bot",))
+        else:
+            self._queue_call(self._replace_thinking_line, self._thinking_mark, "⏹  Stopped.", "system")
+        self._finish_turn()
+
+    def on_close(self):
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+        self.after_cancel(self._poll_job)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
+    # ------------------------------------------------------------------
+    #  Agent turns (worker thread <-> Tk loop)
+    # ------------------------------------------------------------------
 
-        bot_reply = self.extract_last_assistant_message(self.messages)
+    def _start_turn(self, user_text: str):
+        self.conversation.add_user(user_text)
 
-        # remove 'thinking…' and show final answer
-        self._remove_thinking_line(thinking_index)
-        self._append_bot_line(bot_reply)
+        self._turn_counter += 1
+        self._turn_id = self._turn_counter
+        self._cancel_event = threading.Event()
+
+        # show temporary thinking indicator
+        self._thinking_mark = self._append_thinking_line()
+        self._reply_cursor = None
+        self.stop_btn.configure(state="normal")
+
+        self._executor.submit(
+            self._run_turn, self._turn_id, list(self.conversation.raw), self._cancel_event
+        )
+
+    def _run_turn(self, turn_id, messages, cancel_event):
+        """Runs on a worker thread – never touch Tk widgets in here."""
+        new_messages = []
+        try:
+            for event in stream_agent(messages):
+                # checked between streamed chunks, so Stop takes effect quickly
+                if cancel_event.is_set():
+                    return
+                if event["type"] == "token":
+                    self._results.put((turn_id, "token", event["text"]))
+                elif event["type"] == "done":
+                    new_messages = event["new_messages"]
+        except Exception as exc:
+            self._results.put((turn_id, "error", exc))
+            return
+        self._results.put((turn_id, "done", new_messages))
+
+    def _poll_results(self):
+        """Once per frame: apply what the worker sent, then render."""
+        try:
+            while True:
+                turn_id, kind, payload = self._results.get_nowait()
+                # ignore results from turns that were stopped
+                if turn_id != self._turn_id:
+                    continue
+
+                if kind == "token":
+                    self._queue_text(self._start_reply(), payload, ("bot",))
+                    continue
+
+                if kind == "done":
+                    self.conversation.extend(payload)
+                    self._save_messages()
+                    # provider without streaming: the whole reply arrives now
+                    if self._reply_cursor is None:
+                        bot_reply = self.conversation.last_reply or NO_REPLY
+                        self._queue_text(self._start_reply(), bot_reply, ("bot",))
+                elif self._reply_cursor is not None:
+                    self._queue_text(self._reply_cursor, f"\n⚠️  Something went wrong: {payload}", ("bot",))
+                else:
+                    self._queue_call(
+                        self._replace_thinking_line,
+                        self._thinking_mark, f"⚠️  Something went wrong: {payload}", "system",
+                    )
+                self._finish_turn()
+        except queue.Empty:
+            pass
+
+        self._render_frame()
+        self._poll_job = self.after(POLL_INTERVAL_MS, self._poll_results)
+
+    def _finish_turn(self):
+        mark, cursor = self._thinking_mark, self._reply_cursor
+        self._queue_call(self._end_turn_marks, mark, cursor)
+        self._turn_id = None
+        self._reply_cursor = None
+        self.stop_btn.configure(state="disabled")
+
+        # next queued message, if the user typed ahead
+        if self._pending:
+            self._start_turn(self._pending.popleft())
+
+    def _end_turn_marks(self, mark, cursor):
+        # the reply is complete: its block may be trimmed later, its cursor is done
+        self._active_marks.discard(mark)
+        if cursor is not None:
+            self.chat_text.mark_unset(cursor)
 
     @staticmethod
     def extract_last_assistant_message(messages):
-        for m in reversed(messages):
-            role = None
-            content = None
-
-            if hasattr(m, "content"):
-                role = getattr(m, "type", None) or getattr(m, "role", None)
-                content = getattr(m, "content", "")
-            elif isinstance(m, dict):
-                role = m.get("role")
-                content = m.get("content", "")
-
-            if role in ("assistant", "ai"):
-                if isinstance(content, list):
-                    parts = []
-                    for part in content:
-                        if isinstance(part, dict) and part.get("type") == "text":
-                            parts.append(part.get("text", ""))
-                    if parts:
-                        return "".join(parts)
-                    return str(content)
-                return str(content)
-
-        return "[No assistant reply found]"
+        return last_assistant_text(messages)
 
 
 def main():
     app = LangzainGUI()
+    # window is up already; the agent finishes building in the background
+    warm_up()
     app.mainloop()
 
 
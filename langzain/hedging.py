@@ -0,0 +1,338 @@
+# hedging.py
+"""
+Hedged requests across several OpenAI-compatible endpoints.
+
+With LANGZAIN_LLM_FALLBACKS set, the agent's chat model is a HedgedChatModel
+over OPENAI_BASE_URL / OPENAI_MODULE (the primary) followed by the
+fallbacks, in priority order:
+
+    LANGZAIN_LLM_FALLBACKS="https://b.example/v1, https://c.example/v1|gpt-4o-mini|C_API_KEY"
+
+(each entry is url[|model[|env var holding the API key]]; the model
+defaults to the primary's, the key to OPENAI_API_KEY.)
+
+Every call starts on the first healthy endpoint. If it hasn't answered
+within its hedge deadline – the p95 of its recent latencies (time to the
+first chunk for streamed calls), LANGZAIN_HEDGE_DELAY until there are
+enough samples – the same request also goes to the next endpoint, and so
+on. The first answer wins and the others are cancelled: async calls are
+cancelled outright, sync calls are left to finish in the background and
+their result is thrown away (a losing stream is closed at its first chunk).
+A call that fails moves on to the next endpoint straight away.
+
+An endpoint that fails FAILURE_THRESHOLD times in a row is circuit-broken
+for COOLDOWN seconds, then gets one trial call; if that works it's back.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import math
+import os
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from langzain.metrics import REGISTRY
+
+DEFAULT_HEDGE_DELAY = 1.0   # seconds, until an endpoint has MIN_SAMPLES latencies
+MIN_HEDGE_DELAY = 0.05
+MIN_SAMPLES = 10
+LATENCY_WINDOW = 200        # recent latencies kept per endpoint and call kind
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30.0
+POOL_SIZE = 32
+
+HEDGES = REGISTRY.counter("langzain_llm_hedges_total", "Hedged (duplicate) LLM requests sent", ["endpoint"])
+WINS = REGISTRY.counter("langzain_llm_hedge_wins_total", "LLM calls answered first, by endpoint", ["endpoint"])
+FAILURES = REGISTRY.counter("langzain_llm_endpoint_failures_total", "Failed LLM calls, by endpoint", ["endpoint"])
+CIRCUIT_OPEN = REGISTRY.gauge("langzain_llm_circuit_open", "1 while an endpoint is circuit-broken", ["endpoint"])
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="langzain-hedge")
+    return _pool
+
+
+def parse_fallbacks(spec, default_model):
+    """LANGZAIN_LLM_FALLBACKS -> [(base_url, model, api_key_env), ...]"""
+    endpoints = []
+    for entry in (spec or "").split(","):
+        parts = [p.strip() for p in entry.split("|")]
+        if not parts[0]:
+            continue
+        model = parts[1] if len(parts) > 1 and parts[1] else default_model
+        key_env = parts[2] if len(parts) > 2 and parts[2] else "OPENAI_API_KEY"
+        endpoints.append((parts[0], model, key_env))
+    return endpoints
+
+
+class Endpoint:
+    """One chat model plus its latency history and circuit breaker."""
+
+    def __init__(self, name, model, hedge_delay=DEFAULT_HEDGE_DELAY):
+        self.name = name
+        self.model = model
+        self.hedge_delay = hedge_delay
+        self._latencies = {"first": collections.deque(maxlen=LATENCY_WINDOW),
+                           "full": collections.deque(maxlen=LATENCY_WINDOW)}
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def deadline(self, kind):
+        """How long to wait for this endpoint before hedging: p95 of recent calls."""
+        with self._lock:
+            samples = sorted(self._latencies[kind])
+        if len(samples) < MIN_SAMPLES:
+            return self.hedge_delay
+        p95 = samples[max(0, math.ceil(0.95 * len(samples)) - 1)]
+        return max(MIN_HEDGE_DELAY, p95)
+
+    def available(self):
+        """False while circuit-broken; after the cooldown one trial call gets through."""
+        with self._lock:
+            if self._failures < FAILURE_THRESHOLD:
+                return True
+            if self._trial or time.monotonic() < self._open_until:
+                return False
+            self._trial = True
+            return True
+
+    def succeeded(self, kind, seconds):
+        with self._lock:
+            self._latencies[kind].append(seconds)
+            self._failures = 0
+            self._trial = False
+        CIRCUIT_OPEN.set(0, endpoint=self.name)
+
+    def cancelled(self):
+        # a trial call that lost the race says nothing either way
+        with self._lock:
+            self._trial = False
+
+    def failed(self):
+        FAILURES.inc(endpoint=self.name)
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._failures >= FAILURE_THRESHOLD:
+                self._open_until = time.monotonic() + COOLDOWN
+                broken = True
+            else:
+                broken = False
+        if broken:
+            CIRCUIT_OPEN.set(1, endpoint=self.name)
+
+
+class _Race:
+    """Bookkeeping shared by the sync and async races of one call."""
+
+    def __init__(self, endpoints, kind):
+        self.endpoints = endpoints
+        self.kind = kind
+        self.remaining = list(endpoints)
+        self.started = {}
+        self.current = None   # the endpoint launched last
+        self.error = None
+
+    def launch(self):
+        """The next endpoint to send the call to, None if there is none left."""
+        while self.remaining:
+            endpoint = self.remaining.pop(0)
+            if endpoint.available():
+                break
+        else:
+            if self.started:
+                return None
+            endpoint = self.endpoints[0]   # everything is broken: try the primary anyway
+        if self.started:
+            HEDGES.inc(endpoint=endpoint.name)
+        self.started[endpoint] = time.perf_counter()
+        self.current = endpoint
+        return endpoint
+
+    def deadline(self):
+        """How long to give the endpoint just launched before hedging (None: nothing left to hedge to)."""
+        return self.current.deadline(self.kind) if self.remaining else None
+
+    def won(self, endpoint):
+        endpoint.succeeded(self.kind, time.perf_counter() - self.started[endpoint])
+        WINS.inc(endpoint=endpoint.name)
+
+    def lost(self, endpoint, exc):
+        endpoint.failed()
+        self.error = exc
+
+
+class HedgedChatModel(BaseChatModel):
+    """A chat model that sends each call to several endpoints; see the module docstring."""
+
+    endpoints: list
+
+    @property
+    def _llm_type(self):
+        return "hedged-chat"
+
+    @property
+    def _identifying_params(self):
+        return {"endpoints": [(e.name, getattr(e.model, "model_name", None)) for e in self.endpoints]}
+
+    def bind_tools(self, tools, **kwargs):
+        # every endpoint speaks the OpenAI API – let the primary format the tools
+        bound = self.endpoints[0].model.bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    # -- sync -------------------------------------------------------------
+
+    def _race(self, kind, start, discard=None):
+        """Run start(endpoint) on the pool with hedging; returns (endpoint, result)."""
+        race = _Race(self.endpoints, kind)
+        pending = {}
+
+        def launch():
+            endpoint = race.launch()
+            if endpoint is not None:
+                pending[_get_pool().submit(start, endpoint)] = endpoint
+
+        launch()
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, timeout=race.deadline(), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                launch()   # too slow: hedge
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    race.lost(endpoint, exc)
+                    continue
+                race.won(endpoint)
+                for loser, loser_endpoint in pending.items():
+                    loser_endpoint.cancelled()
+                    if not loser.cancel() and discard:
+                        loser.add_done_callback(discard)
+                return endpoint, result
+            if not pending:
+                launch()   # failed: fail over now
+        raise race.error
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        _, result = self._race("full", lambda e: e.model._generate(messages, stop=stop, **kwargs))
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        def first_chunk(endpoint):
+            stream = endpoint.model._stream(messages, stop=stop, **kwargs)
+            return stream, next(stream, None)
+
+        def close_loser(future):
+            if not future.cancelled() and future.exception() is None:
+                future.result()[0].close()
+
+        _, (stream, chunk) = self._race("first", first_chunk, discard=close_loser)
+        if chunk is None:
+            return
+        try:
+            yield chunk
+            yield from stream
+        finally:
+            stream.close()
+
+    # -- async ------------------------------------------------------------
+
+    async def _arace(self, kind, start, discard=None):
+        race = _Race(self.endpoints, kind)
+        pending = {}
+
+        def launch():
+            endpoint = race.launch()
+            if endpoint is not None:
+                pending[asyncio.ensure_future(start(endpoint))] = endpoint
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=race.deadline(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as exc:
+                        race.lost(endpoint, exc)
+                        continue
+                    race.won(endpoint)
+                    return endpoint, result
+                if not pending:
+                    launch()
+            raise race.error
+        finally:
+            # the losers (or everything, if we were cancelled ourselves)
+            for task, endpoint in pending.items():
+                endpoint.cancelled()
+                task.cancel()
+            for task in pending:
+                try:
+                    result = await task
+                except BaseException:
+                    continue
+                if discard:
+                    await discard(result)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        _, result = await self._arace("full", lambda e: e.model._agenerate(messages, stop=stop, **kwargs))
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async def first_chunk(endpoint):
+            stream = endpoint.model._astream(messages, stop=stop, **kwargs)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def close_loser(result):
+            await result[0].aclose()
+
+        _, (stream, chunk) = await self._arace("first", first_chunk, discard=close_loser)
+        if chunk is None:
+            return
+        try:
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+
+def hedge_delay():
+    value = os.getenv("LANGZAIN_HEDGE_DELAY", "").strip()
+    return float(value) if value else DEFAULT_HEDGE_DELAY
+
+
+def hedged_model(models, cache=None):
+    """HedgedChatModel over [(name, chat model), ...] in priority order."""
+    delay = hedge_delay()
+    return HedgedChatModel(
+        endpoints=[Endpoint(name, model, delay) for name, model in models],
+        cache=cache,
+    )
@@ -0,0 +1,207 @@
+# history.py
+"""
+Keep what we send to the model within a token budget.
+
+The front ends keep the whole conversation, but resending all of it every
+turn makes each turn slower (and pricier) than the last. HistoryPolicy
+picks the window that actually goes to the agent:
+
+  1. if the conversation fits the budget, send it as is
+  2. otherwise elide bulky tool outputs (e.g. Wikipedia summaries) from
+     all but the last few turns
+  3. if it still doesn't fit, replace the oldest turns with a rolling
+     summary. Summaries are cached by conversation prefix, so each one is
+     computed once and reused on later turns; when the window has to move
+     again, the new summary is built from the previous one plus the turns
+     that dropped out – never from the whole transcript.
+
+Token counts are estimates (~4 characters per token), which is plenty
+for deciding what to cut.
+"""
+import hashlib
+import json
+
+try:
+    from .cache import LRUCache
+    from .messages import role_and_text
+except ImportError:
+    from langzain.cache import LRUCache
+    from langzain.messages import role_and_text
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4   # role, separators, ...
+
+SUMMARY_PREFIX = "Summary of the earlier part of this conversation:\n"
+
+
+def _role_and_text(m):
+    """Role + text of a message, with any tool calls counted as text too."""
+    role, text = role_and_text(m)
+    tool_calls = m.get("tool_calls") if isinstance(m, dict) else getattr(m, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps(tool_calls, default=str)
+    return role, text
+
+
+def estimate_tokens(m) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + len(_role_and_text(m)[1]) // CHARS_PER_TOKEN
+
+
+def _is_user(m):
+    return _role_and_text(m)[0] == "user"
+
+
+def _is_tool(m):
+    return _role_and_text(m)[0] == "tool"
+
+
+def _with_content(m, content):
+    """Copy of a message with different content (dicts and LangChain messages)."""
+    if isinstance(m, dict):
+        return {**m, "content": content}
+    return m.model_copy(update={"content": content})
+
+
+class HistoryPolicy:
+    """
+    max_tokens        – budget for the messages sent each turn (None = no limit)
+    keep_tool_turns   – the last N turns keep their tool outputs intact
+    tool_output_chars – how much of an elided tool output to keep
+    summary_target    – after summarizing, the recent part should take at most
+                        this fraction of the budget (leaves room to grow, so
+                        the summary doesn't have to change every turn)
+    summarizer        – callable(previous_summary, messages) -> str
+                        (None = only elide, never summarize)
+    """
+
+    def __init__(
+        self,
+        max_tokens=8000,
+        keep_tool_turns=2,
+        tool_output_chars=300,
+        summary_target=0.5,
+        summarizer=None,
+    ):
+        self.max_tokens = max_tokens
+        self.keep_tool_turns = keep_tool_turns
+        self.tool_output_chars = tool_output_chars
+        self.summary_target = summary_target
+        self.summarizer = summarizer
+        # prefix hash -> summary of that prefix
+        self._summaries = LRUCache(maxsize=256)
+
+    def apply(self, messages):
+        """Return the list of messages to send this turn (never mutates `messages`)."""
+        if not self.max_tokens or not messages:
+            return messages
+
+        sizes = [estimate_tokens(m) for m in messages]
+        if sum(sizes) <= self.max_tokens:
+            return messages
+
+        turn_starts = [i for i, m in enumerate(messages) if _is_user(m)]
+
+        # 1. elide tool outputs from older turns
+        window = self._elide_tool_outputs(messages, turn_starts)
+        sizes = [estimate_tokens(m) for m in window]
+        if sum(sizes) <= self.max_tokens or self.summarizer is None:
+            return window
+
+        # 2. summarize the oldest turns
+        return self._summarize_prefix(messages, window, sizes, turn_starts)
+
+    def _elide_tool_outputs(self, messages, turn_starts):
+        if len(turn_starts) <= self.keep_tool_turns:
+            return messages
+        cutoff = turn_starts[-self.keep_tool_turns] if self.keep_tool_turns else len(messages)
+
+        window = list(messages)
+        for i in range(cutoff):
+            m = window[i]
+            if not _is_tool(m):
+                continue
+            text = _role_and_text(m)[1]
+            if len(text) > self.tool_output_chars:
+                window[i] = _with_content(
+                    m,
+                    text[: self.tool_output_chars]
+                    + f" … [{len(text) - self.tool_output_chars} more characters elided]",
+                )
+        return window
+
+    def _summarize_prefix(self, messages, window, sizes, turn_starts):
+        # we only cut at the start of a user turn (never between a tool call and
+        # its result) and always keep the latest turn
+        cut_points = [i for i in turn_starts if i > 0]
+        if not cut_points:
+            return window
+
+        # keyed on the original messages, so elision changes don't matter
+        prefix_hashes = self._prefix_hashes(messages, cut_points)
+        suffix_tokens = {}
+        running = 0
+        for i in range(len(window) - 1, -1, -1):
+            running += sizes[i]
+            suffix_tokens[i] = running
+
+        # reuse the latest cached summary if the window still fits with it
+        best_cached = None
+        for cut in cut_points:
+            summary = self._summaries.get(prefix_hashes[cut])
+            if summary is not None:
+                best_cached = (cut, summary)
+        if best_cached is not None:
+            cut, summary = best_cached
+            if self._summary_tokens(summary) + suffix_tokens[cut] <= self.max_tokens:
+                return [self._summary_message(summary)] + window[cut:]
+
+        # otherwise move the window: keep recent turns within summary_target
+        target = self.max_tokens * self.summary_target
+        new_cut = cut_points[-1]
+        for cut in cut_points:
+            if suffix_tokens[cut] <= target:
+                new_cut = cut
+                break
+
+        # build on the previous summary if there is one for an earlier cut
+        previous_summary, start = "", 0
+        if best_cached is not None and best_cached[0] < new_cut:
+            start, previous_summary = best_cached
+
+        summary = self.summarizer(previous_summary, window[start:new_cut])
+        self._summaries.set(prefix_hashes[new_cut], summary)
+        return [self._summary_message(summary)] + window[new_cut:]
+
+    @staticmethod
+    def _prefix_hashes(messages, cut_points):
+        """Hash of messages[:cut] for every cut point, in one pass."""
+        wanted = set(cut_points)
+        hashes = {}
+        h = hashlib.sha1()
+        for i, m in enumerate(messages):
+            if i in wanted:
+                hashes[i] = h.hexdigest()
+            role, text = _role_and_text(m)
+            h.update(f"{role}\x00{text}\x01".encode("utf-8", "replace"))
+        return hashes
+
+    @staticmethod
+    def _summary_message(summary):
+        return {"role": "system", "content": SUMMARY_PREFIX + summary}
+
+    @staticmethod
+    def _summary_tokens(summary):
+        return estimate_tokens({"role": "system", "content": SUMMARY_PREFIX + summary})
+
+
+def format_for_summary(previous_summary, messages):
+    """Prompt text asking the model to (re)summarize a stretch of conversation."""
+    lines = []
+    if previous_summary:
+        lines.append(f"Summary so far:\n{previous_summary}\n")
+    lines.append("New messages:")
+    for m in messages:
+        role, text = _role_and_text(m)
+        if text:
+            lines.append(f"{role}: {text}")
+    return "\n".join(lines)
@@ -0,0 +1,131 @@
+# http_client.py
+"""
+One shared HTTP client for all tools.
+
+Every tool call used to open a fresh connection (TCP + TLS handshake each
+time). Instead, all tools go through http_get(), which uses a single
+requests.Session with:
+  - keep-alive connection pools per host (at most MAX_CONNECTIONS_PER_HOST)
+  - retries with bounded exponential backoff for idempotent requests
+    (connection errors, 429 and 5xx – Retry-After is honoured)
+  - per-host timings, see http_stats()
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = "langzain/0.1 (https://github.com/mzzoony/Langzain)"
+DEFAULT_TIMEOUT = 10           # seconds (connect + read)
+
+MAX_HOSTS = 16                 # how many per-host pools to keep around
+MAX_CONNECTIONS_PER_HOST = 8   # extra requests wait for a free connection
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3            # 0.3s, 0.6s, 1.2s, ...
+RETRY_BACKOFF_MAX = 4          # ... but never more than this between tries
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _make_retry():
+    options = dict(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),   # only idempotent requests
+        respect_retry_after_header=True,
+        raise_on_status=False,   # hand the last response back, raise_for_status() decides
+    )
+    try:
+        return Retry(backoff_max=RETRY_BACKOFF_MAX, **options)
+    except TypeError:
+        # urllib3 < 2 has the cap as a class attribute
+        retry = Retry(**options)
+        retry.BACKOFF_MAX = RETRY_BACKOFF_MAX
+        return retry
+
+
+def get_session() -> requests.Session:
+    """The shared session (created on first use)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=MAX_HOSTS,
+                    pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+                    pool_block=True,   # cap connections per host instead of opening more
+                    max_retries=_make_retry(),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _session = session
+    return _session
+
+
+class _HostTimings:
+    """Request count / errors / durations for one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=500)   # for percentiles
+
+    def record(self, seconds, ok):
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_seconds": self.total_seconds / self.requests if self.requests else 0.0,
+            "p50_seconds": pct(0.50),
+            "p95_seconds": pct(0.95),
+            "max_seconds": self.max_seconds,
+        }
+
+
+_timings = defaultdict(_HostTimings)
+_timings_lock = threading.Lock()
+
+
+def http_get(url, params=None, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """
+    GET through the shared session, recording how long it took.
+    Same arguments / return value as requests.get.
+    """
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    ok = False
+    try:
+        resp = get_session().get(url, params=params, timeout=timeout, **kwargs)
+        ok = resp.ok
+        return resp
+    finally:
+        with _timings_lock:
+            _timings[host].record(time.perf_counter() - start, ok)
+
+
+def http_stats():
+    """Per-host request timings, e.g. {"api.open-meteo.com": {"requests": 3, ...}}."""
+    with _timings_lock:
+        return {host: t.summary() for host, t in _timings.items()}
@@ -0,0 +1,255 @@
+# instrumentation.py
+"""
+Where does the time in a turn go?
+
+TurnRecorder is a LangChain callback handler that run_agent / stream_agent
+attach to every turn. It records
+  - wall time of the turn, and how long picking the history window took
+  - every LLM call: duration, prompt / completion tokens
+  - every tool call: name, duration, ok / error
+  - time to first token (streamed turns)
+  - the router's decision, if the turn was routed (see router.py)
+
+When the turn ends the trace is
+  - appended as one JSON line to LANGZAIN_TRACE_FILE (if set)
+  - added to the Prometheus-style metrics in metrics.py
+  - available from last_trace() / the "done" event of stream_agent
+
+format_profile() turns a trace into the breakdown `langzain-cli --profile`
+prints after each reply.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from langzain.metrics import REGISTRY
+
+TURNS = REGISTRY.counter("langzain_turns_total", "Agent turns", ["status"])
+TURN_SECONDS = REGISTRY.histogram("langzain_turn_seconds", "Wall time of an agent turn")
+TTFT_SECONDS = REGISTRY.histogram("langzain_time_to_first_token_seconds", "Time to the first streamed token")
+LLM_CALLS = REGISTRY.counter("langzain_llm_calls_total", "LLM calls", ["status"])
+LLM_SECONDS = REGISTRY.histogram("langzain_llm_call_seconds", "Duration of one LLM call")
+TOKENS = REGISTRY.counter("langzain_llm_tokens_total", "Tokens used", ["kind"])
+TOOL_CALLS = REGISTRY.counter("langzain_tool_calls_total", "Tool calls", ["tool", "status"])
+TOOL_SECONDS = REGISTRY.histogram("langzain_tool_call_seconds", "Duration of one tool call", ["tool"])
+
+_trace_lock = threading.Lock()
+_last_trace = contextvars.ContextVar("langzain_last_trace", default=None)
+
+
+def _token_usage(response):
+    """(prompt, completion) tokens of an LLMResult, 0 when the provider didn't say."""
+    for generations in response.generations:
+        for g in generations:
+            usage = getattr(getattr(g, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+
+
+class TurnRecorder(BaseCallbackHandler):
+    """Collects the timings of one agent turn (attach via config={"callbacks": [...]})."""
+
+    run_inline = True   # cheap – no need to hop to a thread in async runs
+
+    def __init__(self):
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._open = {}      # run_id -> step dict still running
+        self.steps = []
+        self.history_seconds = 0.0
+        self.ttft_seconds = None
+        self.route = None    # router decision (dict), set before the turn runs
+        self.trace = None
+
+    def _now(self):
+        return time.perf_counter() - self._start
+
+    def _begin(self, run_id, step):
+        step["start"] = round(self._now(), 6)
+        with self._lock:
+            self._open[run_id] = step
+            self.steps.append(step)
+
+    def _end(self, run_id, status, **extra):
+        with self._lock:
+            step = self._open.pop(run_id, None)
+        if step is not None:
+            step["seconds"] = round(self._now() - step["start"], 6)
+            step["status"] = status
+            step.update(extra)
+        return step
+
+    # -- history -----------------------------------------------------------
+
+    def timed_window(self, window_fn, messages):
+        """Run window_fn(messages) and count it as history handling."""
+        start = time.perf_counter()
+        try:
+            return window_fn(messages)
+        finally:
+            self.history_seconds += time.perf_counter() - start
+
+    # -- LLM ---------------------------------------------------------------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._begin(run_id, {"kind": "llm"})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._begin(run_id, {"kind": "llm"})
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if self.ttft_seconds is None and token:
+            self.ttft_seconds = round(self._now(), 6)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt, completion = _token_usage(response)
+        self._end(run_id, "ok", prompt_tokens=prompt, completion_tokens=completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error", error=repr(error))
+
+    # -- tools -------------------------------------------------------------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "?"
+        self._begin(run_id, {"kind": "tool", "name": name})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        # tools that fail "softly" return a ToolMessage with status="error"
+        status = getattr(output, "status", "success")
+        self._end(run_id, "error" if status == "error" else "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error", error=repr(error))
+
+    # -- end of turn -------------------------------------------------------
+
+    def finish(self, error=None):
+        """Close the turn: build the trace, export it, return it."""
+        if self.trace is not None:
+            return self.trace
+        wall = self._now()
+        with self._lock:
+            # anything still open was cut short (error / consumer stopped early)
+            for run_id in list(self._open):
+                self._open[run_id]["status"] = "cancelled"
+                self._open[run_id]["seconds"] = round(wall - self._open[run_id]["start"], 6)
+            self._open.clear()
+            steps = sorted(self.steps, key=lambda s: s["start"])
+
+        if error is None:
+            status = "ok"
+        elif isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+            status = "cancelled"   # the caller stopped listening
+        else:
+            status = "error"
+
+        llm = [s for s in steps if s["kind"] == "llm"]
+        tools = [s for s in steps if s["kind"] == "tool"]
+        llm_seconds = sum(s.get("seconds", 0) for s in llm)
+        tool_seconds = sum(s.get("seconds", 0) for s in tools)
+        self.trace = {
+            "turn_id": self.turn_id,
+            "started_at": self.started_at,
+            "status": status,
+            "error": repr(error) if status == "error" else None,
+            "wall_seconds": round(wall, 6),
+            "history_seconds": round(self.history_seconds, 6),
+            "ttft_seconds": self.ttft_seconds,
+            "llm_calls": len(llm),
+            "llm_seconds": round(llm_seconds, 6),
+            "prompt_tokens": sum(s.get("prompt_tokens", 0) for s in llm),
+            "completion_tokens": sum(s.get("completion_tokens", 0) for s in llm),
+            "tool_calls": len(tools),
+            "tool_seconds": round(tool_seconds, 6),
+            "route": self.route,
+            # agent / message handling; tools may overlap, hence the floor
+            "other_seconds": round(max(0.0, wall - self.history_seconds - llm_seconds - tool_seconds), 6),
+            "steps": steps,
+        }
+        record_turn(self.trace)
+        return self.trace
+
+
+def trace_file():
+    return os.getenv("LANGZAIN_TRACE_FILE") or None
+
+
+def record_turn(trace):
+    """Export a finished trace: metrics, JSONL trace file, last_trace()."""
+    _last_trace.set(trace)
+
+    TURNS.inc(status=trace["status"])
+    TURN_SECONDS.observe(trace["wall_seconds"])
+    if trace["ttft_seconds"] is not None:
+        TTFT_SECONDS.observe(trace["ttft_seconds"])
+    TOKENS.inc(trace["prompt_tokens"], kind="prompt")
+    TOKENS.inc(trace["completion_tokens"], kind="completion")
+    for step in trace["steps"]:
+        if step["kind"] == "llm":
+            LLM_CALLS.inc(status=step["status"])
+            LLM_SECONDS.observe(step.get("seconds", 0))
+        else:
+            TOOL_CALLS.inc(tool=step["name"], status=step["status"])
+            TOOL_SECONDS.observe(step.get("seconds", 0), tool=step["name"])
+    if trace.get("route"):
+        from .router import check
+
+        check(trace)
+
+    path = trace_file()
+    if path:
+        line = json.dumps(trace, default=str)
+        try:
+            with _trace_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as exc:
+            print(f"[langzain] could not write trace to {path}: {exc}")
+
+
+def last_trace():
+    """Trace of the last turn finished in this thread / task (None before the first)."""
+    return _last_trace.get()
+
+
+def format_profile(trace) -> str:
+    """Per-turn breakdown, as printed by `langzain-cli --profile`."""
+    lines = [
+        f"  [profile] turn {trace['wall_seconds']:.2f}s ({trace['status']})"
+        f" | history {trace['history_seconds']:.3f}s"
+        f" | {trace['llm_calls']} LLM call(s) {trace['llm_seconds']:.2f}s"
+        f" | {trace['tool_calls']} tool call(s) {trace['tool_seconds']:.2f}s"
+        f" | other {trace['other_seconds']:.3f}s"
+    ]
+    route = trace.get("route")
+    if route:
+        lines[0] += f" | route {route['route']} ({route['confidence']:.2f}, {route['mode']})"
+    tokens = f"  [profile] tokens {trace['prompt_tokens']} prompt / {trace['completion_tokens']} completion"
+    if trace["ttft_seconds"] is not None:
+        tokens += f" | first token after {trace['ttft_seconds']:.2f}s"
+    lines.append(tokens)
+    for step in trace["steps"]:
+        seconds = step.get("seconds", 0)
+        if step["kind"] == "llm":
+            label = "llm"
+            detail = step["status"]
+            if step["status"] == "ok":
+                detail = f"{step.get('prompt_tokens', 0)}+{step.get('completion_tokens', 0)} tokens"
+        else:
+            label = f"tool {step['name']}"
+            detail = step["status"]
+        lines.append(f"    {step['start']:7.3f}s  {label:<32} {seconds:7.3f}s  {detail}")
+    return "\n".join(lines)
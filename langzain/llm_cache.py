@@ -0,0 +1,132 @@
+# llm_cache.py
+"""
+Optional cache of LLM responses.
+
+The agent runs at temperature=0, so sending the same conversation again
+(eval runs, regression suites, ...) should give the same answer – no need
+to ask the provider twice. ResponseCache plugs into LangChain's cache hook
+(ChatOpenAI(cache=...)), so every model call the agent makes – including
+the ones inside tool loops and streamed turns – is looked up first.
+
+The key is a SHA-256 over
+    model + base_url   (the cache namespace)
+    LangChain's llm_string (invocation params, incl. the bound tool schemas)
+    the prompt messages (system prompt included), normalized: ids, token
+    usage and other response metadata are dropped, keys sorted.
+
+Entries live in a memory LRU in front of SQLite (see cache.py), expire
+after LANGZAIN_LLM_CACHE_TTL seconds and the disk store keeps at most
+LANGZAIN_LLM_CACHE_MAX_ENTRIES of them.
+
+Off by default: set LANGZAIN_LLM_CACHE=1 to turn it on. Individual calls
+can skip it with run_agent(..., use_cache=False).
+"""
+import hashlib
+import json
+import os
+import threading
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+try:
+    from .cache import DiskCache, LRUCache, TieredCache, cache_dir
+except ImportError:
+    from langzain.cache import DiskCache, LRUCache, TieredCache, cache_dir
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 20000
+
+# keys that differ between two otherwise identical conversations
+_VOLATILE_KEYS = {"id", "response_metadata", "usage_metadata"}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.getenv("LANGZAIN_LLM_CACHE", "").lower() in ("1", "true", "yes", "on")
+
+
+def _get_store():
+    """The memory + disk store shared by all ResponseCache namespaces."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            ttl = float(os.getenv("LANGZAIN_LLM_CACHE_TTL", DEFAULT_TTL))
+            max_entries = int(os.getenv("LANGZAIN_LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+            _store = TieredCache(
+                LRUCache(maxsize=1024, ttl=ttl),
+                DiskCache(cache_dir() / "llm_responses.sqlite", ttl=ttl, max_entries=max_entries),
+            )
+    return _store
+
+
+def _strip_volatile(obj):
+    if isinstance(obj, dict):
+        return {k: _strip_volatile(v) for k, v in obj.items() if k not in _VOLATILE_KEYS}
+    if isinstance(obj, list):
+        return [_strip_volatile(v) for v in obj]
+    return obj
+
+
+def _canonical_prompt(prompt: str) -> str:
+    """LangChain serializes chat prompts as JSON – normalize it before hashing."""
+    try:
+        data = json.loads(prompt)
+    except ValueError:
+        return prompt
+    return json.dumps(_strip_volatile(data), sort_keys=True, separators=(",", ":"))
+
+
+def cache_key(namespace: str, prompt: str, llm_string: str) -> str:
+    h = hashlib.sha256()
+    for part in (namespace, llm_string, _canonical_prompt(prompt)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _dump_generations(generations):
+    out = []
+    for g in generations:
+        if isinstance(g, ChatGeneration):
+            out.append({"message": message_to_dict(g.message)})
+        else:
+            out.append({"text": g.text})
+    return out
+
+
+def _load_generations(data):
+    generations = []
+    for g in data:
+        if "message" in g:
+            generations.append(ChatGeneration(message=messages_from_dict([g["message"]])[0]))
+        else:
+            generations.append(Generation(text=g["text"]))
+    return generations
+
+
+class ResponseCache(BaseCache):
+    """LangChain cache for one model + endpoint (the namespace)."""
+
+    def __init__(self, model, base_url=None):
+        self.namespace = f"{model}|{base_url or ''}"
+
+    def lookup(self, prompt, llm_string):
+        data = _get_store().get(cache_key(self.namespace, prompt, llm_string))
+        return None if data is None else _load_generations(data)
+
+    def update(self, prompt, llm_string, return_val):
+        _get_store().set(
+            cache_key(self.namespace, prompt, llm_string), _dump_generations(return_val)
+        )
+
+    def clear(self, **kwargs):
+        _get_store().clear()
+
+
+def cache_stats():
+    """Hit / miss counts and hit rate of the response cache."""
+    return _get_store().stats()
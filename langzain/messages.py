@@ -0,0 +1,112 @@
+# messages.py
+"""
+One message model for all front ends.
+
+Messages reach us in two shapes: plain dicts ({"role": "user", "content": ...})
+and LangChain message objects (HumanMessage, AIMessage, ToolMessage, ...)
+whose content may be a string or a list of chunks. Message normalizes either
+shape once; Conversation keeps the raw list for the agent next to the
+normalized one and remembers the last assistant reply, so nobody has to
+scan the history backwards every turn.
+"""
+
+NO_REPLY = "[No assistant reply found]"
+
+# LangChain message types -> the role names used in dict messages
+_ROLES = {"human": "user", "ai": "assistant"}
+
+
+def message_text(content):
+    """Flatten message content (plain text or a list of chunks) to a string."""
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
+    return "" if content is None else str(content)
+
+
+def role_and_text(m):
+    """
+    (role, text) of a dict or LangChain message.
+    Roles are normalized to "user" / "assistant" / "system" / "tool".
+    """
+    if isinstance(m, dict):
+        role = m.get("role")
+        content = m.get("content", "")
+    else:
+        role = getattr(m, "type", None) or getattr(m, "role", None)
+        content = getattr(m, "content", "")
+    return _ROLES.get(role, role), message_text(content)
+
+
+class Message:
+    """A normalized message: role + text, plus the original object."""
+
+    __slots__ = ("role", "text", "raw")
+
+    def __init__(self, role, text, raw=None):
+        self.role = role
+        self.text = text
+        self.raw = raw if raw is not None else {"role": role, "content": text}
+
+    @classmethod
+    def from_any(cls, m):
+        if isinstance(m, Message):
+            return m
+        role, text = role_and_text(m)
+        return cls(role, text, m)
+
+    @property
+    def visible(self):
+        """Worth showing in a chat window (user text or an assistant reply)."""
+        return self.role in ("user", "assistant") and bool(self.text)
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.text[:40]!r})"
+
+
+class Conversation:
+    """
+    The messages of one chat.
+
+    raw       – list to hand to run_agent (dicts / LangChain objects as-is)
+    visible   – normalized user / assistant messages, for rendering
+    last_reply – text of the latest assistant message (O(1); None before the first)
+    """
+
+    __slots__ = ("raw", "visible", "last_reply")
+
+    def __init__(self, messages=()):
+        self.raw = []
+        self.visible = []
+        self.last_reply = None
+        self.extend(messages)
+
+    def append(self, m):
+        msg = Message.from_any(m)
+        self.raw.append(msg.raw)
+        if msg.role == "assistant":
+            self.last_reply = msg.text
+        if msg.visible:
+            self.visible.append(msg)
+
+    def extend(self, messages):
+        for m in messages:
+            self.append(m)
+
+    def add_user(self, text):
+        self.append({"role": "user", "content": text})
+
+    def __len__(self):
+        return len(self.raw)
+
+
+def last_assistant_text(messages):
+    """Text of the last assistant message in a plain list (dicts or LangChain objects)."""
+    for m in reversed(messages):
+        role, text = role_and_text(m)
+        if role == "assistant":
+            return text
+    return NO_REPLY
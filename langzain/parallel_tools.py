@@ -0,0 +1,115 @@
+# parallel_tools.py
+"""
+Several tool calls from one model step, run at the same time.
+
+"Weather in Oslo, Cairo and Lima?" makes the model ask for three
+get_current_temperature calls at once. The agent graph runs every call of
+a step as its own task; this module makes sure that
+  - sync tools (everything in tools.py) run on a dedicated thread pool, also
+    in async turns, so they don't queue up behind asyncio.to_thread work
+  - async tools (async def) are awaited natively – no thread at all
+  - at most LANGZAIN_TOOL_CONCURRENCY calls of a turn run at once: each
+    turn passes its own semaphore in the run config (turn_config())
+  - a failing call turns into an error ToolMessage for that call only; the
+    other results still come back, in the order the model asked for them,
+    and the model gets to decide what to do about the failure
+"""
+import asyncio
+import contextlib
+import functools
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+DEFAULT_TOOL_CONCURRENCY = 8
+TOOL_POOL_SIZE = 32   # shared by all turns; the per-turn cap is tool_concurrency()
+
+SLOTS_KEY = "langzain_tool_slots"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def tool_concurrency() -> int:
+    """How many tool calls one turn may run at once (LANGZAIN_TOOL_CONCURRENCY)."""
+    return max(1, int(os.getenv("LANGZAIN_TOOL_CONCURRENCY", DEFAULT_TOOL_CONCURRENCY)))
+
+
+def turn_config(is_async=False):
+    """The `configurable` entries for one turn (a fresh per-turn slot semaphore)."""
+    n = tool_concurrency()
+    slots = asyncio.Semaphore(n) if is_async else threading.BoundedSemaphore(n)
+    return {SLOTS_KEY: slots}
+
+
+def _slots(request):
+    runtime = getattr(request, "runtime", None)
+    config = getattr(runtime, "config", None) or {}
+    return config.get("configurable", {}).get(SLOTS_KEY)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TOOL_POOL_SIZE, thread_name_prefix="langzain-tool")
+    return _pool
+
+
+def make_tool(fn) -> BaseTool:
+    """A LangChain tool for a plain function, with both a sync and an async path."""
+    if isinstance(fn, BaseTool):
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        # a real function (not a partial): the agent's ToolNode reads its type hints
+        @functools.wraps(fn)
+        def _run_coroutine(**kwargs):
+            # sync turns run tools on worker threads, which have no event loop
+            return asyncio.run(fn(**kwargs))
+
+        tool = StructuredTool.from_function(coroutine=fn)
+        tool.func = _run_coroutine
+        return tool
+
+    tool = StructuredTool.from_function(func=fn)
+
+    async def _in_pool(**kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), functools.partial(fn, **kwargs))
+
+    tool.coroutine = _in_pool
+    return tool
+
+
+def _failed(request, exc):
+    call = request.tool_call
+    return ToolMessage(
+        content=f"Error: {call['name']} failed: {exc}",
+        tool_call_id=call["id"],
+        name=call["name"],
+        status="error",
+    )
+
+
+class ToolCallGuard(AgentMiddleware):
+    """Caps concurrent tool calls per turn; one failing call doesn't take the rest down."""
+
+    def wrap_tool_call(self, request, handler):
+        try:
+            with _slots(request) or contextlib.nullcontext():
+                return handler(request)
+        except Exception as exc:
+            return _failed(request, exc)
+
+    async def awrap_tool_call(self, request, handler):
+        try:
+            async with _slots(request) or contextlib.nullcontext():
+                return await handler(request)
+        except Exception as exc:
+            return _failed(request, exc)
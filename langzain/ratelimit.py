@@ -0,0 +1,340 @@
+# ratelimit.py
+"""
+Client-side rate limiting for LLM calls.
+
+When several sessions (or a batch run) hit the provider at once we used
+to send everything straight away and get a burst of 429s back, then the
+OpenAI client retried them all at about the same time. Now every LLM
+request of the process goes through one RateLimiter per endpoint:
+
+  - token buckets for requests/min (LANGZAIN_LLM_RPM) and tokens/min
+    (LANGZAIN_LLM_TPM); 0 / unset = no limit. A request is charged its
+    prompt size (body bytes / 4) plus max_tokens, or COMPLETION_ESTIMATE
+    when the request doesn't set one.
+  - adaptive concurrency (AIMD): at most `limit` requests in flight. Every
+    successful response adds 1/limit (about +1 per round of requests), a
+    429 or 5xx halves it – at most once per BACKOFF_WINDOW, so one burst
+    of failures counts once. The limit never goes above
+    LANGZAIN_LLM_MAX_CONCURRENCY (default 32) or below 1.
+  - Retry-After (or retry-after-ms) on a 429 / 503 pauses *all* requests to
+    that endpoint, not just the one retried by the client.
+
+It's hooked in as an httpx transport (ChatOpenAI(http_client=...,
+http_async_client=...)), so it sees the real status codes and headers and
+works the same for sync threads and asyncio tasks: state is guarded by a
+threading lock, waiting is time.sleep() or asyncio.sleep(). A streamed
+response keeps its slot until the stream is closed.
+
+How long requests waited is in langzain_llm_queue_wait_seconds.
+"""
+import asyncio
+import email.utils
+import importlib
+import json
+import os
+import threading
+import time
+
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from langzain.metrics import REGISTRY
+
+# the transports must come from the httpx the openai SDK is built on
+# (newer releases ship their own fork, httpx2)
+httpx = importlib.import_module(DefaultHttpxClient.__bases__[0].__module__.split(".")[0])
+
+DEFAULT_MAX_CONCURRENCY = 32
+COMPLETION_ESTIMATE = 512    # tokens charged for the reply when max_tokens isn't set
+BACKOFF_WINDOW = 1.0         # seconds; overload signals closer together count once
+DEFAULT_RETRY_PAUSE = 1.0    # pause after a 429 without Retry-After
+MAX_RETRY_PAUSE = 60.0
+POLL_INTERVAL = 0.02         # how often a queued request re-checks for a free slot
+
+QUEUE_WAIT = REGISTRY.histogram(
+    "langzain_llm_queue_wait_seconds", "Time an LLM request waited for the rate limiter"
+)
+THROTTLED = REGISTRY.counter(
+    "langzain_llm_throttled_total", "LLM responses that signalled overload", ["status"]
+)
+CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "langzain_llm_concurrency_limit", "Current adaptive limit of LLM requests in flight", ["endpoint"]
+)
+IN_FLIGHT = REGISTRY.gauge("langzain_llm_in_flight", "LLM requests in flight", ["endpoint"])
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _env_float(name, default=0.0):
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+class TokenBucket:
+    """`rate_per_minute` units per minute, bursts of up to one minute's worth."""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 = now). Not thread-safe on its own."""
+        self._refill(now)
+        # a request bigger than the whole bucket goes through once it's full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Shared limits for one endpoint; see the module docstring."""
+
+    def __init__(self, rpm=0, tpm=0, max_concurrency=DEFAULT_MAX_CONCURRENCY, name="default"):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_backoff = 0.0
+        self._lock = threading.Lock()
+        CONCURRENCY_LIMIT.set(self.limit, endpoint=name)
+
+    # -- acquiring ------------------------------------------------------
+
+    def _try_acquire(self, cost):
+        """Take a slot and the bucket tokens; returns 0, or how long to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self.paused_until - now
+            if wait > 0:
+                return wait
+            if self.in_flight >= int(self.limit):
+                return POLL_INTERVAL
+            wait = max(
+                self.requests.wait_time(1, now) if self.requests else 0.0,
+                self.tokens.wait_time(cost, now) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                return wait
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(cost)
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight, endpoint=self.name)
+            return 0.0
+
+    def acquire(self, cost=0):
+        start = time.perf_counter()
+        while True:
+            wait = self._try_acquire(cost)
+            if not wait:
+                break
+            time.sleep(wait)
+        QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    async def aacquire(self, cost=0):
+        start = time.perf_counter()
+        while True:
+            wait = self._try_acquire(cost)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight, endpoint=self.name)
+
+    # -- feedback from responses ----------------------------------------
+
+    def on_response(self, status, retry_after=None):
+        """AIMD: additive increase on success, multiplicative decrease on 429 / 5xx."""
+        overloaded = status == 429 or status >= 500
+        with self._lock:
+            now = time.monotonic()
+            if not overloaded:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            else:
+                if now - self._last_backoff >= BACKOFF_WINDOW:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_backoff = now
+                if retry_after is None and status == 429:
+                    retry_after = DEFAULT_RETRY_PAUSE
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + min(retry_after, MAX_RETRY_PAUSE))
+            limit = self.limit
+        CONCURRENCY_LIMIT.set(limit, endpoint=self.name)
+        if overloaded:
+            THROTTLED.inc(status=str(status))
+
+
+def get_limiter(base_url=None):
+    """The process-wide limiter for an endpoint (configured from the environment)."""
+    name = base_url or "default"
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(
+                rpm=_env_float("LANGZAIN_LLM_RPM"),
+                tpm=_env_float("LANGZAIN_LLM_TPM"),
+                max_concurrency=_env_float("LANGZAIN_LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+                name=name,
+            )
+            _limiters[name] = limiter
+    return limiter
+
+
+def estimate_cost(request):
+    """Tokens a chat completion request will use, roughly (prompt + reply budget)."""
+    body = request.content or b""
+    completion = COMPLETION_ESTIMATE
+    try:
+        data = json.loads(body)
+        completion = data.get("max_completion_tokens") or data.get("max_tokens") or completion
+    except ValueError:
+        pass
+    return len(body) // 4 + completion
+
+
+def retry_after(headers):
+    """Seconds from retry-after-ms / Retry-After (delay or HTTP date); None if absent."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+# ----------------------------------------------------------------------
+#  httpx transports
+# ----------------------------------------------------------------------
+
+class _Release:
+    """Gives the slot back exactly once (stream closed, or the request failed)."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.done = False
+
+    def __call__(self):
+        if not self.done:
+            self.done = True
+            self.limiter.release()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, limiter, transport=None):
+        self.limiter = limiter
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        self.limiter.acquire(estimate_cost(request))
+        release = _Release(self.limiter)
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        self.limiter.on_response(response.status_code, retry_after(response.headers))
+        if response.is_closed:   # body already read by the transport
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, limiter, transport=None):
+        self.limiter = limiter
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        await self.limiter.aacquire(estimate_cost(request))
+        release = _Release(self.limiter)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        self.limiter.on_response(response.status_code, retry_after(response.headers))
+        if response.is_closed:   # body already read by the transport
+            release()
+        else:
+            response.stream = _AsyncReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def http_clients(base_url=None):
+    """(sync, async) httpx clients for ChatOpenAI that go through the endpoint's limiter."""
+    limiter = get_limiter(base_url)
+    return (
+        DefaultHttpxClient(transport=RateLimitedTransport(limiter)),
+        DefaultAsyncHttpxClient(transport=AsyncRateLimitedTransport(limiter)),
+    )
@@ -0,0 +1,228 @@
+# router.py
+"""
+Pick the cheapest way to answer a turn before the agent runs.
+
+Every turn used to go through the full agent: all the tool schemas plus
+the whole system prompt, even for "thanks!". route() looks at the user's
+last message – locally, in microseconds, no model call – and picks one of
+
+  chat     small talk / thanks / "what did you just say": one plain model
+           call, no tools bound
+  weather  "how hot is it in Oslo?": get_current_temperature_in, plus
+           get_current_temperature for places the gazetteer doesn't know
+  wiki     "who was Ada Lovelace?": only search_wikipedia bound
+  agent    everything else – the full agent, as before
+
+The classifier is a hand-weighted linear model: regex and keyword
+features add to a score per route, a softmax turns the scores into
+probabilities and anything below MIN_CONFIDENCE goes to the full agent, so
+when in doubt nothing changes. Long messages, coordinates, several places
+at once and follow-ups like "and in Berlin?" (which need the previous turn
+to make sense) lean towards the agent on purpose. So does any short reply
+to an assistant message that asked something ("Want me to check Oslo's
+weather?" -> "yes"): the answer may well need a tool.
+
+LANGZAIN_ROUTER=on (default) | off | shadow. In shadow mode every turn is
+classified and logged but still runs the full agent – compare the route
+with the tools the agent actually used (langzain_route_checks_total) to
+see how often the router would have been right before trusting it.
+
+Every decision goes into the turn's trace ("route", see instrumentation.py),
+so LANGZAIN_TRACE_FILE has it next to the turn's time and tokens.
+"""
+import math
+import os
+import re
+import time
+
+try:
+    from .messages import role_and_text
+    from .metrics import REGISTRY
+except ImportError:
+    from langzain.messages import role_and_text
+    from langzain.metrics import REGISTRY
+
+ROUTES = ("chat", "weather", "wiki", "agent")
+MIN_CONFIDENCE = 0.7
+LONG_MESSAGE_WORDS = 40
+SHORT_REPLY_WORDS = 6   # replies this short to an assistant question go to the agent
+
+# which tools each cut-down route may use; the chat route binds none
+ROUTE_TOOLS = {
+    "chat": (),
+    # coordinates as the way out when the gazetteer doesn't know the place
+    "weather": ("get_current_temperature_in", "get_current_temperature"),
+    "wiki": ("search_wikipedia",),
+}
+
+# what a turn that called these tools was about (the full agent may answer
+# a weather question with coordinates – the router still got it right)
+TOOL_KINDS = {
+    "get_current_temperature_in": "weather",
+    "get_current_temperature": "weather",
+    "get_current_temperatures": "weather",
+    "resolve_location": "weather",
+    "search_wikipedia": "wiki",
+}
+
+DECISIONS = REGISTRY.counter("langzain_route_decisions_total", "Turns by router decision", ["route", "mode"])
+ROUTE_SECONDS = REGISTRY.histogram(
+    "langzain_route_seconds", "Time to classify a turn", buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
+CHECKS = REGISTRY.counter(
+    "langzain_route_checks_total", "Router decision vs the tools the turn used", ["route", "used", "mode"]
+)
+
+# bias: the agent wins unless something points elsewhere
+BIAS = {"chat": 0.0, "weather": -1.0, "wiki": -0.5, "agent": 1.0}
+
+# (pattern on the lower-cased message, {route: weight})
+FEATURES = [
+    # small talk
+    (r"^(hi|hello|hey|hiya|yo|howdy|good (morning|afternoon|evening))\b", {"chat": 3.0}),
+    (r"\b(thanks|thank you|thx|ty|cheers|appreciate it)\b", {"chat": 3.5}),
+    (r"^(bye|goodbye|see you|see ya|good night|gn)\b", {"chat": 4.0}),
+    (r"^(ok|okay|k|cool|nice|great|awesome|perfect|lol|haha+|wow|sure|yes|no|nope|yep|got it)\W*$", {"chat": 4.0}),
+    (r"\bhow are you\b|\bwho are you\b|\bwhat('s| is) your name\b|\bare you (a|an) (bot|ai)\b", {"chat": 3.5}),
+    (r"\b(joke|poem|haiku|rhyme|story)\b", {"chat": 2.5}),
+    (r"\b(you said|you just said|your (last )?(answer|reply)|rephrase|shorter|summari[sz]e)\b", {"chat": 3.0}),
+    (r"\b(translate|spell|grammar)\b", {"chat": 2.0}),
+    # weather
+    (r"\b(weather|temperature|temp|forecast|degrees|celsius|fahrenheit)\b", {"weather": 4.0, "wiki": -2.0}),
+    (r"\bhow (hot|cold|warm|chilly)\b|\b(is it|it's|its) (hot|cold|warm|raining|sunny|snowing)\b", {"weather": 3.5}),
+    (r"\b(rain|raining|snow|snowing|sunny|windy|humid)\b", {"weather": 1.5}),
+    (r"\bin [a-z]", {"weather": 0.5, "wiki": 0.2}),
+    # encyclopedia
+    # (not "what is my name" / "who are you" – that's about the chat, not the world)
+    (r"^(who|what) (is|was|were|are) (?!(my|your|our|i|me|you|we|us|this|that|it)\b)(the |a |an )?[a-z0-9]",
+     {"wiki": 3.5}),
+    (r"\b(tell me about|wikipedia|wiki|history of|biography|born|founded|invented|discovered)\b", {"wiki": 3.5}),
+    (r"^(when|where) (is|was|were|did)\b", {"wiki": 3.0}),
+    (r"\bwhy (is|was|did|do|does)\b|\bexplain\b", {"wiki": 1.0, "agent": 0.5}),
+    (r"\b(capital|population|president|king|queen|author|composer|painter)\b", {"wiki": 1.5}),
+    # things the single-tool paths can't do (well)
+    (r"-?\d{1,3}\.\d+\s*,\s*-?\d{1,3}\.\d+", {"agent": 6.0}),          # coordinates
+    (r"^(and|also|what about|how about|same for|and what about)\b", {"agent": 4.0}),  # follow-up
+    (r"\b(and|also|plus)\b.*\b(weather|temperature|who|what|when|where)\b", {"agent": 2.5}),
+    # several places: the agent has the batched get_current_temperatures
+    (r"\b(in|for|at) [a-z][\w .'-]*?(,|\band\b|&|\bor\b)\s*[a-z]", {"agent": 4.0}),
+    (r"\b(compare|difference|versus|vs\.?|both|each)\b", {"agent": 2.0}),
+    (r"\d\s*[-+*/x^%]\s*\d", {"agent": 4.0}),                        # arithmetic
+    (r"\b(code|python|script|function|calculate|compute|convert)\b", {"agent": 2.5}),
+]
+FEATURES = [(re.compile(pattern), weights) for pattern, weights in FEATURES]
+
+_WORDS = re.compile(r"\w+")
+
+
+class Decision:
+    __slots__ = ("route", "confidence", "mode", "seconds", "features")
+
+    def __init__(self, route, confidence, mode, seconds, features):
+        self.route = route
+        self.confidence = confidence
+        self.mode = mode
+        self.seconds = seconds
+        self.features = features
+
+    @property
+    def applied(self):
+        """The route the turn actually takes (shadow mode always runs the agent)."""
+        return self.route if self.mode == "on" else "agent"
+
+    def as_dict(self):
+        return {
+            "route": self.route,
+            "applied": self.applied,
+            "confidence": round(self.confidence, 3),
+            "mode": self.mode,
+            "seconds": round(self.seconds, 6),
+            "features": self.features,
+        }
+
+    def __repr__(self):
+        return f"Decision({self.route!r}, {self.confidence:.2f}, mode={self.mode!r})"
+
+
+def router_mode():
+    """LANGZAIN_ROUTER: "on" (default), "off" or "shadow"."""
+    mode = os.getenv("LANGZAIN_ROUTER", "on").strip().lower()
+    if mode in ("0", "false", "no", "off"):
+        return "off"
+    return "shadow" if mode == "shadow" else "on"
+
+
+def score(text):
+    """({route: probability}, [indices of the features that fired]) for one message."""
+    text = text.strip().lower()
+    scores = dict(BIAS)
+    fired = []
+    for i, (pattern, weights) in enumerate(FEATURES):
+        if pattern.search(text):
+            fired.append(i)
+            for route, weight in weights.items():
+                scores[route] += weight
+    words = len(_WORDS.findall(text))
+    if words > LONG_MESSAGE_WORDS:
+        scores["agent"] += 3.0
+    elif words <= 3:
+        scores["chat"] += 0.5   # "nice one", "you rock"
+    top = max(scores.values())
+    exp = {route: math.exp(s - top) for route, s in scores.items()}
+    total = sum(exp.values())
+    return {route: e / total for route, e in exp.items()}, fired
+
+
+def classify(text):
+    """(route, confidence, features that fired) – "agent" whenever the model isn't sure."""
+    probabilities, fired = score(text)
+    choice = max(probabilities, key=probabilities.get)
+    if probabilities[choice] < MIN_CONFIDENCE:
+        return "agent", probabilities[choice], fired
+    return choice, probabilities[choice], fired
+
+
+def _asked_something(message):
+    """Did this assistant message end in a question or ask for a tool?"""
+    if message is None or role_and_text(message)[0] != "assistant":
+        return False
+    tool_calls = message.get("tool_calls") if isinstance(message, dict) else getattr(message, "tool_calls", None)
+    return bool(tool_calls) or role_and_text(message)[1].rstrip().endswith("?")
+
+
+def route(messages, mode=None):
+    """The Decision for a turn (None with LANGZAIN_ROUTER=off)."""
+    mode = mode or router_mode()
+    if mode == "off":
+        return None
+    start = time.perf_counter()
+    role, text = role_and_text(messages[-1]) if messages else (None, "")
+    previous = messages[-2] if len(messages) > 1 else None
+    if role != "user" or not text.strip():
+        choice, confidence, fired = "agent", 1.0, []
+    elif _asked_something(previous) and len(_WORDS.findall(text)) <= SHORT_REPLY_WORDS:
+        # "yes" / "sure, do it" / "Berlin" – only makes sense with the question
+        choice, confidence, fired = "agent", 1.0, []
+    else:
+        choice, confidence, fired = classify(text)
+    decision = Decision(choice, confidence, mode, time.perf_counter() - start, fired)
+    DECISIONS.inc(route=decision.route, mode=mode)
+    ROUTE_SECONDS.observe(decision.seconds)
+    return decision
+
+
+def used_route(tool_names):
+    """The kind of turn, judging by the tools it called ("agent" for a mix)."""
+    kinds = {TOOL_KINDS.get(name, "agent") for name in tool_names}
+    if not kinds:
+        return "chat"
+    return kinds.pop() if len(kinds) == 1 else "agent"
+
+
+def check(trace):
+    """Compare a finished turn's route with the tools it used (see instrumentation.record_turn)."""
+    decision = trace.get("route")
+    if not decision or trace["status"] != "ok":
+        return
+    used = used_route([s["name"] for s in trace["steps"] if s["kind"] == "tool"])
+    CHECKS.inc(route=decision["route"], used=used, mode=decision["mode"])
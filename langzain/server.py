@@ -0,0 +1,548 @@
+# server.py
+"""
+HTTP entry point: `langzain-serve`.
+
+    langzain-serve --port 8000 --workers 4
+
+A small HTTP/1.1 server on asyncio (standard library only), run by a
+pre-fork pool of worker processes that share one listening socket, so
+all cores are used and a load balancer can sit in front.
+
+Endpoints (JSON unless noted)
+    POST /v1/sessions                        -> {"session_id": ...}
+    GET  /v1/sessions/<id>/messages          -> recent messages (?limit=, ?before=)
+    POST /v1/sessions/<id>/messages          {"content": "..."} -> the reply
+         with "Accept: text/event-stream" (or ?stream=1) the turn comes back
+         as Server-Sent Events: token / tool_call / tool_result / done
+    GET  /healthz                            -> {"status": "ok", ...}
+    GET  /metrics                            -> Prometheus text (this worker)
+
+Sessions live in the ConversationStore (SQLite, shared by all workers);
+each worker keeps recently used conversations in memory and checks the
+stored message count before every turn, so it notices turns another
+worker handled. Turns for the same session are queued one after the
+other within a worker, but the workers don't coordinate: if two of them
+run a turn of the same session at once, the one that finishes second
+gets 409 and nothing of it is saved (the store checks the count it
+started from, under SQLite's write lock), so history never interleaves
+or duplicates. Clients that wait for a reply before sending the
+session's next message never see it; others should send it again.
+
+Backpressure: each worker runs at most --max-inflight turns at once and
+queues up to --max-queue more; past that requests get 503 + Retry-After.
+A request's headers and body must arrive within REQUEST_TIMEOUT seconds
+of its first line (408 otherwise); idle connections close after
+KEEPALIVE_TIMEOUT.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import socket
+import sys
+import time
+import weakref
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from .agent_core import astream_agent, warm_up
+    from .cache import LRUCache
+    from .messages import NO_REPLY, Conversation, Message
+    from .metrics import REGISTRY, render as render_metrics
+    from .store import RESUME_LIMIT, ConversationStore, SessionConflict
+except ImportError:
+    from langzain.agent_core import astream_agent, warm_up
+    from langzain.cache import LRUCache
+    from langzain.messages import NO_REPLY, Conversation, Message
+    from langzain.metrics import REGISTRY, render as render_metrics
+    from langzain.store import RESUME_LIMIT, ConversationStore, SessionConflict
+
+MAX_BODY_BYTES = 1024 * 1024
+KEEPALIVE_TIMEOUT = 15     # seconds an idle connection is kept open
+REQUEST_TIMEOUT = 30       # seconds to send headers + body once the request line is in
+MAX_HEADERS = 100
+SHUTDOWN_GRACE = 30        # seconds running turns get to finish on SIGTERM
+SESSION_CACHE_SIZE = 256   # conversations kept in memory per worker
+
+HTTP_REQUESTS = REGISTRY.counter("langzain_http_requests_total", "HTTP requests", ["route", "status"])
+IN_FLIGHT = REGISTRY.gauge("langzain_server_turns_in_flight", "Turns running or queued in this worker")
+REJECTED = REGISTRY.counter("langzain_server_rejected_total", "Turns rejected with 503 (overloaded)")
+QUEUE_SECONDS = REGISTRY.histogram("langzain_server_queue_seconds", "Time a turn waited for a free slot")
+
+_SESSION_MESSAGES = re.compile(r"^/v1/sessions/([A-Za-z0-9_-]{1,64})/messages$")
+
+_REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 408: "Request Timeout", 409: "Conflict", 413: "Payload Too Large",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return data
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+    @property
+    def wants_stream(self):
+        return (
+            "text/event-stream" in self.headers.get("accept", "")
+            or self.query.get("stream") in ("1", "true")
+        )
+
+
+async def _read_request(reader):
+    """Parse one request off the connection (None when the client went away)."""
+    try:
+        line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+    except (asyncio.TimeoutError, ConnectionError):
+        return None
+    except ValueError:   # longer than the reader's limit
+        raise HTTPError(400, "request line too long")
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+
+    # a client that trickles in its headers / body doesn't get to hold the connection
+    try:
+        headers, body = await asyncio.wait_for(_read_headers_and_body(reader), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPError(408, "request took too long to send")
+    return Request(method.upper(), target, headers, body)
+
+
+async def _read_headers_and_body(reader):
+    headers = {}
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:   # longer than the reader's limit
+            raise HTTPError(431, "header line too long")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(431, "too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "bad Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return headers, body
+
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer, status, data, keep_alive=True, headers=None):
+    body = json.dumps(data, default=str).encode()
+    head = {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **(headers or {}),
+    }
+    writer.write(_head(status, head) + body)
+    await writer.drain()
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+def _public_message(m):
+    msg = Message.from_any(m)
+    return {"role": msg.role, "content": msg.text}
+
+
+class ChatServer:
+    """Request handling for one worker process."""
+
+    def __init__(self, store, max_inflight=32, max_queue=64):
+        self.store = store
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(max_inflight)
+        # session id -> (conversation, saved index, stored message count)
+        self._sessions = LRUCache(maxsize=SESSION_CACHE_SIZE)
+        # only alive while some turn for that session holds / waits for it
+        self._session_locks = weakref.WeakValueDictionary()
+        self.started_at = time.time()
+
+    # -- connections -------------------------------------------------------
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as exc:
+                    await _send_json(writer, exc.status, {"error": str(exc)}, keep_alive=False)
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+                if request is None:
+                    break
+                keep_alive = await self.dispatch(request, writer)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass   # client went away
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, request, writer):
+        """Route one request; returns whether the connection can be reused."""
+        route, status = "other", 500
+        try:
+            if request.path == "/healthz":
+                route = "healthz"
+                status = 200
+                await _send_json(writer, 200, self.health(), request.keep_alive)
+            elif request.path == "/metrics":
+                route = "metrics"
+                status = 200
+                body = render_metrics().encode()
+                writer.write(_head(200, {
+                    "Content-Type": "text/plain; version=0.0.4",
+                    "Content-Length": str(len(body)),
+                    "Connection": "keep-alive" if request.keep_alive else "close",
+                }) + body)
+                await writer.drain()
+            elif request.path == "/v1/sessions":
+                route = "sessions"
+                if request.method != "POST":
+                    raise HTTPError(405, "use POST")
+                session_id = await asyncio.to_thread(self.store.new_session)
+                status = 201
+                await _send_json(writer, 201, {"session_id": session_id}, request.keep_alive)
+            else:
+                match = _SESSION_MESSAGES.match(request.path)
+                if not match:
+                    raise HTTPError(404, "not found")
+                route = "messages"
+                session_id = match.group(1)
+                if request.method == "GET":
+                    status = 200
+                    await _send_json(writer, 200, await self.history(session_id, request), request.keep_alive)
+                elif request.method == "POST":
+                    route = "turn"
+                    status = await self.turn(session_id, request, writer)
+                    return request.keep_alive and not request.wants_stream
+                else:
+                    raise HTTPError(405, "use GET or POST")
+            return request.keep_alive
+        except HTTPError as exc:
+            status = exc.status
+            await _send_json(writer, exc.status, {"error": str(exc)}, request.keep_alive, exc.headers)
+            return request.keep_alive
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            status = 500
+            print(f"[langzain-serve] error handling {request.method} {request.path}: {exc!r}", file=sys.stderr)
+            await _send_json(writer, 500, {"error": "internal error"}, keep_alive=False)
+            return False
+        finally:
+            HTTP_REQUESTS.inc(route=route, status=status)
+
+    # -- endpoints ---------------------------------------------------------
+
+    def health(self):
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "turns_in_flight": self.in_flight,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+        }
+
+    async def history(self, session_id, request):
+        if not await asyncio.to_thread(self.store.has_session, session_id):
+            raise HTTPError(404, f"no session {session_id!r}")
+        try:
+            limit = max(1, min(200, int(request.query.get("limit", 50))))
+            before = int(request.query["before"]) if "before" in request.query else None
+        except ValueError:
+            raise HTTPError(400, "limit / before must be integers")
+        messages, first_seq = await asyncio.to_thread(self.store.load_page, session_id, before, limit)
+        return {
+            "session_id": session_id,
+            "messages": [_public_message(m) for m in messages],
+            "before": first_seq,   # pass as ?before= for the previous page
+        }
+
+    async def turn(self, session_id, request, writer):
+        content = request.json().get("content")
+        if not isinstance(content, str) or not content.strip():
+            raise HTTPError(400, "'content' must be a non-empty string")
+
+        # backpressure: a bounded queue in front of a bounded number of turns
+        if self.in_flight >= self.max_inflight + self.max_queue:
+            REJECTED.inc()
+            raise HTTPError(503, "server busy, try again", {"Retry-After": "1"})
+
+        self.in_flight += 1
+        IN_FLIGHT.inc()
+        try:
+            queued_at = time.perf_counter()
+            async with self._slots:
+                QUEUE_SECONDS.observe(time.perf_counter() - queued_at)
+                if request.wants_stream:
+                    await self._stream_turn(session_id, content, writer)
+                    return 200
+                done = None
+                async for event in self._run_turn(session_id, content):
+                    if event["type"] == "done":
+                        done = event
+                await _send_json(writer, 200, done, request.keep_alive)
+                return 200
+        finally:
+            self.in_flight -= 1
+            IN_FLIGHT.dec()
+
+    async def _stream_turn(self, session_id, content, writer):
+        # make sure the session exists before committing to a 200
+        if not await asyncio.to_thread(self.store.has_session, session_id):
+            raise HTTPError(404, f"no session {session_id!r}")
+        writer.write(_head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Connection": "close",
+        }))
+        await writer.drain()
+        events = self._run_turn(session_id, content)
+        try:
+            async for event in events:
+                writer.write(_sse(event["type"], {k: v for k, v in event.items() if k != "type"}))
+                await writer.drain()   # raises if the client disconnected -> turn is dropped
+        except HTTPError as exc:
+            writer.write(_sse("error", {"status": exc.status, "error": str(exc)}))
+            await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            print(f"[langzain-serve] turn failed for session {session_id}: {exc!r}", file=sys.stderr)
+            writer.write(_sse("error", {"status": 500, "error": "turn failed"}))
+            await writer.drain()
+        finally:
+            await events.aclose()
+
+    # -- turns -------------------------------------------------------------
+
+    def _load_session(self, session_id):
+        """(conversation, saved index, stored count), reloaded if another worker wrote to it."""
+        stored = self.store.count(session_id)
+        cached = self._sessions.get(session_id)
+        if cached is not None and cached[2] == stored:
+            return cached
+        if not self.store.has_session(session_id):
+            raise HTTPError(404, f"no session {session_id!r}")
+        conversation = Conversation(self.store.load_recent(session_id, RESUME_LIMIT))
+        return conversation, len(conversation), stored
+
+    def _save_turn(self, session_id, conversation, saved, stored, new_messages):
+        try:
+            # only if nobody (another worker) saved a turn since we loaded it
+            new_saved = self.store.save_new(session_id, conversation.raw + new_messages, saved, stored)
+        except SessionConflict:
+            raise HTTPError(409, "the session changed while this turn ran, send it again") from None
+        conversation.extend(new_messages)
+        stored += new_saved - saved
+        self._sessions.set(session_id, (conversation, new_saved, stored))
+
+    async def _run_turn(self, session_id, content):
+        """
+        One chat turn. Yields the stream_agent events; the "done" event is
+        reduced to what clients need. Nothing is saved unless the turn finishes.
+        """
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = self._session_locks[session_id] = asyncio.Lock()
+
+        async with lock:
+            conversation, saved, stored = await asyncio.to_thread(self._load_session, session_id)
+            user = {"role": "user", "content": content}
+            async for event in astream_agent(conversation.raw + [user]):
+                if event["type"] != "done":
+                    yield event
+                    continue
+                new_messages = [user] + list(event["new_messages"])
+                await asyncio.to_thread(
+                    self._save_turn, session_id, conversation, saved, stored, new_messages
+                )
+                trace = event.get("trace") or {}
+                yield {
+                    "type": "done",
+                    "session_id": session_id,
+                    "reply": conversation.last_reply or NO_REPLY,
+                    "new_messages": [_public_message(m) for m in event["new_messages"]],
+                    "timings": {
+                        k: trace.get(k)
+                        for k in ("wall_seconds", "ttft_seconds", "llm_calls", "prompt_tokens", "completion_tokens")
+                    },
+                }
+
+
+# ----------------------------------------------------------------------
+#  Processes
+# ----------------------------------------------------------------------
+
+def _listen(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+async def _serve(sock, args):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):   # Windows
+            pass
+
+    app = ChatServer(ConversationStore(args.db), args.max_inflight, args.max_queue)
+    server = await asyncio.start_server(app.handle_connection, sock=sock)
+    warm_up()   # build the agent in this process, before the first turn
+    async with server:
+        await stop.wait()
+        server.close()   # stop accepting; let running turns finish
+        deadline = time.monotonic() + SHUTDOWN_GRACE
+        while app.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+
+def _worker(sock, args):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # the parent turns Ctrl+C into SIGTERM
+    code = 0
+    try:
+        asyncio.run(_serve(sock, args))
+    except BaseException as exc:
+        print(f"[langzain-serve] worker {os.getpid()} crashed: {exc!r}", file=sys.stderr)
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def _run_prefork(sock, args):
+    """Fork `args.workers` workers and keep that many running until told to stop."""
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _worker(sock, args)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"[langzain-serve] worker {pid} exited ({status}), restarting", file=sys.stderr)
+            time.sleep(0.5)
+            spawn()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="langzain-serve", description="Serve Langzain chat turns over HTTP.")
+    parser.add_argument("--host", default=os.getenv("LANGZAIN_SERVE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("LANGZAIN_SERVE_PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("LANGZAIN_SERVE_WORKERS", "0")),
+        help="worker processes (default: one per CPU core)",
+    )
+    parser.add_argument("--max-inflight", type=int, default=32, help="concurrent turns per worker")
+    parser.add_argument("--max-queue", type=int, default=64, help="turns waiting per worker before 503s")
+    parser.add_argument("--db", help="conversation database (default: LANGZAIN_DB_PATH or ~/.langzain/)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.workers = args.workers or os.cpu_count() or 1
+
+    # create the schema once, before the workers race for it
+    ConversationStore(args.db)
+    sock = _listen(args.host, args.port)
+
+    if args.workers == 1 or not hasattr(os, "fork"):
+        print(f"langzain-serve on http://{args.host}:{args.port} (1 worker)")
+        try:
+            asyncio.run(_serve(sock, args))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    print(f"langzain-serve on http://{args.host}:{args.port} ({args.workers} workers)")
+    _run_prefork(sock, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+# sessions.py
+"""
+Keeps the Streamlit app's conversations from eating the server's memory.
+
+Every browser session used to keep its whole Conversation (LangChain
+message objects and all) in st.session_state until the process
+restarted, so memory grew with users × history. SessionManager owns the
+conversations instead – the app only keeps the session id – and
+
+  - measures each session's approximate footprint (footprint())
+  - compresses a session's messages (JSON + zlib, usually 5-10x smaller)
+    once it has been idle for LANGZAIN_SESSION_IDLE seconds (default 600)
+  - keeps the total under LANGZAIN_SESSION_MEMORY_MB (default 256): over
+    the ceiling the least recently used sessions are compressed and then
+    spilled to a file under the cache dir, until it fits again
+  - brings a session back, exactly as it was, on its next rerun
+  - forgets sessions nobody has used for FORGET_AFTER (a day)
+
+The messages are in ConversationStore anyway; the spill files only save
+a database round trip and keep the session's in-memory shape (they are
+per process and deleted at exit). If one is gone, get() returns None and
+the app resumes from the store like after a restart.
+
+Gauges: langzain_sessions{state}, langzain_session_bytes{state} and
+langzain_session_largest_bytes; evictions / reloads are counted too.
+"""
+import atexit
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    from .cache import cache_dir
+    from .messages import Conversation, role_and_text
+    from .metrics import REGISTRY
+    from .store import deserialize_message, serialize_message
+except ImportError:
+    from langzain.cache import cache_dir
+    from langzain.messages import Conversation, role_and_text
+    from langzain.metrics import REGISTRY
+    from langzain.store import deserialize_message, serialize_message
+
+DEFAULT_IDLE_SECONDS = 600
+DEFAULT_MEMORY_MB = 256
+SWEEP_INTERVAL = 30.0           # seconds between background sweeps
+FORGET_AFTER = 86400            # seconds idle after which a session is dropped altogether
+STALE_SPILL_DIR_SECONDS = 86400  # spill dirs of crashed processes are removed after a day
+
+# rough CPython / LangChain per-object overheads, in bytes (checked with tracemalloc)
+SESSION_OVERHEAD = 2000
+DICT_MESSAGE_OVERHEAD = 400
+LANGCHAIN_MESSAGE_OVERHEAD = 800
+VISIBLE_MESSAGE_OVERHEAD = 100
+
+STATES = ("live", "compressed", "spilled")
+
+SESSIONS = REGISTRY.gauge("langzain_sessions", "Chat sessions held by the session manager", ["state"])
+SESSION_BYTES = REGISTRY.gauge(
+    "langzain_session_bytes", "Approximate memory (disk for spilled) of the sessions, by state", ["state"]
+)
+LARGEST_SESSION = REGISTRY.gauge("langzain_session_largest_bytes", "Footprint of the largest live session")
+MEMORY_LIMIT = REGISTRY.gauge("langzain_session_memory_limit_bytes", "Memory ceiling of the session manager")
+EVICTIONS = REGISTRY.counter("langzain_session_evictions_total", "Sessions compressed or spilled", ["to", "reason"])
+RELOADS = REGISTRY.counter("langzain_session_reloads_total", "Sessions brought back into memory", ["source"])
+
+
+def _message_size(m):
+    if isinstance(m, dict):
+        size = DICT_MESSAGE_OVERHEAD
+        content = m.get("content")
+        tool_calls = m.get("tool_calls") or ()
+    else:
+        size = LANGCHAIN_MESSAGE_OVERHEAD
+        content = getattr(m, "content", None)
+        tool_calls = getattr(m, "tool_calls", None) or ()
+    if isinstance(content, str):
+        size += sys.getsizeof(content)
+    else:
+        size += sys.getsizeof(role_and_text(m)[1]) + 200 * len(content or ())
+    for call in tool_calls:
+        size += 300 + sum(sys.getsizeof(str(v)) for v in (call.get("args") or {}).values())
+    return size
+
+
+def footprint(conversation):
+    """Approximate bytes a Conversation holds (text + per-object overhead)."""
+    # Message.text shares the string of a str content, so only the wrapper counts
+    return (
+        SESSION_OVERHEAD
+        + sum(_message_size(m) for m in conversation.raw)
+        + VISIBLE_MESSAGE_OVERHEAD * len(conversation.visible)
+    )
+
+
+def compress(messages):
+    payload = "\n".join(serialize_message(m)[1] for m in messages)
+    return zlib.compress(payload.encode("utf-8"), 6)
+
+
+def decompress(blob):
+    payload = zlib.decompress(blob).decode("utf-8")
+    return [deserialize_message(line) for line in payload.split("\n")] if payload else []
+
+
+class Session:
+    """One chat session: its conversation plus what the app tracks about it."""
+
+    __slots__ = ("session_id", "conversation", "saved_count", "last_used", "bytes", "blob", "path")
+
+    def __init__(self, session_id, conversation, saved_count=0):
+        self.session_id = session_id
+        self.conversation = conversation
+        self.saved_count = saved_count
+        self.last_used = time.monotonic()
+        self.bytes = footprint(conversation)
+        self.blob = None    # compressed messages (state "compressed")
+        self.path = None    # spill file (state "spilled")
+
+    @property
+    def state(self):
+        if self.conversation is not None:
+            return "live"
+        return "compressed" if self.blob is not None else "spilled"
+
+    def __repr__(self):
+        return f"Session({self.session_id!r}, {self.state}, {self.bytes} bytes)"
+
+
+class SessionManager:
+    """Holds every session of the process; see the module docstring."""
+
+    def __init__(self, max_bytes=None, idle_seconds=None, spill_dir=None):
+        if max_bytes is None:
+            max_bytes = float(os.getenv("LANGZAIN_SESSION_MEMORY_MB", DEFAULT_MEMORY_MB)) * 1024 * 1024
+        if idle_seconds is None:
+            idle_seconds = float(os.getenv("LANGZAIN_SESSION_IDLE", DEFAULT_IDLE_SECONDS))
+        self.max_bytes = int(max_bytes)
+        self.idle_seconds = idle_seconds
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._sessions = collections.OrderedDict()   # least recently used first
+        self._lock = threading.RLock()
+        self._sweeper = None
+        MEMORY_LIMIT.set(self.max_bytes)
+
+    # -- the app's side ---------------------------------------------------
+
+    def add(self, session_id, conversation, saved_count=0):
+        """Start tracking a (new or resumed) session; returns its Session."""
+        session = Session(session_id, conversation, saved_count)
+        with self._lock:
+            old = self._sessions.pop(session_id, None)
+            if old is not None:
+                self._drop_spill(old)
+            self._sessions[session_id] = session
+            self._enforce(keep=session)
+        return session
+
+    def get(self, session_id):
+        """The Session, in memory again if it was compressed / spilled; None if unknown."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            if session.conversation is None and not self._load(session):
+                # spill file gone – let the caller resume from the store
+                del self._sessions[session_id]
+                self._publish()
+                return None
+            self._enforce(keep=session)
+        return session
+
+    def touch(self, session, conversation):
+        """
+        Call after a turn with the conversation the turn added to: re-measures
+        the session and applies the ceiling. (The session may have been
+        compressed or forgotten while the turn ran – this copy is the newer one.)
+        """
+        with self._lock:
+            session.conversation = conversation
+            session.blob = None
+            self._drop_spill(session)
+            session.bytes = footprint(conversation)
+            session.last_used = time.monotonic()
+            old = self._sessions.pop(session.session_id, None)
+            if old is not None and old is not session:
+                self._drop_spill(old)
+            self._sessions[session.session_id] = session
+            self._enforce(keep=session)
+        self.start_sweeper()
+
+    def remove(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._drop_spill(session)
+            self._publish()
+
+    def total_bytes(self):
+        """Memory held by all sessions (spilled ones count 0)."""
+        with self._lock:
+            return sum(s.bytes for s in self._sessions.values() if s.state != "spilled")
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # -- idle sessions ------------------------------------------------------
+
+    def sweep(self):
+        """
+        Compress sessions idle for longer than idle_seconds and forget the
+        ones idle for FORGET_AFTER (they resume from the store), then apply
+        the ceiling.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for session in list(self._sessions.values()):
+                idle = now - session.last_used
+                if idle < self.idle_seconds:
+                    break   # LRU order: everything after this was used more recently
+                if idle >= FORGET_AFTER:
+                    del self._sessions[session.session_id]
+                    self._drop_spill(session)
+                elif session.conversation is not None:
+                    self._compress(session, reason="idle")
+            self._enforce()
+
+    def start_sweeper(self):
+        """Sweep every SWEEP_INTERVAL seconds on a daemon thread (started once)."""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, name="langzain-sessions", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(min(SWEEP_INTERVAL, max(1.0, self.idle_seconds / 4)))
+            try:
+                self.sweep()
+            except Exception as exc:
+                print(f"[langzain] session sweep failed: {exc}")
+
+    # -- memory ceiling -----------------------------------------------------
+
+    def _enforce(self, keep=None):
+        """Compress, then spill, least recently used sessions until under max_bytes."""
+        total = sum(s.bytes for s in self._sessions.values() if s.state != "spilled")
+        # compressing is cheap and usually enough; spill only if the blobs alone don't fit
+        for state in ("live", "compressed"):
+            for session in list(self._sessions.values()):
+                if total <= self.max_bytes:
+                    break
+                if session is keep or session.state != state:
+                    continue
+                before = session.bytes
+                if state == "live":
+                    self._compress(session, reason="memory")
+                    total -= before - session.bytes
+                else:
+                    self._spill(session)
+                    total -= before
+        self._publish()
+
+    # -- moving sessions between states ---------------------------------------
+
+    def _compress(self, session, reason):
+        session.blob = compress(session.conversation.raw)
+        session.conversation = None
+        session.bytes = SESSION_OVERHEAD + len(session.blob)
+        EVICTIONS.inc(to="compressed", reason=reason)
+
+    def _spill(self, session):
+        path = os.path.join(self._get_spill_dir(), f"{session.session_id}.z")
+        with open(path, "wb") as f:
+            f.write(session.blob)
+        session.path = path
+        session.bytes = len(session.blob)
+        session.blob = None
+        EVICTIONS.inc(to="disk", reason="memory")
+
+    def _load(self, session):
+        if session.blob is not None:
+            blob, source = session.blob, "compressed"
+        else:
+            try:
+                with open(session.path, "rb") as f:
+                    blob = f.read()
+            except OSError:
+                return False
+            source = "disk"
+        session.conversation = Conversation(decompress(blob))
+        session.blob = None
+        self._drop_spill(session)
+        session.bytes = footprint(session.conversation)
+        RELOADS.inc(source=source)
+        return True
+
+    def _drop_spill(self, session):
+        if session.path:
+            try:
+                os.remove(session.path)
+            except OSError:
+                pass
+            session.path = None
+
+    def _get_spill_dir(self):
+        if self._spill_dir is None:
+            root = self._spill_root or os.path.join(cache_dir(), "sessions")
+            os.makedirs(root, exist_ok=True)
+            _remove_stale_spill_dirs(root)
+            self._spill_dir = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=root)
+            atexit.register(shutil.rmtree, self._spill_dir, True)
+        return self._spill_dir
+
+    def _publish(self):
+        counts = dict.fromkeys(STATES, 0)
+        sizes = dict.fromkeys(STATES, 0)
+        largest = 0
+        for session in self._sessions.values():
+            state = session.state
+            counts[state] += 1
+            sizes[state] += session.bytes
+            if state == "live":
+                largest = max(largest, session.bytes)
+        for state in STATES:
+            SESSIONS.set(counts[state], state=state)
+            SESSION_BYTES.set(sizes[state], state=state)
+        LARGEST_SESSION.set(largest)
+
+
+def _remove_stale_spill_dirs(root):
+    cutoff = time.time() - STALE_SPILL_DIR_SECONDS
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
@@ -0,0 +1,56 @@
+# startup_time.py
+"""
+Measure how long Langzain takes to start, so regressions show up.
+
+Run it in a fresh interpreter (it times the imports too):
+    python -m langzain.startup_time
+    python -m langzain.startup_time --json
+
+Reported steps (seconds):
+    import_frontends  – importing agent_core + the CLI module (what the user waits
+                        for before the prompt appears)
+    imports_and_llm   – langchain / tools imports + building the chat model
+    agent_build       – create_agent(...)
+    first_agent       – total time of the first get_agent() call
+"""
+import json
+import os
+import sys
+import time
+
+
+def measure():
+    timings = {}
+
+    start = time.perf_counter()
+    from . import agent_core
+    from . import app  # noqa: F401  (CLI front end)
+    timings["import_frontends"] = time.perf_counter() - start
+
+    # Building the client needs *some* key, but never talks to the network
+    agent_core._load_env()
+    os.environ.setdefault("OPENAI_API_KEY", "startup-time-check")
+
+    start = time.perf_counter()
+    agent_core.get_agent()
+    timings["first_agent"] = time.perf_counter() - start
+
+    for name in ("import_agent_core", "imports_and_llm", "agent_build"):
+        if name in agent_core.startup_timings:
+            timings[name] = agent_core.startup_timings[name]
+    return timings
+
+
+def main():
+    timings = measure()
+    if "--json" in sys.argv[1:]:
+        print(json.dumps(timings))
+        return
+
+    print("Langzain startup time:")
+    for name, seconds in timings.items():
+        print(f"  {name:<18} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
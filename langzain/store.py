@@ -0,0 +1,247 @@
+# store.py
+"""
+Persistent conversations in SQLite.
+
+Each front end keeps a list of messages in memory; ConversationStore
+lets them survive a restart (resume by session id) without holding every
+old turn in RAM:
+  - writes are append-only – only the messages added this turn are inserted
+  - reads are paginated / lazy (load the recent tail, page further back,
+    or iterate in batches)
+  - the database runs in WAL mode, so readers never block the writer
+
+Messages can be plain dicts ({"role": ..., "content": ...}) or LangChain
+message objects; both come back the way they went in.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# how many recent messages a front end loads when resuming a session
+RESUME_LIMIT = 200
+
+
+class SessionConflict(Exception):
+    """A session got new messages from someone else since the caller read it."""
+
+    def __init__(self, session_id, expected, actual):
+        super().__init__(f"session {session_id!r} has {actual} messages, expected {expected}")
+        self.session_id = session_id
+        self.expected = expected
+        self.actual = actual
+
+
+def default_db_path() -> Path:
+    """LANGZAIN_DB_PATH, or ~/.langzain/conversations.sqlite."""
+    path = os.getenv("LANGZAIN_DB_PATH")
+    if path:
+        return Path(path)
+    return Path.home() / ".langzain" / "conversations.sqlite"
+
+
+def serialize_message(m):
+    """(role, JSON payload) of a dict or LangChain message; deserialize_message() reverses it."""
+    if isinstance(m, dict):
+        return m.get("role"), json.dumps({"kind": "dict", "data": m}, default=str)
+
+    from langchain_core.messages import message_to_dict
+
+    data = message_to_dict(m)
+    return data["type"], json.dumps({"kind": "langchain", "data": data}, default=str)
+
+
+def deserialize_message(payload):
+    """The message serialize_message() stored, as the same kind of object."""
+    payload = json.loads(payload)
+    if payload["kind"] == "dict":
+        return payload["data"]
+
+    from langchain_core.messages import messages_from_dict
+
+    return messages_from_dict([payload["data"]])[0]
+
+
+def _starts_turn(role):
+    return role in ("user", "human")
+
+
+class ConversationStore:
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_db_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # one connection per thread (Streamlit / the GUI worker / servers all use threads)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")   # safe with WAL, much faster
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " message_count INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " role TEXT,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (session_id, seq))"
+            )
+
+    # ------------------------------------------------------------------
+    #  Sessions
+    # ------------------------------------------------------------------
+
+    def new_session(self) -> str:
+        session_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._write_lock, self._conn() as conn:
+            conn.execute(
+                "INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)",
+                (session_id, now, now),
+            )
+        return session_id
+
+    def has_session(self, session_id) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        return row is not None
+
+    def list_sessions(self, limit=20):
+        """Most recently updated sessions: [{"id", "updated_at", "message_count"}, ...]"""
+        rows = self._conn().execute(
+            "SELECT id, updated_at, message_count FROM sessions"
+            " ORDER BY updated_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [{"id": r[0], "updated_at": r[1], "message_count": r[2]} for r in rows]
+
+    def count(self, session_id) -> int:
+        row = self._conn().execute(
+            "SELECT message_count FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    # ------------------------------------------------------------------
+    #  Writing
+    # ------------------------------------------------------------------
+
+    def append(self, session_id, messages, expected_count=None):
+        """
+        Append messages to the end of a session (created if needed).
+
+        With expected_count, raises SessionConflict instead if the session
+        no longer has that many messages (someone else appended first).
+        """
+        if not messages:
+            return
+        rows = [serialize_message(m) for m in messages]
+        now = time.time()
+        with self._write_lock, self._conn() as conn:
+            # take SQLite's write lock up front: other processes wait here,
+            # so the count below stays right until we commit
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)",
+                (session_id, now, now),
+            )
+            start = conn.execute(
+                "SELECT message_count FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()[0]
+            if expected_count is not None and start != expected_count:
+                raise SessionConflict(session_id, expected_count, start)
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, payload, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(session_id, start + i, role, payload, now) for i, (role, payload) in enumerate(rows)],
+            )
+            conn.execute(
+                "UPDATE sessions SET message_count = ?, updated_at = ? WHERE id = ?",
+                (start + len(rows), now, session_id),
+            )
+
+    def save_new(self, session_id, messages, saved_count, expected_count=None) -> int:
+        """
+        Append messages[saved_count:] and return the new saved count.
+        Front ends call this after each turn with their in-memory list.
+        Pass the stored count the turn started from as expected_count to
+        get SessionConflict rather than interleaving with another writer.
+        """
+        self.append(session_id, messages[saved_count:], expected_count)
+        return len(messages)
+
+    # ------------------------------------------------------------------
+    #  Reading
+    # ------------------------------------------------------------------
+
+    def load_page(self, session_id, before_seq=None, limit=50):
+        """
+        One page of messages, walking backwards from the end.
+
+        Returns (messages, first_seq); pass first_seq as before_seq to get
+        the page before it. first_seq is None when there is nothing older.
+        """
+        if before_seq is None:
+            before_seq = self.count(session_id)
+        rows = self._conn().execute(
+            "SELECT seq, payload FROM messages WHERE session_id = ? AND seq < ?"
+            " ORDER BY seq DESC LIMIT ?",
+            (session_id, before_seq, limit),
+        ).fetchall()
+        rows.reverse()
+        first_seq = rows[0][0] if rows and rows[0][0] > 0 else None
+        return [deserialize_message(p) for _, p in rows], first_seq
+
+    def load_recent(self, session_id, limit=RESUME_LIMIT):
+        """
+        The last `limit` messages (or fewer), starting at a user turn so a
+        tool result is never separated from the call that produced it.
+        """
+        rows = self._conn().execute(
+            "SELECT role, payload FROM messages WHERE session_id = ?"
+            " ORDER BY seq DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        rows.reverse()
+        if len(rows) == limit:
+            starts = [i for i, (role, _) in enumerate(rows) if _starts_turn(role)]
+            rows = rows[starts[0]:] if starts else []
+        return [deserialize_message(p) for _, p in rows]
+
+    def iter_messages(self, session_id, batch_size=100):
+        """Yield every message of a session, oldest first, `batch_size` rows at a time."""
+        seq = -1
+        while True:
+            rows = self._conn().execute(
+                "SELECT seq, payload FROM messages WHERE session_id = ? AND seq > ?"
+                " ORDER BY seq LIMIT ?",
+                (session_id, seq, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            for seq, payload in rows:
+                yield deserialize_message(payload)
+
+    def delete_session(self, session_id):
+        with self._write_lock, self._conn() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
@@ -1,53 +1,354 @@
 # tools.py
+import bisect
 import datetime
-import requests
-import wikipedia
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
+if sys.version_info >= (3, 12):
+    from typing import NotRequired, TypedDict
+else:
+    # pydantic rejects typing.TypedDict before 3.12
+    from typing_extensions import NotRequired, TypedDict
 
-def get_current_temperature(latitude: float, longitude: float) -> str:
+try:
+    from .cache import DiskCache, LRUCache, TieredCache, cache_dir
+    from .gazetteer import normalize, resolve
+    from .http_client import http_get
+except ImportError:
+    from langzain.cache import DiskCache, LRUCache, TieredCache, cache_dir
+    from langzain.gazetteer import normalize, resolve
+    from langzain.http_client import http_get
+
+
+# override with LANGZAIN_OPEN_METEO_URL (e.g. a local stand-in for benchmarks);
+# read per request, so setting it after import works too
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Forecasts keyed by rounded coordinates + forecast day. Entries expire at the
+# top of the next hour, so "current temperature" never uses data older than that.
+# Memory LRU in front, SQLite on disk so a restart doesn't mean a cold cache.
+COORD_DECIMALS = 2   # ~1 km – finer than the forecast grid anyway
+FORECAST_BATCH = 100  # locations per Open-Meteo request (keeps the URL short)
+MAX_LOCATIONS = 50    # per get_current_temperatures call
+_forecast_cache = None
+
+
+def _get_forecast_cache():
+    global _forecast_cache
+    if _forecast_cache is None:
+        _forecast_cache = TieredCache(
+            LRUCache(maxsize=512),
+            DiskCache(cache_dir() / "weather.sqlite", max_entries=5000),
+        )
+    return _forecast_cache
+
+
+def weather_cache_stats():
+    """Hit/miss counters of the forecast cache (memory + disk)."""
+    return _get_forecast_cache().stats()
+
+
+def _parse_forecast(data):
     """
-    Fetch the current temperature (approx.) for the given coordinates
-    using the Open-Meteo API. Returns a human-readable sentence.
+    Pre-parse an Open-Meteo hourly forecast into sorted unix timestamps +
+    temperatures, so lookups don't have to parse dates again.
     """
-    BASE_URL = "https://api.open-meteo.com/v1/forecast"
+    epochs = []
+    for t in data["hourly"]["time"]:
+        dt = datetime.datetime.fromisoformat(t.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=datetime.timezone.utc)  # Open-Meteo default is GMT
+        epochs.append(int(dt.timestamp()))
+    return {"times": epochs, "temps": data["hourly"]["temperature_2m"]}
+
+
+def _parse_forecasts(data):
+    """One parsed forecast per location (Open-Meteo returns a list for several)."""
+    return [_parse_forecast(d) for d in (data if isinstance(data, list) else [data])]
+
+
+def _nearest_index(times, now):
+    """Index of the timestamp closest to `now` (times must be sorted) – O(log n); None if empty."""
+    if not times:
+        return None
+    i = bisect.bisect_left(times, now)
+    if i == 0:
+        return 0
+    if i == len(times):
+        return len(times) - 1
+    return i if times[i] - now < now - times[i - 1] else i - 1
+
+
+def _fetch_forecasts(coords):
+    """Forecasts for [(lat, lon), ...] – one request, coordinates comma-separated."""
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon in coords),
         "hourly": "temperature_2m",
         "forecast_days": 1,
     }
+    url = os.getenv("LANGZAIN_OPEN_METEO_URL") or OPEN_METEO_URL
+    resp = http_get(url, params=params, timeout=10)
+    resp.raise_for_status()
+    forecasts = _parse_forecasts(resp.json())
+    if len(forecasts) != len(coords):
+        raise RuntimeError(f"Open-Meteo returned {len(forecasts)} forecasts for {len(coords)} locations")
+    return forecasts
+
 
-    resp = requests.get(BASE_URL, params=params, timeout=10)
+def _current_temperatures(coords, now=None):
+    """
+    Current temperature for every (lat, lon): cached forecasts where we have
+    them, the rest fetched together (FORECAST_BATCH locations per request).
+    None for a location Open-Meteo had no data for.
+    """
+    now = time.time() if now is None else now
+    day = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).date().isoformat()
+    coords = [(round(lat, COORD_DECIMALS), round(lon, COORD_DECIMALS)) for lat, lon in coords]
+    keys = [f"{lat},{lon},{day}" for lat, lon in coords]
+
+    cache = _get_forecast_cache()
+    forecasts = {key: cache.get(key) for key in keys}
+    missing = list(dict.fromkeys(
+        (key, coord) for key, coord in zip(keys, coords) if forecasts[key] is None
+    ))
+    next_hour = (int(now) // 3600 + 1) * 3600
+    for i in range(0, len(missing), FORECAST_BATCH):
+        chunk = missing[i:i + FORECAST_BATCH]
+        for (key, _), forecast in zip(chunk, _fetch_forecasts([coord for _, coord in chunk])):
+            if forecast["times"]:   # an empty one might be better next time
+                cache.set(key, forecast, expires_at=next_hour)
+            forecasts[key] = forecast
+
+    # locations fetched together share one time axis – find the nearest hour
+    # once per axis instead of once per location
+    nearest = {}
+    temps = []
+    for key in keys:
+        times = forecasts[key]["times"]
+        axis = (times[0], times[-1], len(times)) if times else ()
+        if axis not in nearest:
+            nearest[axis] = _nearest_index(times, now)
+        i = nearest[axis]
+        temps.append(None if i is None else forecasts[key]["temps"][i])
+    return temps
+
+
+def _format_temperature(temp):
+    return "no data" if temp is None else f"{temp:.1f} °C"
+
+
+def get_current_temperature(latitude: float, longitude: float) -> str:
+    """
+    Fetch the current temperature (approx.) for the given coordinates
+    using the Open-Meteo API. Returns a human-readable sentence.
+    """
+    temp = _current_temperatures([(latitude, longitude)])[0]
+    if temp is None:
+        return "No temperature data for these coordinates right now."
+    return f"The current temperature is {temp:.1f} °C."
+
+
+class Location(TypedDict):
+    name: NotRequired[str]
+    latitude: float
+    longitude: float
+
+
+def get_current_temperatures(locations: list[Location]) -> str:
+    """
+    Current temperatures (approx.) for several places at once – use this
+    instead of calling get_current_temperature once per place. Each location
+    has a latitude, a longitude and optionally a name. Returns one line per
+    location.
+    """
+    if not locations:
+        return "No locations given."
+    if len(locations) > MAX_LOCATIONS:
+        return f"Too many locations ({len(locations)}); ask for at most {MAX_LOCATIONS} at a time."
+    temps = _current_temperatures([(loc["latitude"], loc["longitude"]) for loc in locations])
+    lines = []
+    for loc, temp in zip(locations, temps):
+        label = loc.get("name") or f"{loc['latitude']:.2f}, {loc['longitude']:.2f}"
+        lines.append(f"{label}: {_format_temperature(temp)}")
+    return "Current temperatures:\n" + "\n".join(lines)
+
+
+def _format_population(n):
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M"
+    return f"{n / 1000:.0f}k" if n >= 1000 else str(n)
+
+
+def resolve_location(name: str) -> str:
+    """
+    Look up the coordinates of a city or town by name, e.g. "Paris",
+    "Paris, Texas" or "London UK". Offline and instant – use it instead of
+    guessing coordinates or searching Wikipedia for them.
+    """
+    matches = resolve(name, limit=4)
+    if not matches:
+        return f"No place called {name!r} in the offline gazetteer."
+    rank, best = matches[0]
+    others = [place for _, place in matches[1:]]
+    lines = [
+        f"{best.label}: latitude {best.latitude:.4f}, longitude {best.longitude:.4f}"
+        f" (population {_format_population(best.population)})"
+    ]
+    if rank > 0:
+        lines[0] = f"Closest match for {name!r} – " + lines[0]
+    if others:
+        lines.append("Other matches: " + "; ".join(
+            f"{p.label} ({p.latitude:.2f}, {p.longitude:.2f})" for p in others
+        ))
+    return "\n".join(lines)
+
+
+def get_current_temperature_in(place: str) -> str:
+    """
+    Current temperature (approx.) in a city or town given by name, e.g.
+    "Oslo" or "Paris, Texas". One call – no need to look up coordinates first.
+    """
+    matches = resolve(place, limit=2)
+    if not matches:
+        return f"No place called {place!r} in the offline gazetteer – pass its coordinates to get_current_temperature instead."
+    rank, best = matches[0]
+    temp = _current_temperatures([(best.latitude, best.longitude)])[0]
+    if temp is None:
+        return f"No temperature data for {best.label} right now."
+    answer = f"The current temperature in {best.label} is {temp:.1f} °C."
+    if rank > 0:
+        answer += f" (Closest match for {place!r}.)"
+    elif len(matches) > 1 and matches[1][0] == 0 and normalize(matches[1][1].name) == normalize(best.name):
+        answer += f" (There is also {matches[1][1].label}; name the region or country to get that one.)"
+    return answer
+
+
+# Wikipedia: we talk to the MediaWiki API directly (through the shared HTTP
+# client) – the same queries the `wikipedia` package makes, minus its
+# connection-per-call and the extra page-info round trip.
+# Search results and page summaries are cached in memory, and the (up to 3)
+# page fetches run concurrently on a small shared pool.
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"   # or LANGZAIN_WIKIPEDIA_API_URL
+WIKI_MAX_RESULTS = 3
+WIKI_PAGE_TIMEOUT = 10   # seconds; slower pages are left out of the answer
+_wiki_search_cache = LRUCache(maxsize=256, ttl=60 * 60)
+_wiki_summary_cache = LRUCache(maxsize=1024, ttl=6 * 60 * 60)
+_wiki_pool = None
+
+
+def _get_wiki_pool():
+    global _wiki_pool
+    if _wiki_pool is None:
+        _wiki_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="langzain-wiki")
+    return _wiki_pool
+
+
+def wikipedia_cache_stats():
+    """Hit/miss counters of the Wikipedia search + summary caches."""
+    return {
+        "search": _wiki_search_cache.stats(),
+        "summary": _wiki_summary_cache.stats(),
+    }
+
+
+def _wiki_api(params):
+    url = os.getenv("LANGZAIN_WIKIPEDIA_API_URL") or WIKIPEDIA_API_URL
+    resp = http_get(url, params={"format": "json", "action": "query", **params})
     resp.raise_for_status()
     data = resp.json()
+    if "error" in data:
+        raise RuntimeError(f"Wikipedia API error: {data['error'].get('info', data['error'])}")
+    return data
 
-    current_utc = datetime.datetime.utcnow()
-    times = [
-        datetime.datetime.fromisoformat(t.replace("Z", "+00:00"))
-        for t in data["hourly"]["time"]
-    ]
-    temps = data["hourly"]["temperature_2m"]
 
-    idx = min(range(len(times)), key=lambda i: abs(times[i] - current_utc))
-    temp = temps[idx]
+def _wiki_titles(query):
+    titles = _wiki_search_cache.get(query)
+    if titles is None:
+        data = _wiki_api({"list": "search", "srprop": "", "srlimit": 10, "srsearch": query})
+        titles = [hit["title"] for hit in data["query"]["search"]]
+        _wiki_search_cache.set(query, titles)
+    return titles
 
-    return f"The current temperature is {temp:.1f} °C."
+
+def _wiki_summary(title):
+    """Summary (intro extract) of one page, or "" for titles without a usable page."""
+    summary = _wiki_summary_cache.get(title)
+    if summary is None:
+        data = _wiki_api({
+            "prop": "extracts|pageprops",
+            "ppprop": "disambiguation",
+            "exintro": "",
+            "explaintext": "",
+            "redirects": "",
+            "titles": title,
+        })
+        summary = ""
+        for page in data["query"].get("pages", {}).values():
+            # missing pages and disambiguation pages have no useful summary;
+            # they won't fix themselves in a few minutes – remember them briefly
+            if "missing" in page or "disambiguation" in page.get("pageprops", {}):
+                continue
+            summary = page.get("extract", "")
+        _wiki_summary_cache.set(title, summary, ttl=None if summary else 10 * 60)
+    return summary
+
+
+class LiveWikipedia:
+    """The default search_wikipedia backend: the MediaWiki API (cached, see above)."""
+
+    def search(self, query, limit=WIKI_MAX_RESULTS):
+        """[(title, summary), ...] in search order."""
+        titles = _wiki_titles(query)[:limit]
+
+        # fetch all pages at once; a failing (or hanging) title doesn't hold up the rest
+        pool = _get_wiki_pool()
+        futures = [pool.submit(_wiki_summary, title) for title in titles]
+        wait(futures, timeout=WIKI_PAGE_TIMEOUT)
+
+        return [
+            (title, future.result())
+            for title, future in zip(titles, futures)
+            if future.done() and future.exception() is None and future.result()
+        ]
+
+
+# Which backend search_wikipedia uses: LANGZAIN_WIKI_BACKEND=live (default)
+# or offline (a local index, see wiki_index.py), or set_wiki_backend().
+_wiki_backend = None
+
+
+def get_wiki_backend():
+    global _wiki_backend
+    if _wiki_backend is None:
+        name = os.getenv("LANGZAIN_WIKI_BACKEND", "live").strip().lower()
+        if name == "offline":
+            try:
+                from .wiki_index import OfflineWikipedia
+            except ImportError:
+                from langzain.wiki_index import OfflineWikipedia
+
+            _wiki_backend = OfflineWikipedia()
+        elif name == "live":
+            _wiki_backend = LiveWikipedia()
+        else:
+            raise ValueError(f"Unknown LANGZAIN_WIKI_BACKEND {name!r} (use 'live' or 'offline')")
+    return _wiki_backend
+
+
+def set_wiki_backend(backend):
+    """Use `backend` (anything with .search(query, limit) -> [(title, summary)])."""
+    global _wiki_backend
+    _wiki_backend = backend
 
 
 def search_wikipedia(query: str) -> str:
     """
     Search Wikipedia and return summaries for up to 3 results.
     """
-    titles = wikipedia.search(query)
-    summaries = []
-    for title in titles[:3]:
-        try:
-            page = wikipedia.page(title=title, auto_suggest=False)
-            summaries.append(f"Page: {title}\nSummary: {page.summary}")
-        except Exception:
-
-            continue
-
-    if not summaries:
+    results = get_wiki_backend().search(query, WIKI_MAX_RESULTS)
+    if not results:
         return "No good Wikipedia search result was found."
-    return "\n\n".join(summaries)
+    return "\n\n".join(f"Page: {title}\nSummary: {summary}" for title, summary in results)
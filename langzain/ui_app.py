@@ -7,8 +7,10 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 import streamlit as st
-from langzain.agent_core import run_agent
-from langzain.app import extract_last_assistant_message
+from langzain.agent_core import get_agents, stream_agent
+from langzain.messages import NO_REPLY, Conversation
+from langzain.sessions import SessionManager
+from langzain.store import ConversationStore
 
 # ---------- Page setup ----------
 st.set_page_config(
@@ -29,52 +31,89 @@ st.markdown(
 st.write("")  # small vertical spacing
 
 
-# ---------- Helper to normalize messages ----------
-def get_role_and_text(msg):
-    """Handle both dict messages and LangChain message objects."""
-    # Role
-    role = getattr(msg, "role", None)
-    content = getattr(msg, "content", None)
-
-    if isinstance(msg, dict):
-        role = msg.get("role", role)
-        content = msg.get("content", content)
-
-    # Content may be plain text or a list of chunks
-    if isinstance(content, list):
-        parts = []
-        for part in content:
-            if isinstance(part, dict) and part.get("type") == "text":
-                parts.append(part.get("text", ""))
-        text = "".join(parts) if parts else str(content)
-    else:
-        text = "" if content is None else str(content)
+# ---------- Shared resources (one per server process, not per session) ----------
+@st.cache_resource
+def get_store():
+    """One conversation store for the whole server process."""
+    return ConversationStore()
+
+
+@st.cache_resource
+def load_agents():
+    """
+    Build the agents once (the full one + the router's cut-down ones) and
+    share them across all sessions and reruns.
+    """
+    return get_agents()
+
 
-    return role, text
+@st.cache_resource
+def get_sessions():
+    """
+    Every session's conversation lives here, not in st.session_state: idle
+    sessions get compressed / spilled to disk and the total stays under
+    LANGZAIN_SESSION_MEMORY_MB (see sessions.py).
+    """
+    return SessionManager()
 
 
 # ---------- Session state ----------
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+
+store = get_store()
+sessions = get_sessions()
+
+# The session id lives in the URL (?session=...), so a reload – or a bookmark –
+# resumes the same conversation
+session_id = st.session_state.get("session_id") or st.query_params.get("session")
+session = sessions.get(session_id) if session_id else None
+if session is None:
+    # new, or forgotten by the session manager: resume from the store
+    if session_id and store.has_session(session_id):
+        conversation = Conversation(store.load_recent(session_id))
+    else:
+        session_id = store.new_session()
+        conversation = Conversation()
+        st.query_params["session"] = session_id
+    # messages are normalized once, when added – reruns just read .visible
+    session = sessions.add(session_id, conversation, saved_count=len(conversation))
+    st.session_state.session_id = session_id
+
+conversation = session.conversation
 
 
 # ---------- Render past conversation ----------
-for msg in st.session_state.messages:
-    role, text = get_role_and_text(msg)
+# Only the latest messages are drawn on every rerun; older ones sit in a
+# collapsed section, one page at a time, so a rerun costs O(page), not O(history).
+RECENT_MESSAGES = 40
+PAGE_SIZE = 40
 
-    if role == "user":
-        with st.chat_message("user", avatar="🟢"):      # green user icon
-            st.markdown(text)
-    elif role in ("assistant", "ai"):
-        with st.chat_message("assistant", avatar="🟣"):  # purple assistant icon
-            st.markdown(text)
+AVATARS = {"user": "🟢", "assistant": "🟣"}   # green user icon, purple assistant icon
 
 
+def render_entries(entries):
+    for m in entries:
+        with st.chat_message(m.role, avatar=AVATARS[m.role]):
+            st.markdown(m.text)
+
+
+display = conversation.visible
+older_count = max(0, len(display) - RECENT_MESSAGES)
+
+if older_count:
+    with st.expander(f"Earlier messages ({older_count})", expanded=False):
+        pages = (older_count + PAGE_SIZE - 1) // PAGE_SIZE
+        # page 1 = the oldest messages, last page = right before the recent ones
+        page = st.number_input("Page", min_value=1, max_value=pages, value=pages, step=1)
+        start = (page - 1) * PAGE_SIZE
+        render_entries(display[start:min(start + PAGE_SIZE, older_count)])
+
+render_entries(display[older_count:])
+
 
 # ---------- New user input ----------
 user_input = st.chat_input("Type your message here...")
 if user_input:
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    conversation.add_user(user_input)
 
     # show the user's message
     with st.chat_message("user", avatar="🧑‍🎨"):
@@ -84,17 +123,27 @@ if user_input:
     with st.chat_message("assistant", avatar="🧠"):
         placeholder = st.empty()
         placeholder.markdown("_Thinking..._")
-       
-       
-        updated_messages = run_agent(st.session_state.messages)
-        
-         # get just the latest assistant reply
-        assistant_reply = extract_last_assistant_message(updated_messages)
-
-        # 3) append assistant reply to *our* history
-        st.session_state.messages.append(
-            {"role": "assistant", "content": assistant_reply}
-        )
+
+        # fill the bubble as tokens stream in
+        streamed_text = ""
+        new_messages = []
+        # the router picks one of the cached agents per turn
+        for event in stream_agent(conversation.raw, agent=load_agents()):
+            if event["type"] == "token":
+                streamed_text += event["text"]
+                placeholder.markdown(streamed_text + "▌")
+            elif event["type"] == "tool_call":
+                placeholder.markdown(streamed_text + f"\n\n_Calling `{event['name']}`..._")
+            elif event["type"] == "done":
+                new_messages = event["new_messages"]
+
+        # add just this turn's messages to *our* history
+        conversation.extend(new_messages)
+        assistant_reply = conversation.last_reply or NO_REPLY
 
         # update the bubble
         placeholder.markdown(assistant_reply)
+
+    # save just the new messages
+    session.saved_count = store.save_new(session.session_id, conversation.raw, session.saved_count)
+    sessions.touch(session, conversation)
@@ -0,0 +1,261 @@
+# wiki_index.py
+"""
+Offline Wikipedia: a local SQLite FTS5 index over a dump of page summaries.
+
+Build it once from a dump:
+
+    langzain-wiki-index build enwiki-latest-abstract.xml.gz
+    langzain-wiki-index build summaries.jsonl --out /data/wiki.sqlite
+    langzain-wiki-index search "who founded rome"
+
+Dumps can be (optionally .gz / .bz2 compressed)
+  - Wikimedia abstract dumps (*.xml: <doc><title>Wikipedia: …</title><abstract>…)
+  - JSON lines with "title" and "summary" (or "extract" / "abstract" / "text")
+  - TSV: title <tab> summary
+
+then run with LANGZAIN_WIKI_BACKEND=offline and search_wikipedia answers
+from the index (LANGZAIN_WIKI_INDEX, default ~/.cache/langzain/wiki_index.sqlite)
+– no network, a few ms per call, same output format as the live API.
+
+Ranking is BM25 with title matches weighted WIKI_TITLE_WEIGHT times more
+than summary matches, and a page whose title is exactly the query first.
+"""
+import argparse
+import bz2
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+try:
+    from .cache import cache_dir
+except ImportError:
+    from langzain.cache import cache_dir
+
+WIKI_TITLE_WEIGHT = 10.0
+BATCH_SIZE = 5000
+PROGRESS_EVERY = 100_000   # pages between progress lines while building
+
+SCHEMA = """
+CREATE TABLE pages (id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE, summary TEXT NOT NULL);
+CREATE INDEX pages_title_nocase ON pages (title COLLATE NOCASE);
+CREATE VIRTUAL TABLE pages_fts USING fts5(
+    title, summary, content='pages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def default_index_path() -> Path:
+    return Path(os.getenv("LANGZAIN_WIKI_INDEX") or cache_dir() / "wiki_index.sqlite")
+
+
+# ----------------------------------------------------------------------
+#  Reading dumps
+# ----------------------------------------------------------------------
+
+def _open_dump(path):
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _dump_format(path):
+    name = str(path)
+    for ext in (".gz", ".bz2"):
+        if name.endswith(ext):
+            name = name[: -len(ext)]
+    if name.endswith(".xml"):
+        return "xml"
+    if name.endswith((".tsv", ".txt")):
+        return "tsv"
+    return "jsonl"
+
+
+def _abstract_pages(f):
+    # iterparse + clear() so a multi-GB dump never sits in memory
+    title = None
+    for _, elem in ET.iterparse(f, events=("end",)):
+        if elem.tag == "title":
+            title = (elem.text or "").removeprefix("Wikipedia: ")
+        elif elem.tag == "abstract":
+            yield title, elem.text or ""
+        elif elem.tag == "doc":
+            elem.clear()
+
+
+def _jsonl_pages(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        summary = next((record[k] for k in ("summary", "extract", "abstract", "text") if record.get(k)), "")
+        yield record.get("title"), summary
+
+
+def _tsv_pages(f):
+    for line in f:
+        title, _, summary = line.decode("utf-8", "replace").rstrip("\n").partition("\t")
+        yield title, summary.replace("\\n", "\n")
+
+
+def read_dump(path):
+    """Yield (title, summary) for every usable page of a dump."""
+    readers = {"xml": _abstract_pages, "jsonl": _jsonl_pages, "tsv": _tsv_pages}
+    with _open_dump(path) as f:
+        for title, summary in readers[_dump_format(path)](f):
+            title, summary = (title or "").strip(), (summary or "").strip()
+            # stub abstracts ("|", "{{...") and empty pages aren't worth a search hit
+            if title and len(summary) > 1 and not summary.startswith(("{", "|")):
+                yield title, summary
+
+
+# ----------------------------------------------------------------------
+#  Building
+# ----------------------------------------------------------------------
+
+def build_index(dump_path, out_path=None, log=print):
+    """Build the index from a dump; written to a temp file and swapped in at the end."""
+    out_path = Path(out_path or default_index_path())
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".building")
+    tmp_path.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        # nothing to protect until the file is swapped in
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(SCHEMA)
+
+        count = 0
+        next_report = PROGRESS_EVERY
+        batch = []
+        for page in read_dump(dump_path):
+            batch.append(page)
+            if len(batch) >= BATCH_SIZE:
+                # duplicate titles are skipped, so count doesn't move in whole batches
+                count += _insert(conn, batch)
+                batch = []
+                if count >= next_report:
+                    log(f"  {count} pages…")
+                    next_report = (count // PROGRESS_EVERY + 1) * PROGRESS_EVERY
+        count += _insert(conn, batch)
+
+        log("Indexing…")
+        conn.execute("INSERT INTO pages_fts (pages_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO pages_fts (pages_fts) VALUES ('optimize')")
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("source", str(dump_path)), ("pages", str(count)), ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S%z"))],
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, out_path)
+    log(f"Indexed {count} pages into {out_path} in {time.perf_counter() - start:.1f}s")
+    return count
+
+
+def _insert(conn, batch):
+    # the first page with a title wins (dumps can repeat titles)
+    cur = conn.executemany("INSERT OR IGNORE INTO pages (title, summary) VALUES (?, ?)", batch)
+    return cur.rowcount if cur.rowcount >= 0 else len(batch)
+
+
+# ----------------------------------------------------------------------
+#  Searching
+# ----------------------------------------------------------------------
+
+def _match_expression(query):
+    # every word as a quoted term, OR-ed: FTS5 syntax in the query can't break
+    # anything and pages matching more of the words rank higher (BM25)
+    words = _WORD.findall(query.lower())
+    return " OR ".join(f'"{w}"' for w in words)
+
+
+class OfflineWikipedia:
+    """search_wikipedia backend reading a local index (see build_index)."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or default_index_path())
+        if not self.path.exists():
+            raise FileNotFoundError(
+                f"No offline Wikipedia index at {self.path}; "
+                f"build one with `langzain-wiki-index build <dump>`"
+            )
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute("PRAGMA mmap_size=268435456")
+
+    def search(self, query, limit=3):
+        """[(title, summary), ...] best matches first."""
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            exact = self._conn.execute(
+                "SELECT title, summary FROM pages WHERE title = ? COLLATE NOCASE LIMIT 1", (query.strip(),)
+            ).fetchall()
+            rows = self._conn.execute(
+                "SELECT p.title, p.summary FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid"
+                " WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, ?, 1.0) LIMIT ?",
+                (expression, WIKI_TITLE_WEIGHT, limit + 1),
+            ).fetchall()
+        results = exact + [r for r in rows if not exact or r[0] != exact[0][0]]
+        return results[:limit]
+
+    def info(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="langzain-wiki-index", description="Offline Wikipedia index for search_wikipedia.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the index from a dump")
+    build.add_argument("dump", help="abstract XML, JSONL or TSV dump (.gz / .bz2 ok)")
+    build.add_argument("--out", help=f"index file (default: LANGZAIN_WIKI_INDEX or {default_index_path()})")
+    search = sub.add_parser("search", help="try a query against the index")
+    search.add_argument("query")
+    search.add_argument("--index", help="index file")
+    search.add_argument("-n", type=int, default=3, help="results (default 3)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_index(args.dump, args.out)
+        return 0
+
+    wiki = OfflineWikipedia(args.index)
+    start = time.perf_counter()
+    results = wiki.search(args.query, args.n)
+    elapsed = time.perf_counter() - start
+    for title, summary in results:
+        print(f"{title}\n  {summary[:200]}\n")
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
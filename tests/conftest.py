@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# run against the checkout, installed or not
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_dirs(tmp_path, monkeypatch):
+    """Caches, the conversation DB and traces go to a per-test temp dir."""
+    monkeypatch.setenv("LANGZAIN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("LANGZAIN_DB_PATH", str(tmp_path / "conversations.sqlite"))
+    monkeypatch.delenv("LANGZAIN_TRACE_FILE", raising=False)
+    yield
+
+
+class FakeClock:
+    """Stands in for the `time` module of the code under test."""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """A local fake OpenAI endpoint (and tool APIs), with fresh agent_core state."""
+    from langzain import agent_core, llm_cache
+    from langzain.benchmarks.fake_servers import fake_services
+
+    monkeypatch.setattr(agent_core, "_llms", {})
+    monkeypatch.setattr(agent_core, "_agents", {})
+    monkeypatch.setattr(llm_cache, "_store", None)
+    with fake_services(llm_latency=0.0, token_rate=10_000.0) as (llm, tools):
+        yield llm
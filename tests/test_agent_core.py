@@ -0,0 +1,41 @@
+import asyncio
+
+from langzain import agent_core
+
+
+def _fake_agent(monkeypatch, fail):
+    """arun_agent stand-in: answers every conversation, fails the ones whose prompt is in `fail`."""
+
+    async def arun_agent(messages, agent=None, return_delta=False, use_cache=True):
+        prompt = messages[-1]["content"]
+        await asyncio.sleep(0.01)
+        if prompt in fail:
+            raise RuntimeError(f"429 for {prompt}")
+        return messages + [{"role": "assistant", "content": f"re: {prompt}"}]
+
+    monkeypatch.setattr(agent_core, "arun_agent", arun_agent)
+
+
+def _conversations(n):
+    return [[{"role": "user", "content": f"p{i}"}] for i in range(n)]
+
+
+def test_one_failed_conversation_keeps_the_others(monkeypatch):
+    _fake_agent(monkeypatch, fail={"p2"})
+    results = agent_core.run_agents_batch(_conversations(5), max_concurrency=2)
+    assert isinstance(results[2], RuntimeError) and "p2" in str(results[2])
+    assert [r[-1]["content"] for i, r in enumerate(results) if i != 2] == ["re: p0", "re: p1", "re: p3", "re: p4"]
+
+
+def test_batch_can_run_again(monkeypatch):
+    _fake_agent(monkeypatch, fail=set())
+    for _ in range(3):
+        results = agent_core.run_agents_batch(_conversations(3))
+        assert [r[-1]["content"] for r in results] == ["re: p0", "re: p1", "re: p2"]
+
+
+def test_async_batch_in_input_order(monkeypatch):
+    _fake_agent(monkeypatch, fail={"p0"})
+    results = asyncio.run(agent_core.arun_agents_batch(_conversations(3)))
+    assert isinstance(results[0], RuntimeError)
+    assert [r[-1]["content"] for r in results[1:]] == ["re: p1", "re: p2"]
@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from langzain import batch
+
+
+def _write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def _results(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _fake_agent(monkeypatch, fail=()):
+    """arun_agent stand-in: echoes the prompt, raises for prompts in `fail`."""
+    calls = []
+
+    async def arun_agent(messages, return_delta=False, use_cache=True):
+        prompt = messages[-1]["content"]
+        calls.append(prompt)
+        if prompt in fail:
+            raise RuntimeError("boom")
+        return [{"role": "assistant", "content": f"re: {prompt}"}]
+
+    monkeypatch.setattr(batch, "arun_agent", arun_agent)
+    return calls
+
+
+def _run(in_path, out_path, **kwargs):
+    return asyncio.run(batch.run_batch(str(in_path), str(out_path), log=lambda msg: None, **kwargs))
+
+
+def test_read_records(tmp_path):
+    path = tmp_path / "in.jsonl"
+    _write_lines(path, [
+        '{"id": "a", "prompt": "hi"}',
+        '',
+        '{"turns": ["one", "two"]}',
+        'not json',
+        '{"id": "b"}',
+    ])
+    records = list(batch.read_records(path))
+    assert records[0] == ("a", {"history": [], "turns": ["hi"]}, None)
+    assert records[1] == ("line-3", {"history": [], "turns": ["one", "two"]}, None)
+    assert records[2][0] == "line-4" and records[2][2].startswith("invalid JSON")
+    assert records[3][0] == "b" and records[3][1] is None
+
+
+def test_runs_every_turn(tmp_path, monkeypatch):
+    calls = _fake_agent(monkeypatch)
+    in_path, out_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_lines(in_path, ['{"id": "q", "turns": ["one", "two"]}'])
+    summary = _run(in_path, out_path)
+    (result,) = _results(out_path)
+    assert calls == ["one", "two"]
+    assert result["status"] == "ok"
+    assert result["replies"] == ["re: one", "re: two"]
+    assert result["reply"] == "re: two"
+    assert summary["ok"] == 1 and summary["errors"] == 0
+
+
+def test_resume_skips_done_and_retries_failed(tmp_path, monkeypatch):
+    in_path, out_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_lines(in_path, [json.dumps({"id": str(i), "prompt": f"p{i}"}) for i in range(4)])
+
+    _fake_agent(monkeypatch, fail={"p2"})
+    first = _run(in_path, out_path, concurrency=2)
+    assert (first["ok"], first["errors"]) == (3, 1)
+
+    calls = _fake_agent(monkeypatch)
+    second = _run(in_path, out_path, concurrency=2)
+    assert calls == ["p2"]
+    assert (second["ok"], second["errors"], second["skipped"]) == (1, 0, 3)
+    assert batch.finished_ids(str(out_path)) == {"0", "1", "2", "3"}
+
+
+def test_resume_after_a_line_cut_short(tmp_path, monkeypatch):
+    in_path, out_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_lines(in_path, ['{"id": "a", "prompt": "x"}', '{"id": "b", "prompt": "y"}'])
+    # a crash mid-write: "a" finished, "b" was half written
+    out_path.write_text('{"id": "a", "status": "ok"}\n{"id": "b", "sta', encoding="utf-8")
+
+    calls = _fake_agent(monkeypatch)
+    summary = _run(in_path, out_path)
+    assert calls == ["y"]
+    assert summary["skipped"] == 1
+    lines = out_path.read_text(encoding="utf-8").splitlines()
+    assert lines[-1].startswith('{"id": "b", "status": "ok"')
+    assert batch.finished_ids(str(out_path)) == {"a", "b"}
@@ -0,0 +1,58 @@
+from langzain import cache as cache_module
+from langzain.cache import DiskCache, LRUCache, TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1     # a is now the most recent
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+
+
+def test_entries_expire_at_their_time(monkeypatch, clock):
+    monkeypatch.setattr(cache_module, "time", clock)
+    lru = LRUCache()
+    lru.set("k", "v", expires_at=clock.now + 10)
+    assert lru.get("k") == "v"
+    clock.now += 10
+    assert lru.get("k") is None
+
+
+def test_tiered_cache_falls_back_to_disk_and_promotes(tmp_path):
+    disk = DiskCache(tmp_path / "c.sqlite")
+    tiered = TieredCache(LRUCache(maxsize=1), disk)
+    tiered.set("a", {"x": 1})
+    tiered.set("b", {"x": 2})          # pushes "a" out of memory
+    assert "a" not in tiered.memory._data
+
+    assert tiered.get("a") == {"x": 1}  # from disk...
+    assert "a" in tiered.memory._data   # ...and back in memory
+    assert tiered.stats()["disk"]["hits"] == 1
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    DiskCache(tmp_path / "c.sqlite").set("k", [1, 2, 3])
+    fresh = TieredCache(LRUCache(), DiskCache(tmp_path / "c.sqlite"))
+    assert fresh.get("k") == [1, 2, 3]
+
+
+def test_promoted_entries_keep_their_expiry(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(cache_module, "time", clock)
+    DiskCache(tmp_path / "c.sqlite").set("k", "v", expires_at=clock.now + 60)
+    tiered = TieredCache(LRUCache(), DiskCache(tmp_path / "c.sqlite"))
+    assert tiered.get("k") == "v"
+    clock.now += 60
+    assert tiered.get("k") is None
+
+
+def test_disk_cache_caps_entries(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(cache_module, "time", clock)
+    disk = DiskCache(tmp_path / "c.sqlite", max_entries=2)
+    for i in range(4):
+        clock.now += 1
+        disk.set(f"k{i}", i)
+    assert disk.get("k0") is None and disk.get("k1") is None
+    assert disk.get("k3") == 3
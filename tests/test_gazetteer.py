@@ -0,0 +1,125 @@
+import pytest
+
+from langzain import gazetteer, tools
+from langzain.gazetteer import Gazetteer, Place, load_gazetteer, normalize, resolve
+
+
+def _labels(query, limit=5):
+    return [place.label for _, place in resolve(query, limit)]
+
+
+def test_normalize():
+    assert normalize("São Paulo") == "sao paulo"
+    assert normalize("St. John's") == "st johns"
+    assert normalize("  Winston-Salem ") == "winston salem"
+
+
+def test_exact_name_biggest_first():
+    ranked = resolve("Paris")
+    assert [rank for rank, _ in ranked] == [0, 0]
+    assert ranked[0][1].label == "Paris, Île-de-France, France"
+    assert ranked[1][1].label == "Paris, Texas, United States"
+
+
+@pytest.mark.parametrize("query", ["Paris, Texas", "Paris TX", "paris, tx", "Paris, USA"])
+def test_qualifiers(query):
+    assert _labels(query) == ["Paris, Texas, United States"]
+
+
+def test_country_qualifier():
+    assert _labels("London UK") == ["London, England, United Kingdom"]
+    assert _labels("London, Canada") == ["London, Ontario, Canada"]
+
+
+def test_prefix():
+    rank, place = resolve("san fr")[0]
+    assert (rank, place.name) == (1, "San Francisco")
+    # short queries only match exactly
+    assert resolve("sa") == []
+
+
+@pytest.mark.parametrize("query, name", [("Pariss", "Paris"), ("Muenchen", "Munich"), ("Munchn", "Munich")])
+def test_fuzzy(query, name):
+    rank, place = resolve(query)[0]
+    assert rank >= 1 and place.name == name
+
+
+@pytest.mark.parametrize("query", ["München", "Munchen"])
+def test_alternate_names_match_exactly(query):
+    rank, place = resolve(query)[0]
+    assert (rank, place.name) == (0, "Munich")
+
+
+def test_no_match_for_made_up_places():
+    assert resolve("Atlantis") == []
+    assert resolve("Qwzxv") == []
+    assert resolve("") == []
+
+
+def test_prefix_keeps_the_most_populous():
+    places = [(Place(f"Town {i}", "XX", "X", "", 0.0, 0.0, i), {f"town {i}"}) for i in range(30)]
+    g = Gazetteer(places)
+    found = g.search("town", limit=gazetteer.PREFIX_TOP)
+    assert [p.population for p in found] == list(range(29, 29 - gazetteer.PREFIX_TOP, -1))
+
+
+def test_geonames_file(tmp_path, monkeypatch):
+    def row(geoname_id, name, ascii_name, lat, lon, country, admin1, population):
+        fields = [str(geoname_id), name, ascii_name, "", str(lat), str(lon), "P", "PPL", country, "",
+                  admin1, "", "", "", str(population), "", "", "Europe/Oslo", "2024-01-01"]
+        return "\t".join(fields)
+
+    path = tmp_path / "cities15000.txt"
+    path.write_text("\n".join([
+        row(1, "Tromsø", "Tromso", 69.6496, 18.956, "NO", "18", 77544),
+        row(2, "Bodø", "Bodo", 67.28, 14.405, "NO", "18", 52357),
+    ]) + "\n", encoding="utf-8")
+    monkeypatch.setenv("LANGZAIN_GAZETTEER", str(path))
+    monkeypatch.setattr(gazetteer, "_gazetteer", None)
+
+    (rank, place), = resolve("Tromso")
+    assert rank == 0
+    assert place.label == "Tromsø, 18, Norway"   # country name from the bundled data
+    assert (place.latitude, place.population) == (69.6496, 77544)
+    assert resolve("Paris") == []   # the file replaces the bundled places
+    assert len(load_gazetteer(path).places) == 2
+
+
+def test_resolve_location():
+    text = tools.resolve_location("Paris")
+    assert text.startswith("Paris, Île-de-France, France: latitude 48.8566, longitude 2.3522 (population 2.1M)")
+    assert "Other matches: Paris, Texas, United States" in text
+    assert tools.resolve_location("Pariss").startswith("Closest match for 'Pariss' – Paris, Île-de-France")
+    assert tools.resolve_location("Atlantis") == "No place called 'Atlantis' in the offline gazetteer."
+
+
+@pytest.fixture
+def temperatures(monkeypatch):
+    """Every place is 12.5 °C; records the coordinates asked for."""
+    asked = []
+
+    def fake(coords, now=None):
+        asked.extend(coords)
+        return [12.5] * len(coords)
+
+    monkeypatch.setattr(tools, "_current_temperatures", fake)
+    return asked
+
+
+def test_temperature_by_name(temperatures):
+    answer = tools.get_current_temperature_in("Paris")
+    assert answer.startswith("The current temperature in Paris, Île-de-France, France is 12.5 °C.")
+    assert "There is also Paris, Texas, United States" in answer
+    assert temperatures == [(48.8566, 2.3522)]
+
+    assert tools.get_current_temperature_in("Paris, Texas") == (
+        "The current temperature in Paris, Texas, United States is 12.5 °C."
+    )
+    assert tools.get_current_temperature_in("Munchn").endswith("(Closest match for 'Munchn'.)")
+
+
+def test_temperature_by_name_unknown_place(temperatures):
+    answer = tools.get_current_temperature_in("Atlantis")
+    assert answer.startswith("No place called 'Atlantis'")
+    assert "get_current_temperature" in answer
+    assert temperatures == []
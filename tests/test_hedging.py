@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+import pytest
+from langchain_openai import ChatOpenAI
+
+from langzain.benchmarks.fake_servers import FakeLLMServer
+from langzain.hedging import FAILURE_THRESHOLD, MIN_SAMPLES, Endpoint, HedgedChatModel, _Race
+
+
+def _endpoint(name, latency=None):
+    endpoint = Endpoint(name, model=None, hedge_delay=1.0)
+    for _ in range(MIN_SAMPLES if latency else 0):
+        endpoint.succeeded("full", latency)
+    return endpoint
+
+
+def test_deadline_is_the_launched_endpoints():
+    primary, fast, slow = _endpoint("a", 0.2), _endpoint("b", 0.1), _endpoint("c", 5.0)
+    race = _Race([primary, fast, slow], "full")
+    assert race.launch() is primary
+    assert race.deadline() == 0.2
+    assert race.launch() is fast
+    assert race.deadline() == 0.1
+    assert race.launch() is slow
+    assert race.deadline() is None   # nothing left to hedge to
+
+
+def test_broken_primary_is_skipped():
+    primary, fallback, spare = _endpoint("a", 0.2), _endpoint("b", 3.0), _endpoint("c")
+    for _ in range(FAILURE_THRESHOLD):
+        primary.failed()
+    race = _Race([primary, fallback, spare], "full")
+    assert race.launch() is fallback
+    assert race.deadline() == 3.0   # the fallback's p95, not the primary's
+
+
+# -- end to end, against local fake OpenAI servers ----------------------------
+
+class _Tracked:
+    """Passes calls on to a chat model and notes what happened to them."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+        self.cancelled = 0
+        self.closed = 0
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return self.model._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        self.calls += 1
+        try:
+            return await self.model._agenerate(*args, **kwargs)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    def _stream(self, *args, **kwargs):
+        self.calls += 1
+        try:
+            yield from self.model._stream(*args, **kwargs)
+        except GeneratorExit:
+            self.closed += 1
+            raise
+
+    async def _astream(self, *args, **kwargs):
+        self.calls += 1
+        try:
+            async for chunk in self.model._astream(*args, **kwargs):
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            self.closed += 1
+            raise
+
+
+def _chat_model(url):
+    return ChatOpenAI(model="fake", base_url=url + "/v1", api_key="test", max_retries=0)
+
+
+@pytest.fixture
+def servers():
+    """A slow primary (1 s to the first byte, 30-word replies) and a fast fallback (3 words)."""
+    slow = FakeLLMServer(latency=1.0, token_rate=10_000.0, reply_tokens=30).start()
+    fast = FakeLLMServer(latency=0.0, token_rate=10_000.0, reply_tokens=3).start()
+    yield slow, fast
+    slow.stop()
+    fast.stop()
+
+
+def _hedged(slow, fast, p95=0.1, hedge_delay=5.0):
+    primary = Endpoint("primary", _Tracked(_chat_model(slow.url)), hedge_delay)
+    fallback = Endpoint("fallback", _Tracked(_chat_model(fast.url)), hedge_delay)
+    for kind in ("full", "first"):
+        for _ in range(MIN_SAMPLES):
+            primary.succeeded(kind, p95)
+    return HedgedChatModel(endpoints=[primary, fallback]), primary, fallback
+
+
+def _words(reply):
+    return len(reply.content.split())
+
+
+def test_hedge_after_p95_fallback_wins_sync(servers):
+    slow, fast = servers
+    model, primary, fallback = _hedged(slow, fast)
+    start = time.perf_counter()
+    reply = model.invoke("hi")
+    # hedged at the primary's p95 (0.1 s), long before its 1 s or the 5 s default
+    assert time.perf_counter() - start < 0.8
+    assert _words(reply) == 3
+    assert (slow.requests_served, fast.requests_served) == (1, 1)
+    assert len(fallback._latencies["full"]) == 1   # only the winner's latency counts
+    assert len(primary._latencies["full"]) == MIN_SAMPLES
+
+    # streamed: the loser's stream is closed once it has its first chunk
+    reply = "".join(chunk.content for chunk in model.stream("hi"))
+    assert len(reply.split()) == 3
+    deadline = time.time() + 3
+    while primary.model.closed < 1 and time.time() < deadline:
+        time.sleep(0.05)
+    assert primary.model.closed == 1
+
+
+def test_no_hedge_before_the_deadline(servers):
+    slow, fast = servers
+    slow.latency = 0.0
+    model, _, _ = _hedged(slow, fast, p95=2.0)
+    assert _words(model.invoke("hi")) == 30
+    assert fast.requests_served == 0
+
+
+def test_hedge_after_p95_fallback_wins_async(servers):
+    slow, fast = servers
+    model, primary, fallback = _hedged(slow, fast)
+
+    async def run():
+        start = time.perf_counter()
+        reply = await model.ainvoke("hi")
+        elapsed = time.perf_counter() - start
+        streamed = [chunk.content async for chunk in model.astream("hi")]
+        return reply, elapsed, "".join(streamed)
+
+    reply, elapsed, streamed = asyncio.run(run())
+    assert elapsed < 0.8 and _words(reply) == 3
+    assert len(streamed.split()) == 3
+    # the losing requests were cancelled outright
+    assert primary.model.cancelled == 1
+    assert primary.model.closed == 1
+    assert primary.model.calls == fallback.model.calls == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_failing_primary_opens_the_circuit(servers, use_async):
+    slow, fast = servers
+    dead = FakeLLMServer()
+    dead_url = dead.url
+    dead.server_close()   # nothing listens there: every call fails straight away
+    primary = Endpoint("primary", _Tracked(_chat_model(dead_url)), 5.0)
+    fallback = Endpoint("fallback", _Tracked(_chat_model(fast.url)), 5.0)
+    model = HedgedChatModel(endpoints=[primary, fallback])
+
+    async def acalls(n):
+        return [await model.ainvoke("hi") for _ in range(n)]
+
+    # one event loop for all async calls (the async client stays bound to it)
+    n = FAILURE_THRESHOLD + 1
+    replies = asyncio.run(acalls(n)) if use_async else [model.invoke("hi") for _ in range(n)]
+    assert all(_words(reply) == 3 for reply in replies)   # failed over to the fallback
+    # the call after FAILURE_THRESHOLD failures skipped the circuit-broken primary
+    assert primary.model.calls == FAILURE_THRESHOLD
+    assert fallback.model.calls == n
+    assert not primary.available()
@@ -0,0 +1,133 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from langzain.history import SUMMARY_PREFIX, HistoryPolicy, estimate_tokens, format_for_summary
+
+
+def _turn(i, tool_output="", reply="ok"):
+    """user -> assistant tool call -> tool result -> assistant reply"""
+    call_id = f"call{i}"
+    return [
+        HumanMessage(content=f"question {i}"),
+        AIMessage(content="", tool_calls=[{"name": "search_wikipedia", "args": {"query": f"q{i}"}, "id": call_id}]),
+        ToolMessage(content=tool_output or f"result {i}", tool_call_id=call_id),
+        AIMessage(content=reply),
+    ]
+
+
+def _conversation(turns, **kwargs):
+    return [m for i in range(turns) for m in _turn(i, **kwargs)]
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous_summary, messages):
+        self.calls.append((previous_summary, list(messages)))
+        return f"summary #{len(self.calls)}"
+
+
+def _tokens(messages):
+    return sum(estimate_tokens(m) for m in messages)
+
+
+def _calls_have_results(window):
+    """Every tool call in the window is answered by a ToolMessage after it, and vice versa."""
+    open_calls = set()
+    for m in window:
+        for call in getattr(m, "tool_calls", None) or []:
+            open_calls.add(call["id"])
+        if isinstance(m, ToolMessage):
+            if m.tool_call_id not in open_calls:
+                return False
+            open_calls.discard(m.tool_call_id)
+    return not open_calls
+
+
+def test_fits_the_budget_unchanged():
+    messages = _conversation(3)
+    assert HistoryPolicy(max_tokens=10_000).apply(messages) is messages
+
+
+def test_no_budget_sends_everything():
+    messages = _conversation(50, tool_output="x" * 2000)
+    assert HistoryPolicy(max_tokens=None).apply(messages) is messages
+
+
+def test_elides_old_tool_outputs_only():
+    messages = _conversation(4, tool_output="x" * 2000)
+    policy = HistoryPolicy(max_tokens=1500, keep_tool_turns=2, tool_output_chars=100)
+    window = policy.apply(messages)
+
+    assert len(window) == len(messages)
+    old, recent = window[2], window[-2]
+    assert len(old.content) < 200 and "1900 more characters elided" in old.content
+    assert recent.content == "x" * 2000
+    assert messages[2].content == "x" * 2000   # the caller's list is untouched
+    assert _tokens(window) <= 1500
+
+
+def test_without_summarizer_only_elides():
+    messages = _conversation(40, reply="r" * 400)
+    window = HistoryPolicy(max_tokens=500).apply(messages)
+    assert len(window) == len(messages)
+
+
+def test_summarizes_the_oldest_turns_within_budget():
+    summarizer = RecordingSummarizer()
+    messages = _conversation(40, reply="r" * 400)
+    policy = HistoryPolicy(max_tokens=1000, summarizer=summarizer)
+    window = policy.apply(messages)
+
+    assert window[0] == {"role": "system", "content": SUMMARY_PREFIX + "summary #1"}
+    assert isinstance(window[1], HumanMessage)        # cut at the start of a turn
+    assert window[-1] is messages[-1]
+    assert _tokens(window) <= 1000
+    assert len(summarizer.calls) == 1 and summarizer.calls[0][0] == ""
+
+
+def test_never_separates_tool_calls_from_results():
+    summarizer = RecordingSummarizer()
+    messages = _conversation(30, tool_output="t" * 600, reply="r" * 300)
+    policy = HistoryPolicy(max_tokens=1200, summarizer=summarizer)
+    for n in range(4, len(messages) + 1, 4):
+        window = policy.apply(messages[:n] + [HumanMessage(content="next question")])
+        assert _calls_have_results(window[1:] if isinstance(window[0], dict) else window), n
+    assert summarizer.calls   # the window did move
+
+
+def test_summary_is_reused_while_the_window_fits():
+    summarizer = RecordingSummarizer()
+    policy = HistoryPolicy(max_tokens=1000, summarizer=summarizer)
+    messages = _conversation(40, reply="r" * 400)
+    first = policy.apply(messages)
+
+    # one more short turn: the cached summary (found by prefix hash) still works
+    messages = messages + [HumanMessage(content="thanks"), AIMessage(content="np")]
+    second = policy.apply(messages)
+    assert len(summarizer.calls) == 1
+    assert second[0] == first[0]
+    assert second[-1] is messages[-1]
+
+
+def test_new_summary_builds_on_the_previous_one():
+    summarizer = RecordingSummarizer()
+    policy = HistoryPolicy(max_tokens=1000, summarizer=summarizer)
+    messages = _conversation(40, reply="r" * 400)
+    policy.apply(messages)
+
+    messages = messages + _conversation(10, reply="s" * 400)
+    window = policy.apply(messages)
+    assert len(summarizer.calls) == 2
+    previous, covered = summarizer.calls[1]
+    assert previous == "summary #1"
+    # only the turns that dropped out since – not the whole transcript again
+    assert len(covered) < len(messages) // 2
+    assert window[0]["content"].endswith("summary #2")
+    assert _tokens(window) <= 1000
+
+
+def test_format_for_summary():
+    text = format_for_summary("old stuff", [HumanMessage(content="hi"), AIMessage(content="hello")])
+    assert text.startswith("Summary so far:\nold stuff")
+    assert "user: hi" in text and "assistant: hello" in text
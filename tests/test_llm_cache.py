@@ -0,0 +1,53 @@
+import json
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from langzain import agent_core
+from langzain.llm_cache import ResponseCache, cache_key
+
+
+def _prompt(messages):
+    return json.dumps(messages)
+
+
+def test_key_ignores_ids_and_usage():
+    a = _prompt([{"type": "ai", "data": {"content": "hi", "id": "run-1", "usage_metadata": {"input_tokens": 3}}}])
+    b = _prompt([{"type": "ai", "data": {"id": "run-2", "content": "hi"}}])
+    assert cache_key("m|", a, "llm") == cache_key("m|", b, "llm")
+    assert cache_key("m|", a, "llm") != cache_key("m|", a, "llm with other tools")
+    assert cache_key("m|", a, "llm") != cache_key("other|", a, "llm")
+
+
+def test_round_trip():
+    cache = ResponseCache("model", "http://x/v1")
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", [ChatGeneration(message=AIMessage(content="cached!"))])
+    hit = cache.lookup("prompt", "llm")
+    assert hit[0].message.content == "cached!"
+    assert ResponseCache("other-model").lookup("prompt", "llm") is None
+
+
+def test_second_identical_call_is_a_hit(fake_llm, monkeypatch):
+    monkeypatch.setenv("LANGZAIN_LLM_CACHE", "1")
+    first = agent_core.get_llm().invoke("hello there")
+    second = agent_core.get_llm().invoke("hello there")
+    assert fake_llm.requests_served == 1
+    assert second.content == first.content
+
+
+def test_use_cache_false_bypasses(fake_llm, monkeypatch):
+    monkeypatch.setenv("LANGZAIN_LLM_CACHE", "1")
+    messages = [{"role": "user", "content": "thanks!"}]
+    agent_core.run_agent(messages)
+    agent_core.run_agent(messages)
+    assert fake_llm.requests_served == 1
+    agent_core.run_agent(messages, use_cache=False)
+    assert fake_llm.requests_served == 2
+
+
+def test_off_by_default(fake_llm, monkeypatch):
+    monkeypatch.delenv("LANGZAIN_LLM_CACHE", raising=False)
+    agent_core.get_llm().invoke("hello there")
+    agent_core.get_llm().invoke("hello there")
+    assert fake_llm.requests_served == 2
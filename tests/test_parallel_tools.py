@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.messages import ToolMessage
+from langchain_openai import ChatOpenAI
+
+from langzain.benchmarks.fake_servers import FakeLLMServer
+from langzain.parallel_tools import ToolCallGuard, make_tool, turn_config
+
+TOOL_SECONDS = 0.3
+
+
+class _ManyCallsServer(FakeLLMServer):
+    """Answers a user message with one tool call per entry of `calls`, all in one step."""
+
+    def __init__(self, calls):
+        super().__init__(latency=0.0, token_rate=10_000.0, reply_tokens=3)
+        self.calls = calls
+
+    def reply_for(self, messages, tool_names):
+        if messages and messages[-1].get("role") == "user":
+            return [
+                {
+                    "id": "call_" + uuid.uuid4().hex[:12],
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(args)},
+                }
+                for name, args in self.calls
+            ], []
+        return super().reply_for(messages, tool_names)
+
+
+class _Tools:
+    """Tools that sleep TOOL_SECONDS and record when they ran and how many overlapped."""
+
+    def __init__(self):
+        self.spans = {}
+        self.running = 0
+        self.most_at_once = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.running += 1
+            self.most_at_once = max(self.most_at_once, self.running)
+
+    def _leave(self, key, start):
+        with self._lock:
+            self.running -= 1
+            self.spans[key] = (start, time.perf_counter())
+
+    def functions(self):
+        def slow_lookup(key: str) -> str:
+            """Look something up, slowly."""
+            start = time.perf_counter()
+            self._enter()
+            try:
+                time.sleep(TOOL_SECONDS)
+                if key == "boom":
+                    raise RuntimeError("lookup service down")
+                return f"value of {key}"
+            finally:
+                self._leave(key, start)
+
+        async def async_lookup(key: str) -> str:
+            """Look something up, slowly, without a thread."""
+            start = time.perf_counter()
+            self._enter()
+            try:
+                await asyncio.sleep(TOOL_SECONDS)
+                return f"async value of {key}"
+            finally:
+                self._leave(key, start)
+
+        return [slow_lookup, async_lookup]
+
+
+@pytest.fixture
+def run_turn():
+    servers = []
+
+    def run(calls, use_async=False):
+        server = _ManyCallsServer(calls).start()
+        servers.append(server)
+        tools = _Tools()
+        agent = create_agent(
+            model=ChatOpenAI(model="fake", base_url=server.url + "/v1", api_key="test", max_retries=0),
+            tools=[make_tool(f) for f in tools.functions()],
+            middleware=[ToolCallGuard()],
+        )
+        turn = {"messages": [{"role": "user", "content": "look these up"}]}
+        if use_async:
+            result = asyncio.run(agent.ainvoke(turn, config={"configurable": turn_config(is_async=True)}))
+        else:
+            result = agent.invoke(turn, config={"configurable": turn_config()})
+        return [m for m in result["messages"] if isinstance(m, ToolMessage)], tools
+
+    yield run
+    for server in servers:
+        server.stop()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_calls_of_one_step_overlap(run_turn, use_async):
+    calls = [("slow_lookup", {"key": k}) for k in "abc"] + [("async_lookup", {"key": "d"})]
+    results, tools = run_turn(calls, use_async)
+    assert [m.content for m in results] == ["value of a", "value of b", "value of c", "async value of d"]
+    assert tools.most_at_once == 4
+    starts = [start for start, _ in tools.spans.values()]
+    ends = [end for _, end in tools.spans.values()]
+    assert max(starts) < min(ends)   # every call started before any finished
+    assert max(ends) - min(starts) < 2 * TOOL_SECONDS
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_per_turn_cap(run_turn, monkeypatch, use_async):
+    monkeypatch.setenv("LANGZAIN_TOOL_CONCURRENCY", "2")
+    results, tools = run_turn([("slow_lookup", {"key": k}) for k in "abcde"], use_async)
+    assert len(results) == 5
+    assert tools.most_at_once == 2
+    spans = sorted(tools.spans.values())
+    assert spans[-1][1] - spans[0][0] >= 3 * TOOL_SECONDS   # 5 calls, 2 at a time: 3 rounds
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_a_failing_call_does_not_take_the_others_down(run_turn, use_async):
+    calls = [("slow_lookup", {"key": "a"}), ("slow_lookup", {"key": "boom"}), ("async_lookup", {"key": "c"})]
+    results, tools = run_turn(calls, use_async)
+    assert [m.status for m in results] == ["success", "error", "success"]
+    assert results[1].content == "Error: slow_lookup failed: lookup service down"
+    assert results[0].content == "value of a" and results[2].content == "async value of c"
+    assert set(tools.spans) == {"a", "boom", "c"}   # nothing was cancelled
@@ -0,0 +1,91 @@
+import email.utils
+
+import pytest
+
+from langzain import ratelimit
+from langzain.ratelimit import BACKOFF_WINDOW, POLL_INTERVAL, RateLimiter, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def _fake_time(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit, "time", clock)
+
+
+def test_bucket_starts_full_and_refills(clock):
+    bucket = TokenBucket(60)   # one per second
+    assert bucket.wait_time(60, clock.now) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1, clock.now) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1, clock.now) == pytest.approx(0.5)
+    clock.now += 100
+    assert bucket.tokens == 0.5 and bucket.wait_time(1, clock.now) == 0
+    assert bucket.tokens == 60   # never above one minute's worth
+
+
+def test_oversized_request_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.take(30)
+    assert bucket.wait_time(1000, clock.now) == pytest.approx(30.0)
+    clock.now += 30
+    assert bucket.wait_time(1000, clock.now) == 0
+
+
+def test_requests_per_minute(clock):
+    limiter = RateLimiter(rpm=2)
+    limiter.acquire()
+    limiter.acquire()
+    start = clock.now
+    limiter.acquire()   # the third one sleeps until a token is back
+    assert clock.now - start == pytest.approx(30.0)
+
+
+def test_concurrency_limit(clock):
+    limiter = RateLimiter(max_concurrency=2)
+    assert limiter._try_acquire(0) == 0
+    assert limiter._try_acquire(0) == 0
+    assert limiter._try_acquire(0) == POLL_INTERVAL
+    limiter.release()
+    assert limiter._try_acquire(0) == 0
+
+
+def test_aimd(clock):
+    limiter = RateLimiter(max_concurrency=8)
+    limiter.on_response(429)
+    assert limiter.limit == 4
+    limiter.on_response(503)   # same burst: counts once
+    assert limiter.limit == 4
+    clock.now += BACKOFF_WINDOW
+    limiter.on_response(500)
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.on_response(200)
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)   # +1/limit per success
+    for _ in range(100):
+        limiter.on_response(200)
+    assert limiter.limit == 8
+    for _ in range(10):
+        clock.now += BACKOFF_WINDOW
+        limiter.on_response(429, retry_after=0)
+    assert limiter.limit == 1
+
+
+def test_retry_after_pauses_every_request(clock):
+    limiter = RateLimiter()
+    limiter.on_response(429, retry_after=5)
+    assert limiter._try_acquire(0) == pytest.approx(5.0)
+    clock.now += 5
+    assert limiter._try_acquire(0) == 0
+    limiter.on_response(429)   # no header: the default pause
+    assert limiter._try_acquire(0) == pytest.approx(ratelimit.DEFAULT_RETRY_PAUSE)
+    limiter.on_response(503, retry_after=3600)
+    assert limiter.paused_until - clock.now == ratelimit.MAX_RETRY_PAUSE
+
+
+def test_retry_after_headers(clock):
+    assert ratelimit.retry_after({}) is None
+    assert ratelimit.retry_after({"retry-after": "2"}) == 2.0
+    assert ratelimit.retry_after({"retry-after-ms": "250", "retry-after": "2"}) == 0.25
+    date = email.utils.formatdate(clock.now + 30, usegmt=True)
+    assert ratelimit.retry_after({"retry-after": date}) == pytest.approx(30.0)
+    assert ratelimit.retry_after({"retry-after": "soon"}) is None
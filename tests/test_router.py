@@ -0,0 +1,102 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from langzain import agent_core, router
+from langzain.router import ROUTE_TOOLS, classify, route, used_route
+
+
+def _user(text):
+    return {"role": "user", "content": text}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("thanks!", "chat"),
+    ("hi there", "chat"),
+    ("tell me a joke", "chat"),
+    ("is it raining in London", "weather"),
+    ("what's the temperature in Oslo?", "weather"),
+    ("who was Ada Lovelace?", "wiki"),
+    ("what is the capital of Peru", "wiki"),
+    # about the conversation, not the world
+    ("what is my name?", "agent"),
+    # several places: the batched tool is only in the full agent
+    ("weather in Oslo, Cairo and Lima", "agent"),
+    ("temperature in Paris or Rome?", "agent"),
+    ("and in Berlin?", "agent"),
+    ("weather at 59.91, 10.75", "agent"),
+    ("what is 17 * 23", "agent"),
+])
+def test_classify(text, expected):
+    assert classify(text)[0] == expected
+
+
+def test_unsure_goes_to_the_agent():
+    # "why is the sky blue" leans wiki, but not by enough
+    choice, confidence, fired = classify("why is the sky blue")
+    assert fired and choice == "agent" and confidence < router.MIN_CONFIDENCE
+
+
+def test_short_reply_to_a_question_goes_to_the_agent():
+    question = {"role": "assistant", "content": "Want me to check the weather in Oslo?"}
+    assert route([_user("hi"), question, _user("yes")], mode="on").route == "agent"
+    assert route([_user("hi"), question, _user("sure, do it")], mode="on").route == "agent"
+    # without the question it's just small talk
+    assert route([_user("yes")], mode="on").route == "chat"
+    statement = {"role": "assistant", "content": "It's 12 °C in Oslo."}
+    assert route([_user("hi"), statement, _user("thanks!")], mode="on").route == "chat"
+
+
+def test_reply_to_a_tool_call_goes_to_the_agent():
+    calling = AIMessage(content="", tool_calls=[{"name": "search_wikipedia", "args": {"query": "x"}, "id": "1"}])
+    assert route([HumanMessage("hi"), calling, HumanMessage("ok")], mode="on").route == "agent"
+
+
+def test_last_message_not_from_the_user():
+    assert route([_user("thanks!"), {"role": "assistant", "content": "welcome"}], mode="on").route == "agent"
+    assert route([], mode="on").route == "agent"
+
+
+def test_modes(monkeypatch):
+    messages = [_user("thanks!")]
+    assert route(messages, mode="off") is None
+    shadow = route(messages, mode="shadow")
+    assert (shadow.route, shadow.applied) == ("chat", "agent")
+    on = route(messages, mode="on")
+    assert (on.route, on.applied) == ("chat", "chat")
+    assert on.as_dict()["applied"] == "chat"
+    monkeypatch.setenv("LANGZAIN_ROUTER", "false")
+    assert router.router_mode() == "off"
+    monkeypatch.setenv("LANGZAIN_ROUTER", "shadow")
+    assert router.router_mode() == "shadow"
+    monkeypatch.delenv("LANGZAIN_ROUTER")
+    assert router.router_mode() == "on"
+
+
+def test_route_tools_exist():
+    names = {t.__name__ for t in agent_core._load_tools()}
+    for tools in ROUTE_TOOLS.values():
+        assert set(tools) <= names
+    # a place the gazetteer doesn't know can still be looked up by coordinates
+    assert "get_current_temperature" in ROUTE_TOOLS["weather"]
+
+
+def test_pick_agent_uses_the_callers_agents(monkeypatch):
+    class Recorder:
+        route = None
+
+    agents = {"agent": "full", "chat": "chat only", "weather": "weather only", "wiki": "wiki only"}
+    recorder = Recorder()
+    monkeypatch.setenv("LANGZAIN_ROUTER", "on")
+    assert agent_core._pick_agent(agents, [_user("thanks!")], recorder, True) == "chat only"
+    assert recorder.route["route"] == "chat"
+    monkeypatch.setenv("LANGZAIN_ROUTER", "shadow")
+    assert agent_core._pick_agent(agents, [_user("thanks!")], recorder, True) == "full"
+    # a single agent is used as is
+    assert agent_core._pick_agent("mine", [_user("thanks!")], recorder, True) == "mine"
+
+
+def test_used_route():
+    assert used_route([]) == "chat"
+    assert used_route(["get_current_temperature_in", "get_current_temperature"]) == "weather"
+    assert used_route(["search_wikipedia"]) == "wiki"
+    assert used_route(["search_wikipedia", "get_current_temperature_in"]) == "agent"
@@ -0,0 +1,208 @@
+import asyncio
+import json
+
+import pytest
+
+from langzain import server as server_module
+from langzain.server import ChatServer
+from langzain.store import ConversationStore
+
+
+class _FakeAgent:
+    """astream_agent stand-in: streams a few tokens, then "done"; `gate` holds turns back."""
+
+    def __init__(self):
+        self.gate = None
+        self.before_done = None   # called with the messages just before "done"
+        self.started = 0
+
+    async def __call__(self, messages):
+        self.started += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        reply = f"you said {messages[-1]['content']}"
+        for word in reply.split():
+            yield {"type": "token", "text": word + " "}
+        if self.before_done:
+            self.before_done(messages)
+        yield {"type": "done", "new_messages": [{"role": "assistant", "content": reply}], "trace": {"llm_calls": 1}}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    fake = _FakeAgent()
+    monkeypatch.setattr(server_module, "astream_agent", fake)
+    return fake
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(tmp_path / "db.sqlite")
+
+
+def _serve(store, test, **kwargs):
+    """Run `test(port)` against a ChatServer listening on a free local port."""
+
+    async def main():
+        app = ChatServer(store, **kwargs)
+        server = await asyncio.start_server(app.handle_connection, "127.0.0.1", 0)
+        async with server:
+            return await test(server.sockets[0].getsockname()[1])
+
+    return asyncio.run(main())
+
+
+async def _send(port, raw):
+    """Send raw bytes, read until the server closes; -> (status, headers, body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, body
+
+
+async def _request(port, method, path, data=None, headers=None):
+    body = json.dumps(data).encode() if data is not None else b""
+    head = {"Host": "test", "Connection": "close", "Content-Length": str(len(body)), **(headers or {})}
+    raw = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in head.items()) + "\r\n"
+    status, headers, body = await _send(port, raw.encode() + body)
+    if headers.get("Content-Type") == "application/json":
+        body = json.loads(body)
+    return status, headers, body
+
+
+def _sse_events(body):
+    events = []
+    for block in body.decode().strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_dispatch(store, agent):
+    async def test(port):
+        status, _, health = await _request(port, "GET", "/healthz")
+        assert status == 200 and health["status"] == "ok"
+        status, _, created = await _request(port, "POST", "/v1/sessions")
+        assert status == 201
+        sid = created["session_id"]
+
+        status, _, done = await _request(port, "POST", f"/v1/sessions/{sid}/messages", {"content": "hello"})
+        assert status == 200
+        assert done["reply"] == "you said hello" and done["session_id"] == sid
+        assert done["timings"]["llm_calls"] == 1
+        status, _, history = await _request(port, "GET", f"/v1/sessions/{sid}/messages")
+        assert [m["content"] for m in history["messages"]] == ["hello", "you said hello"]
+
+        assert (await _request(port, "GET", "/v1/sessions"))[0] == 405
+        assert (await _request(port, "GET", "/nope"))[0] == 404
+        assert (await _request(port, "POST", "/v1/sessions/missing/messages", {"content": "hi"}))[0] == 404
+        assert (await _request(port, "POST", f"/v1/sessions/{sid}/messages", {"content": ""}))[0] == 400
+        assert (await _request(port, "GET", f"/v1/sessions/{sid}/messages?limit=x"))[0] == 400
+        status, _, body = await _send(port, b"GARBAGE\r\n\r\n")
+        assert status == 400
+        status, _, body = await _request(port, "GET", "/metrics")
+        assert status == 200 and b"langzain_http_requests_total" in body
+
+    _serve(store, test)
+
+
+def test_sse_stream(store, agent):
+    async def test(port):
+        sid = (await _request(port, "POST", "/v1/sessions"))[2]["session_id"]
+        status, headers, body = await _request(
+            port, "POST", f"/v1/sessions/{sid}/messages", {"content": "hi there"},
+            {"Accept": "text/event-stream"},
+        )
+        assert status == 200 and headers["Content-Type"] == "text/event-stream"
+        events = _sse_events(body)
+        assert [e for e, _ in events] == ["token", "token", "token", "token", "done"]
+        assert "".join(d["text"] for e, d in events if e == "token").strip() == "you said hi there"
+        assert events[-1][1]["reply"] == "you said hi there"
+
+        # unknown session: a plain 404 before anything is streamed
+        status, _, _ = await _request(
+            port, "POST", "/v1/sessions/missing/messages?stream=1", {"content": "hi"}
+        )
+        assert status == 404
+
+    _serve(store, test)
+
+
+def test_conflicting_turn_gets_409(store, agent, tmp_path):
+    other_worker = ConversationStore(tmp_path / "db.sqlite")
+
+    async def test(port):
+        sid = (await _request(port, "POST", "/v1/sessions"))[2]["session_id"]
+        # another worker saves a turn of the same session while ours runs
+        agent.before_done = lambda messages: other_worker.append(
+            sid, [{"role": "user", "content": "elsewhere"}, {"role": "assistant", "content": "ok"}]
+        )
+        status, _, body = await _request(port, "POST", f"/v1/sessions/{sid}/messages", {"content": "here"})
+        assert status == 409
+
+        status, _, body = await _request(
+            port, "POST", f"/v1/sessions/{sid}/messages?stream=1", {"content": "here"}
+        )
+        event, data = _sse_events(body)[-1]
+        assert event == "error" and data["status"] == 409
+
+        agent.before_done = None
+        status, _, done = await _request(port, "POST", f"/v1/sessions/{sid}/messages", {"content": "again"})
+        assert status == 200
+        return sid
+
+    sid = _serve(store, test)
+    contents = [m["content"] for m in store.load_recent(sid)]
+    # nothing of the conflicting turns was saved, and nothing interleaved
+    assert contents == ["elsewhere", "ok", "elsewhere", "ok", "again", "you said again"]
+
+
+def test_backpressure(store, agent):
+    async def test(port):
+        sid = (await _request(port, "POST", "/v1/sessions"))[2]["session_id"]
+        agent.gate = asyncio.Event()
+        path = f"/v1/sessions/{sid}/messages"
+        running = asyncio.ensure_future(_request(port, "POST", path, {"content": "one"}))
+        queued = asyncio.ensure_future(_request(port, "POST", path, {"content": "two"}))
+        while agent.started < 1:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+
+        status, headers, _ = await _request(port, "POST", path, {"content": "three"})
+        assert status == 503 and headers["Retry-After"] == "1"
+        assert (await _request(port, "GET", "/healthz"))[2]["turns_in_flight"] == 2
+
+        agent.gate.set()
+        assert [(await running)[0], (await queued)[0]] == [200, 200]
+
+    _serve(store, test, max_inflight=1, max_queue=1)
+
+
+def test_slow_headers_time_out(store, agent, monkeypatch):
+    monkeypatch.setattr(server_module, "REQUEST_TIMEOUT", 0.2)
+
+    async def test(port):
+        # request line, then a header that never finishes
+        status, headers, _ = await _send(port, b"GET /healthz HTTP/1.1\r\nHost: te")
+        assert status == 408 and headers["Connection"] == "close"
+        # a body shorter than its Content-Length
+        status, _, _ = await _send(port, b"POST /v1/sessions HTTP/1.1\r\nContent-Length: 10\r\n\r\n{}")
+        assert status == 408
+
+    _serve(store, test)
+
+
+def test_oversized_header_line(store, agent):
+    async def test(port):
+        huge = b"X-Junk: " + b"a" * 100_000 + b"\r\n"
+        status, _, body = await _send(port, b"GET /healthz HTTP/1.1\r\n" + huge + b"\r\n")
+        assert status == 431
+        status, _, _ = await _send(port, b"GET /" + b"a" * 100_000 + b" HTTP/1.1\r\n\r\n")
+        assert status == 400
+
+    _serve(store, test)
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from langzain import sessions
+from langzain.messages import Conversation
+from langzain.sessions import SessionManager, compress, decompress, footprint
+
+
+@pytest.fixture(autouse=True)
+def _fake_time(monkeypatch, clock):
+    monkeypatch.setattr(sessions, "time", clock)
+
+
+def _conversation(turns=20, words=50):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(f"question {i} " + "blah " * words))
+        messages.append(AIMessage(f"answer {i} " + "yada " * words))
+    messages.append({"role": "user", "content": "a plain dict too"})
+    return Conversation(messages)
+
+
+def _manager(tmp_path, max_bytes=10**9, idle_seconds=600):
+    return SessionManager(max_bytes=max_bytes, idle_seconds=idle_seconds, spill_dir=str(tmp_path / "spill"))
+
+
+def test_compress_round_trip():
+    raw = _conversation().raw
+    blob = compress(raw)
+    assert decompress(blob) == raw
+    assert len(blob) * 5 < footprint(Conversation(raw))
+    assert decompress(compress([])) == []
+
+
+def test_idle_sessions_are_compressed_and_come_back(tmp_path, clock):
+    manager = _manager(tmp_path)
+    original = _conversation()
+    manager.add("a", Conversation(original.raw))
+    manager.add("b", _conversation(turns=1))
+    clock.now += 300
+    manager.get("b")
+    clock.now += 300
+    manager.sweep()
+    assert manager._sessions["a"].state == "compressed"
+    assert manager._sessions["b"].state == "live"   # used 300 s ago
+
+    session = manager.get("a")
+    assert session.state == "live"
+    assert session.conversation.raw == original.raw
+    assert session.bytes == footprint(original)
+
+
+def test_sessions_idle_for_a_day_are_forgotten(tmp_path, clock):
+    manager = _manager(tmp_path)
+    manager.add("a", _conversation())
+    clock.now += sessions.FORGET_AFTER
+    manager.sweep()
+    assert manager.get("a") is None and len(manager) == 0
+
+
+def test_ceiling_compresses_then_spills_least_recently_used(tmp_path):
+    one = footprint(_conversation())
+    manager = _manager(tmp_path, max_bytes=int(one * 2.5))
+    for name in "abc":
+        manager.add(name, _conversation())
+    assert manager._sessions["a"].state == "compressed"
+    assert [manager._sessions[n].state for n in "bc"] == ["live", "live"]
+    assert manager.total_bytes() <= manager.max_bytes
+
+    # so tight that even the blobs don't fit: the old ones go to disk
+    manager.max_bytes = one
+    manager.add("d", _conversation())
+    states = {n: s.state for n, s in manager._sessions.items()}
+    assert states["d"] == "live"
+    assert "spilled" in states.values()
+    spilled = [s for s in manager._sessions.values() if s.state == "spilled"]
+    assert all(os.path.exists(s.path) for s in spilled)
+
+
+def test_spilled_session_reloads_exactly(tmp_path):
+    manager = _manager(tmp_path, max_bytes=1)   # everything but the current session spills
+    original = _conversation()
+    manager.add("a", Conversation(original.raw))
+    manager.add("b", _conversation())
+    a = manager._sessions["a"]
+    assert a.state == "spilled"
+    path = a.path
+
+    session = manager.get("a")
+    assert session.conversation.raw == original.raw
+    assert not os.path.exists(path)
+    assert manager._sessions["b"].state == "spilled"
+
+
+def test_missing_spill_file_means_resume_from_the_store(tmp_path):
+    manager = _manager(tmp_path, max_bytes=1)
+    manager.add("a", _conversation())
+    manager.add("b", _conversation())
+    os.remove(manager._sessions["a"].path)
+    assert manager.get("a") is None
+    assert "a" not in manager._sessions
+
+
+def test_touch_keeps_the_callers_newer_copy(tmp_path, clock, monkeypatch):
+    manager = _manager(tmp_path, idle_seconds=1)
+    monkeypatch.setattr(manager, "start_sweeper", lambda: None)   # sweeps by hand here
+    session = manager.add("a", _conversation(turns=2))
+    conversation = session.conversation
+    # the turn runs, and meanwhile the sweeper compresses the session
+    conversation.add_user("one more")
+    clock.now += 5
+    manager.sweep()
+    assert session.state == "compressed"
+
+    manager.touch(session, conversation)
+    assert session.state == "live"
+    assert manager.get("a").conversation.raw[-1] == {"role": "user", "content": "one more"}
+    assert session.bytes == footprint(conversation)
+    manager.remove("a")
+    assert len(manager) == 0
@@ -0,0 +1,98 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from langzain.store import ConversationStore, SessionConflict
+
+
+def _turn(i):
+    return [
+        {"role": "user", "content": f"question {i}"},
+        AIMessage(content="", tool_calls=[{"name": "t", "args": {"i": i}, "id": f"c{i}"}]),
+        ToolMessage(content=f"result {i}", tool_call_id=f"c{i}"),
+        AIMessage(content=f"answer {i}"),
+    ]
+
+
+def test_messages_round_trip(tmp_path):
+    store = ConversationStore(tmp_path / "db.sqlite")
+    sid = store.new_session()
+    messages = _turn(0)
+    store.append(sid, messages)
+
+    loaded = store.load_recent(sid)
+    assert loaded[0] == {"role": "user", "content": "question 0"}
+    assert isinstance(loaded[1], AIMessage) and loaded[1].tool_calls[0]["args"] == {"i": 0}
+    assert isinstance(loaded[2], ToolMessage) and loaded[2].tool_call_id == "c0"
+    assert loaded[3].content == "answer 0"
+
+
+def test_save_new_appends_only_new_messages(tmp_path):
+    store = ConversationStore(tmp_path / "db.sqlite")
+    sid = store.new_session()
+    messages = _turn(0)
+    saved = store.save_new(sid, messages, 0)
+    messages += _turn(1)
+    saved = store.save_new(sid, messages, saved)
+
+    assert saved == 8
+    assert store.count(sid) == 8
+    assert [m.content for m in store.iter_messages(sid, batch_size=3) if isinstance(m, AIMessage) and m.content] == [
+        "answer 0", "answer 1"
+    ]
+
+
+def test_sessions_survive_a_new_store(tmp_path):
+    sid = ConversationStore(tmp_path / "db.sqlite").new_session()
+    ConversationStore(tmp_path / "db.sqlite").append(sid, [HumanMessage(content="hi")])
+    reopened = ConversationStore(tmp_path / "db.sqlite")
+    assert reopened.has_session(sid)
+    assert reopened.load_recent(sid)[0].content == "hi"
+    assert not reopened.has_session("nope")
+
+
+def test_load_recent_starts_at_a_user_turn(tmp_path):
+    store = ConversationStore(tmp_path / "db.sqlite")
+    sid = store.new_session()
+    for i in range(5):
+        store.append(sid, _turn(i))
+
+    recent = store.load_recent(sid, limit=6)   # would start at a tool result
+    assert recent[0] == {"role": "user", "content": "question 4"}
+    assert len(recent) == 4
+
+
+def test_load_page_walks_backwards(tmp_path):
+    store = ConversationStore(tmp_path / "db.sqlite")
+    sid = store.new_session()
+    store.append(sid, [{"role": "user", "content": str(i)} for i in range(10)])
+
+    page, before = store.load_page(sid, limit=4)
+    assert [m["content"] for m in page] == ["6", "7", "8", "9"]
+    page, before = store.load_page(sid, before_seq=before, limit=4)
+    assert [m["content"] for m in page] == ["2", "3", "4", "5"]
+    page, before = store.load_page(sid, before_seq=before, limit=4)
+    assert [m["content"] for m in page] == ["0", "1"] and before is None
+
+
+def test_delete_session(tmp_path):
+    store = ConversationStore(tmp_path / "db.sqlite")
+    sid = store.new_session()
+    store.append(sid, _turn(0))
+    store.delete_session(sid)
+    assert not store.has_session(sid)
+    assert store.load_recent(sid) == []
+    assert store.list_sessions() == []
+
+
+def test_save_new_refuses_to_interleave(tmp_path):
+    # two workers (own connections, own locks) that both loaded the empty session
+    first = ConversationStore(tmp_path / "db.sqlite")
+    second = ConversationStore(tmp_path / "db.sqlite")
+    sid = first.new_session()
+    assert first.save_new(sid, _turn(0), 0, expected_count=0) == 4
+    with pytest.raises(SessionConflict):
+        second.save_new(sid, _turn(1), 0, expected_count=0)
+    assert second.count(sid) == 4
+    assert second.load_recent(sid)[-1].content == "answer 0"
+    # reloaded, the second one can go on
+    assert second.save_new(sid, _turn(0) + _turn(1), 4, expected_count=4) == 8
@@ -0,0 +1,85 @@
+import datetime
+
+import pytest
+
+from langzain import cache as cache_module
+from langzain import tools
+
+HOUR = 3600
+
+
+def _forecast(start, temps):
+    return {"times": [start + i * HOUR for i in range(len(temps))], "temps": list(temps)}
+
+
+@pytest.fixture
+def fetches(monkeypatch, clock):
+    """Counts Open-Meteo fetches; every location gets the same 24h forecast."""
+    monkeypatch.setattr(cache_module, "time", clock)
+    monkeypatch.setattr(tools, "_forecast_cache", None)
+    day_start = int(clock.now) // 86400 * 86400
+    calls = []
+
+    def fake_fetch(coords):
+        calls.append(list(coords))
+        return [_forecast(day_start, [float(h) for h in range(24)]) for _ in coords]
+
+    monkeypatch.setattr(tools, "_fetch_forecasts", fake_fetch)
+    return calls
+
+
+def test_nearest_index():
+    times = [0, 3600, 7200]
+    assert tools._nearest_index(times, -5) == 0
+    assert tools._nearest_index(times, 1700) == 0
+    assert tools._nearest_index(times, 1900) == 1
+    assert tools._nearest_index(times, 99999) == 2
+    assert tools._nearest_index([], 100) is None
+
+
+def test_forecast_is_cached_until_the_next_hour(fetches, clock):
+    clock.now = clock.now // HOUR * HOUR + 10 * 60   # hh:10
+    tools._current_temperatures([(59.91, 10.75)], now=clock.now)
+    clock.now += 40 * 60                             # hh:50 – same hour
+    tools._current_temperatures([(59.91, 10.75)], now=clock.now)
+    assert len(fetches) == 1
+
+    clock.now += 10 * 60                             # next hour
+    tools._current_temperatures([(59.91, 10.75)], now=clock.now)
+    assert len(fetches) == 2
+
+
+def test_locations_are_fetched_together_and_cached_apart(fetches, clock):
+    tools._current_temperatures([(1.0, 2.0), (3.0, 4.0)], now=clock.now)
+    assert fetches == [[(1.0, 2.0), (3.0, 4.0)]]
+    tools._current_temperatures([(3.0, 4.0), (5.0, 6.0)], now=clock.now)
+    assert fetches[1] == [(5.0, 6.0)]
+
+
+def test_temperature_of_the_nearest_hour(fetches, clock):
+    hour = datetime.datetime.fromtimestamp(clock.now, datetime.timezone.utc).hour
+    now = clock.now // HOUR * HOUR + 20 * 60
+    assert tools._current_temperatures([(0.0, 0.0)], now=now) == [float(hour)]
+
+
+def test_empty_forecast_is_no_data_not_an_error(monkeypatch, clock):
+    monkeypatch.setattr(cache_module, "time", clock)
+    monkeypatch.setattr(tools, "_forecast_cache", None)
+    monkeypatch.setattr(tools, "_fetch_forecasts", lambda coords: [{"times": [], "temps": []} for _ in coords])
+    assert tools.get_current_temperature(1.0, 2.0) == "No temperature data for these coordinates right now."
+    assert "no data" in tools.get_current_temperatures([{"latitude": 1.0, "longitude": 2.0, "name": "X"}])
+
+
+def test_parse_empty_hourly():
+    data = {"hourly": {"time": [], "temperature_2m": []}}
+    assert tools._parse_forecasts(data) == [{"times": [], "temps": []}]
+
+
+def test_tool_urls_are_read_per_request():
+    from langzain.benchmarks.fake_servers import fake_services
+
+    # tools is imported already: the fake servers must still get the requests
+    with fake_services(llm_latency=0.0, tool_latency=0.0) as (llm, fake_tools):
+        assert len(tools._fetch_forecasts([(59.91, 10.75)])) == 1
+        tools._wiki_api({"list": "search", "srsearch": "Ada Lovelace"})
+    assert fake_tools.requests_served == 2
@@ -0,0 +1,145 @@
+import bz2
+import gzip
+import json
+
+import pytest
+
+from langzain import tools, wiki_index
+from langzain.benchmarks.fake_servers import WIKI_PAGES, fake_services
+from langzain.cache import LRUCache
+from langzain.wiki_index import OfflineWikipedia, _match_expression, build_index, read_dump
+
+PAGES = [
+    ("Rome", "Rome is the capital city of Italy."),
+    ("History of Rome", "The history of Rome spans Rome, Rome and more Rome over 28 centuries."),
+    ("Python (programming language)", "A high-level, general-purpose language created by Guido van Rossum."),
+    ("Monty Python", "A comedy troupe. Not about the Python programming language, though Python fans love it."),
+    ("Ada Lovelace", "An English mathematician, often called the first computer programmer."),
+]
+
+
+def _index(tmp_path, pages=PAGES):
+    dump = tmp_path / "dump.jsonl"
+    dump.write_text("".join(json.dumps({"title": t, "summary": s}) + "\n" for t, s in pages), encoding="utf-8")
+    path = tmp_path / "wiki.sqlite"
+    build_index(dump, path, log=lambda msg: None)
+    return path
+
+
+def test_read_dump_xml(tmp_path):
+    path = tmp_path / "enwiki-abstract.xml.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(
+            "<feed>"
+            "<doc><title>Wikipedia: Rome</title><url>u</url><abstract>Rome is the capital of Italy.</abstract></doc>"
+            "<doc><title>Wikipedia: Stub</title><abstract>|</abstract></doc>"
+            "<doc><title>Wikipedia: Template</title><abstract>{{Infobox}}</abstract></doc>"
+            "<doc><title>Wikipedia: Empty</title><abstract></abstract></doc>"
+            "</feed>"
+        )
+    assert list(read_dump(path)) == [("Rome", "Rome is the capital of Italy.")]
+
+
+def test_read_dump_jsonl(tmp_path):
+    path = tmp_path / "summaries.jsonl.bz2"
+    lines = [
+        {"title": "A", "summary": "from summary"},
+        {"title": "B", "extract": "from extract"},
+        {"title": "C", "abstract": "from abstract"},
+        {"title": "D", "text": "from text"},
+        {"title": "E"},
+    ]
+    with bz2.open(path, "wt", encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(line) for line in lines) + "\nnot json\n\n")
+    assert list(read_dump(path)) == [
+        ("A", "from summary"), ("B", "from extract"), ("C", "from abstract"), ("D", "from text")
+    ]
+
+
+def test_read_dump_tsv(tmp_path):
+    path = tmp_path / "pages.tsv"
+    path.write_text("Rome\tFirst line\\nsecond line\n\tno title\nStub\t|\n", encoding="utf-8")
+    assert list(read_dump(path)) == [("Rome", "First line\nsecond line")]
+
+
+def test_match_expression_quotes_everything():
+    assert _match_expression("Who founded Rome?") == '"who" OR "founded" OR "rome"'
+    assert _match_expression('NEAR("a" AND b*) OR -c') == '"near" OR "a" OR "and" OR "b" OR "or" OR "c"'
+    assert _match_expression("?!") == ""
+
+
+def test_exact_title_first(tmp_path):
+    wiki = OfflineWikipedia(_index(tmp_path))
+    # "History of Rome" says rome far more often; the page called "Rome" still wins
+    assert [t for t, _ in wiki.search("rome", 2)] == ["Rome", "History of Rome"]
+    assert wiki.search("ROME ", 1)[0][0] == "Rome"
+    assert wiki.info()["pages"] == str(len(PAGES))
+
+
+def test_title_matches_weigh_more(tmp_path, monkeypatch):
+    wiki = OfflineWikipedia(_index(tmp_path))
+    assert wiki.search("python language", 1)[0][0] == "Python (programming language)"
+    # with titles weighted like summaries, the page that only talks about it wins
+    monkeypatch.setattr(wiki_index, "WIKI_TITLE_WEIGHT", 1.0)
+    assert wiki.search("python language", 1)[0][0] == "Monty Python"
+
+
+def test_search_survives_fts_syntax(tmp_path):
+    wiki = OfflineWikipedia(_index(tmp_path))
+    assert wiki.search('"Ada AND (Lovelace', 1)[0][0] == "Ada Lovelace"
+    assert wiki.search("***") == []
+    assert wiki.search("zebra") == []
+
+
+def test_missing_index(tmp_path):
+    with pytest.raises(FileNotFoundError, match="langzain-wiki-index build"):
+        OfflineWikipedia(tmp_path / "nope.sqlite")
+
+
+@pytest.fixture
+def fresh_wiki_state(monkeypatch):
+    monkeypatch.setattr(tools, "_wiki_backend", None)
+    monkeypatch.setattr(tools, "_wiki_search_cache", LRUCache())
+    monkeypatch.setattr(tools, "_wiki_summary_cache", LRUCache())
+
+
+def _blocks(answer):
+    # the dump reader strips summaries; the live API hands them back as is
+    return sorted(block.strip() for block in answer.split("\n\n"))
+
+
+def test_offline_backend_answers_like_the_live_one(tmp_path, monkeypatch, fresh_wiki_state):
+    with fake_services(tool_latency=0.0):
+        live = tools.search_wikipedia("Oslo")
+    assert live.startswith("Page: ")
+
+    monkeypatch.setattr(tools, "_wiki_backend", None)
+    monkeypatch.setenv("LANGZAIN_WIKI_BACKEND", "offline")
+    monkeypatch.setenv("LANGZAIN_WIKI_INDEX", str(_index(tmp_path, list(WIKI_PAGES.items()))))
+    assert isinstance(tools.get_wiki_backend(), OfflineWikipedia)
+    offline = tools.search_wikipedia("Oslo")
+    # the same pages, formatted the same ("Page: …\nSummary: …"); only the order may differ
+    assert _blocks(offline) == _blocks(live)
+    assert offline.startswith("Page: Oslo\nSummary: ")
+    assert tools.search_wikipedia("zebra") == "No good Wikipedia search result was found."
+
+
+def test_unknown_backend(monkeypatch, fresh_wiki_state):
+    monkeypatch.setenv("LANGZAIN_WIKI_BACKEND", "carrier-pigeon")
+    with pytest.raises(ValueError, match="carrier-pigeon"):
+        tools.get_wiki_backend()
+
+
+def test_progress_is_logged_despite_duplicate_titles(tmp_path, monkeypatch):
+    monkeypatch.setattr(wiki_index, "BATCH_SIZE", 10)
+    monkeypatch.setattr(wiki_index, "PROGRESS_EVERY", 25)
+    dump = tmp_path / "dump.tsv"
+    # every third page repeats a title, so batches add 6-7 pages, never a round number
+    lines = [f"Page {i - i % 3 if i % 3 == 2 else i}\tSummary of page {i}" for i in range(100)]
+    dump.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    logged = []
+    wiki_index.build_index(dump, tmp_path / "wiki.sqlite", log=logged.append)
+    progress = [int(line.split()[0]) for line in logged if line.endswith("pages…")]
+    assert len(progress) == 2 and progress[0] >= 25 and progress[1] >= 50
+    assert logged[-1].startswith("Indexed 67 pages")